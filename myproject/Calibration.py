@@ -0,0 +1,371 @@
+'''
+并行校准：将层参数、传播参数、国家比例和分组易感性因子拟合到观测数据
+
+参数空间用字符串名称声明，每个名称决定参数作用的位置：
+    'beta'                         Covasim 模拟参数（任何不带前缀的名称都视为 sim 参数）
+    'layer:<层名>:<键>'             层配置中的参数，例如 'layer:country:m_connections'
+    'country:<国家名>'              该国占总人口的比例，其余国家按原有比例分配剩余部分
+    'rel_sus:<属性>=<取值>'         对满足 sim.people.<属性> == 取值 的人，将 rel_sus 乘以该因子
+    'rel_trans:<属性>=<取值>'       同上，作用于 rel_trans
+
+例如：
+    parameter_space = {
+        'beta': (0.01, 0.05),
+        'layer:country:m_connections': (1, 6, 'int'),
+        'country:A': (0.4, 0.8),
+        'rel_sus:health_status=1': (1.0, 2.0),
+    }
+
+优化器：在 [0, 1] 归一化空间中使用对角高斯分布的交叉熵方法（批量采样、精英样本更新均值和标准差），
+每一代的所有候选在进程池中并行评估；只用 Numpy，不依赖 GPU 或额外的优化库。
+
+加速手段：
+- 人口缓存：影响人口的参数（层参数、国家比例）相同时复用已构建的人口，每个工作进程各自缓存；
+- 早停剪枝：先运行到 prune_day，用前半段轨迹计算误差，明显差于至今最优的几个候选的直接放弃；
+- 检查点：每一代结束后保存优化器状态，中断后可以从检查点继续。
+'''
+import collections
+import json
+import multiprocessing as mp
+import os
+import pickle
+import numpy as np
+import covasim as cv
+import ContactNetwork
+
+# 工作进程共享的校准对象：fork 时由父进程直接继承，spawn 时由 _init_worker 填充
+_shared = {}
+
+# 每个进程内的人口缓存（LRU）
+_population_cache = collections.OrderedDict()
+
+def mismatch(sim_values, data_values):
+    '''
+    计算模拟结果与观测数据的误差：绝对误差之和除以观测值绝对值之和（观测值为 nan 的日期忽略）
+    '''
+    n = min(len(sim_values), len(data_values))
+    sim_values = np.asarray(sim_values[:n], dtype=float)
+    data_values = np.asarray(data_values[:n], dtype=float)
+    mask = ~np.isnan(data_values)
+    if not mask.any():
+        return 0.0
+    return float(np.abs(sim_values[mask] - data_values[mask]).sum() / max(np.abs(data_values[mask]).sum(), 1.0))
+
+def partial_result(sim, key):
+    '''
+    在模拟尚未结束（未 finalize）时读取截至当前的结果：与 Sim.finalize 一样只缩放 scale 为真的结果，并由 new_* 累加出 cum_*
+    （prevalence、r_eff 等不缩放的比率要到 finalize 时才计算，运行中读到的是原值）
+    '''
+    t = sim.t
+    scale = sim.rescale_vec[:t]
+    if key.startswith('cum_'):
+        values = np.cumsum(sim.results['new_' + key[4:]].values[:t] * scale)
+        if key == 'cum_infections':
+            values += sim['pop_infected'] * sim.rescale_vec[0]
+        return values
+    values = sim.results[key].values[:t]
+    return values * scale if sim.results[key].scale else values.copy()
+
+def _init_worker(shared):
+    '''spawn 模式下的工作进程初始化：接收校准对象'''
+    _shared.update(shared)
+
+def _evaluate_task(task):
+    '''在工作进程中评估一个候选参数'''
+    index, params, seed, prune_threshold = task
+    return index, _shared['calibration'].evaluate(params, seed=seed, prune_threshold=prune_threshold)
+
+class Calibration:
+    '''
+    校准器
+
+    Args:
+        pop_size: 人口大小
+        layer_config: 基础层配置（见 ContactNetwork.create_custom_population）
+        countries_config: 基础国家配置
+        sim_pars: 基础模拟参数（不含 pop_size）
+        data: 观测数据 {结果键: 按天排列的数组}，例如 {'cum_diagnoses': [...]}，缺失值用 nan
+        parameter_space: {参数名: (下限, 上限) 或 (下限, 上限, 'int')}，参数名格式见模块说明
+        weights: 可选，各结果键的误差权重
+        pop_seed: 构建人口使用的随机种子（固定种子使不同候选使用相同结构的人口，并使缓存可复用）
+        prune_day: 早停剪枝的检查日期（天数），None 表示不剪枝
+        prune_factor: 部分误差超过 至今最优的 n_elite 个候选中最差的部分误差 × prune_factor 时放弃该候选
+        cache_size: 每个进程最多缓存的人口数量
+    '''
+
+    def __init__(self, pop_size, layer_config, countries_config, sim_pars, data, parameter_space,
+                 weights=None, pop_seed=1, prune_day=None, prune_factor=2.0, cache_size=8):
+        self.pop_size = int(pop_size)
+        self.layer_config = layer_config
+        self.countries_config = countries_config
+        self.sim_pars = dict(sim_pars)
+        self.data = {key: np.asarray(values, dtype=float) for key, values in data.items()}
+        self.weights = weights or {key: 1.0 for key in self.data}
+        self.pop_seed = pop_seed
+        self.prune_day = prune_day
+        self.prune_factor = prune_factor
+        self.cache_size = cache_size
+
+        self.names = list(parameter_space.keys())
+        self.lows, self.highs, self.is_int = [], [], []
+        for name, spec in parameter_space.items():
+            if len(spec) not in (2, 3) or spec[0] >= spec[1]:
+                raise ValueError(f"参数 '{name}' 的范围不合法，应为 (下限, 上限) 或 (下限, 上限, 'int'): {spec}")
+            self.lows.append(float(spec[0]))
+            self.highs.append(float(spec[1]))
+            self.is_int.append(len(spec) == 3 and spec[2] == 'int')
+            if name.startswith('layer:') and name.count(':') < 2:
+                raise ValueError(f"层参数名应为 'layer:<层名>:<键>': {name}")
+            if name.startswith(('rel_sus:', 'rel_trans:')) and '=' not in name:
+                raise ValueError(f"分组因子参数名应为 'rel_sus:<属性>=<取值>': {name}")
+            if name.startswith('country:') and name[len('country:'):] not in countries_config:
+                raise ValueError(f"国家 '{name[len('country:'):]}' 不在 countries_config 中")
+        self.lows = np.array(self.lows)
+        self.highs = np.array(self.highs)
+        self.is_int = np.array(self.is_int)
+
+        self.state = None
+
+    #%% 参数映射
+
+    def decode(self, z):
+        '''将 [0, 1] 归一化空间中的点转换为参数字典'''
+        values = self.lows + np.clip(z, 0, 1) * (self.highs - self.lows)
+        values = np.where(self.is_int, np.round(values), values)
+        return {name: (int(v) if is_int else float(v)) for name, v, is_int in zip(self.names, values, self.is_int)}
+
+    def encode(self, params):
+        '''将参数字典转换为 [0, 1] 归一化空间中的点'''
+        values = np.array([params[name] for name in self.names], dtype=float)
+        return (values - self.lows) / (self.highs - self.lows)
+
+    def apply_params(self, params):
+        '''
+        将候选参数应用到基础配置上
+
+        Returns:
+            tuple: (layer_config, countries_config, sim_pars, group_factors)
+                group_factors: [(目标数组名, 属性名, 取值, 因子)]
+        '''
+        layer_config = {name: dict(config) for name, config in self.layer_config.items()}
+        countries_config = dict(self.countries_config)
+        sim_pars = dict(self.sim_pars)
+        group_factors = []
+        fixed_props = {}
+
+        for name, value in params.items():
+            if name.startswith('layer:'):
+                _, layer_name, key = name.split(':', 2)
+                layer_config[layer_name][key] = value
+            elif name.startswith('country:'):
+                fixed_props[name[len('country:'):]] = value
+            elif name.startswith(('rel_sus:', 'rel_trans:')):
+                target, condition = name.split(':', 1)
+                attr, attr_value = condition.split('=', 1)
+                group_factors.append((target, attr, attr_value, value))
+            else:
+                sim_pars[name] = value
+
+        if fixed_props:
+            countries_config = self._set_proportions(countries_config, fixed_props)
+        return layer_config, countries_config, sim_pars, group_factors
+
+    @staticmethod
+    def _set_proportions(countries_config, fixed_props):
+        '''设置部分国家的比例，其余国家按原有比例分配剩余部分'''
+        def proportion(value):
+            return value['proportion'] if isinstance(value, dict) else value
+
+        remaining = 1.0 - sum(fixed_props.values())
+        if remaining < 0:
+            raise ValueError(f"国家比例之和超过 1: {fixed_props}")
+        others = {c: proportion(v) for c, v in countries_config.items() if c not in fixed_props}
+        others_total = sum(others.values())
+
+        output = {}
+        for country, value in countries_config.items():
+            if country in fixed_props:
+                prop = fixed_props[country]
+            else:
+                prop = remaining * others[country] / others_total if others_total > 0 else remaining / len(others)
+            output[country] = dict(value, proportion=prop) if isinstance(value, dict) else prop
+        return output
+
+    def get_population(self, layer_config, countries_config):
+        '''获取人口（同一进程内按配置缓存，LRU 淘汰）'''
+        key = json.dumps([layer_config, countries_config], sort_keys=True, default=str)
+        if key in _population_cache:
+            _population_cache.move_to_end(key)
+            return _population_cache[key]
+
+        cv.set_seed(self.pop_seed)  # 同时设置 Numpy 和 Numba 的随机数，保证同一配置构建出同一人口
+        popdict, _ = ContactNetwork.create_custom_population(self.pop_size, layer_config, countries_config)
+        _population_cache[key] = popdict
+        while len(_population_cache) > self.cache_size:
+            _population_cache.popitem(last=False)
+        return popdict
+
+    #%% 评估
+
+    def loss(self, sim, partial=False):
+        '''计算模拟与观测数据之间的加权误差；partial=True 时只比较已经运行的日期'''
+        total = 0.0
+        for key, data_values in self.data.items():
+            if partial:
+                sim_values = partial_result(sim, key)
+                data_values = data_values[:len(sim_values)]
+            else:
+                sim_values = sim.results[key].values
+            total += self.weights.get(key, 1.0) * mismatch(sim_values, data_values)
+        return total
+
+    def evaluate(self, params, seed=None, prune_threshold=None):
+        '''
+        评估一个候选参数
+
+        Args:
+            params: 参数字典
+            seed: 模拟随机种子
+            prune_threshold: 部分误差超过该值时放弃（None 表示不剪枝）
+
+        Returns:
+            dict: {'loss': 误差, 'partial_loss': 部分误差（未剪枝检查时为 None）, 'pruned': 是否被剪枝}
+        '''
+        layer_config, countries_config, sim_pars, group_factors = self.apply_params(params)
+        popdict = self.get_population(layer_config, countries_config)
+
+        pars = dict(sim_pars, pop_size=self.pop_size, verbose=0)
+        if seed is not None:
+            pars['rand_seed'] = seed
+        sim = cv.Sim(pars=pars)
+        sim.popdict = popdict
+        sim.reset_layer_pars()
+        sim.initialize()
+        ContactNetwork.attach_custom_attributes(sim.people, popdict)
+        for target, attr, attr_value, factor in group_factors:
+            ContactNetwork.scale_agent_values(sim.people, target, factor, ContactNetwork.attribute_mask(sim.people, attr, attr_value))
+
+        partial_loss = None
+        if self.prune_day is not None and 0 < self.prune_day < sim.npts:
+            sim.run(until=self.prune_day)
+            partial_loss = self.loss(sim, partial=True)
+            if prune_threshold is not None and partial_loss > prune_threshold:
+                return {'loss': np.inf, 'partial_loss': partial_loss, 'pruned': True}
+        # 继续运行时不重置随机数，保证没有被剪枝的候选与不剪枝时使用相同的随机数序列
+        sim.run(reset_seed=partial_loss is None)
+        return {'loss': self.loss(sim), 'partial_loss': partial_loss, 'pruned': False}
+
+    #%% 优化
+
+    def _init_state(self, popsize, n_elite, seed, initial):
+        mean = np.full(len(self.names), 0.5) if initial is None else self.encode(initial)
+        return {
+            'generation': 0,
+            'mean': mean,
+            'std': np.full(len(self.names), 0.3),
+            'rng_state': np.random.default_rng(seed).bit_generator.state,
+            'popsize': popsize,
+            'n_elite': n_elite,
+            'best_params': None,
+            'best_loss': np.inf,
+            'elite_partial_losses': [],
+            'history': [],
+        }
+
+    def run(self, n_generations=10, popsize=16, n_elite=None, n_cpus=None, seed=1, initial=None,
+            learning_rate=0.7, min_std=0.02, checkpoint_file=None, resume=True, verbose=True):
+        '''
+        运行校准
+
+        Args:
+            n_generations: 总代数（从检查点恢复时包括已完成的代数）
+            popsize: 每代候选数
+            n_elite: 每代用于更新分布的精英样本数，默认 popsize 的四分之一
+            n_cpus: 工作进程数，None 表示使用全部 CPU；1 表示在当前进程中串行评估
+            seed: 优化器随机种子；第 g 代的所有候选使用相同的模拟种子 seed + g（公共随机数）
+            initial: 可选的初始参数字典，作为搜索分布的初始均值
+            learning_rate: 分布更新的平滑系数
+            min_std: 归一化空间中标准差的下限，防止过早收敛
+            checkpoint_file: 检查点文件路径，每代结束后保存
+            resume: 检查点文件存在时是否从中恢复
+            verbose: 是否打印每代进度
+
+        Returns:
+            dict: {'best_params': 最优参数, 'best_loss': 最优误差, 'history': 每次评估的记录}
+        '''
+        n_elite = n_elite or max(2, popsize // 4)
+        if checkpoint_file and resume and os.path.exists(checkpoint_file):
+            with open(checkpoint_file, 'rb') as f:
+                self.state = pickle.load(f)
+            if verbose:
+                print(f"从检查点恢复：已完成 {self.state['generation']} 代，当前最优误差 {self.state['best_loss']:.4f}")
+        else:
+            self.state = self._init_state(popsize, n_elite, seed, initial)
+        state = self.state
+
+        shared = {'calibration': self}
+        n_cpus = min(n_cpus or os.cpu_count() or 1, state['popsize'])
+        pool = None
+        _shared.clear()
+        _shared.update(shared)
+        try:
+            if n_cpus > 1:
+                if 'fork' in mp.get_all_start_methods():
+                    pool = mp.get_context('fork').Pool(n_cpus)
+                else:
+                    pool = mp.get_context('spawn').Pool(n_cpus, initializer=_init_worker, initargs=(shared,))
+
+            while state['generation'] < n_generations:
+                generation = state['generation']
+                rng = np.random.default_rng()
+                rng.bit_generator.state = state['rng_state']
+                z = np.clip(state['mean'] + state['std'] * rng.standard_normal((state['popsize'], len(self.names))), 0, 1)
+                candidates = [self.decode(zi) for zi in z]
+
+                # 剪枝阈值：至今最优的 n_elite 个候选中最差的部分误差 × prune_factor
+                threshold = None
+                if self.prune_day is not None and len(state['elite_partial_losses']) >= state['n_elite']:
+                    threshold = max(partial for _, partial in state['elite_partial_losses']) * self.prune_factor
+                tasks = [(i, params, seed + generation, threshold) for i, params in enumerate(candidates)]
+                if pool is None:
+                    outputs = dict(_evaluate_task(task) for task in tasks)
+                else:
+                    outputs = dict(pool.imap_unordered(_evaluate_task, tasks))
+
+                losses = np.array([outputs[i]['loss'] for i in range(len(candidates))])
+                for i, params in enumerate(candidates):
+                    state['history'].append(dict(generation=generation, params=params, **outputs[i]))
+                    if losses[i] < state['best_loss']:
+                        state['best_loss'] = float(losses[i])
+                        state['best_params'] = params
+                    if not outputs[i]['pruned'] and outputs[i]['partial_loss'] is not None:
+                        state['elite_partial_losses'].append((float(losses[i]), outputs[i]['partial_loss']))
+                state['elite_partial_losses'] = sorted(state['elite_partial_losses'])[:state['n_elite']]
+
+                # 交叉熵更新：用精英样本的均值和标准差平滑更新搜索分布
+                # 排序时完整评估的候选在前（按误差），被剪枝的候选在后（按部分误差）
+                partials = np.array([outputs[i]['partial_loss'] if outputs[i]['pruned'] else 0.0 for i in range(len(candidates))])
+                elites = np.lexsort((losses, partials, ~np.isfinite(losses)))[:state['n_elite']]
+                if len(elites) > 0:
+                    state['mean'] = (1 - learning_rate) * state['mean'] + learning_rate * z[elites].mean(axis=0)
+                    elite_std = z[elites].std(axis=0) if len(elites) > 1 else state['std']
+                    state['std'] = np.maximum((1 - learning_rate) * state['std'] + learning_rate * elite_std, min_std)
+                state['rng_state'] = rng.bit_generator.state
+                state['generation'] += 1
+
+                if checkpoint_file:
+                    tmp_file = checkpoint_file + '.tmp'
+                    with open(tmp_file, 'wb') as f:
+                        pickle.dump(state, f)
+                    os.replace(tmp_file, checkpoint_file)
+                if verbose:
+                    n_pruned = sum(outputs[i]['pruned'] for i in outputs)
+                    print(f"第 {generation + 1}/{n_generations} 代：本代最优误差 {np.min(losses):.4f}，"
+                          f"全局最优误差 {state['best_loss']:.4f}，剪枝 {n_pruned}/{len(candidates)}")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            _shared.clear()
+
+        return {'best_params': state['best_params'], 'best_loss': state['best_loss'], 'history': state['history']}
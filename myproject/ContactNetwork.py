@@ -1,3 +1,4 @@
+import functools
 import numpy as np
 import covasim as cv
 import Enums
@@ -18,6 +19,8 @@ def validate_countries_config(countries_config):
             }
             例如：{'A': 0.6, 'B': 0.4} 表示 A 占60%，B 占40%
             注意：所有比例之和必须等于1.0
+            值也可以是字典 {'proportion': 比例, 'age_pyramid': ..., 'sex_ratio': ...}，
+            人口学部分的校验见 validate_demographics
     
     Returns:
         tuple: (country_names, proportions) - 国家名列表和比例列表
@@ -34,16 +37,23 @@ def validate_countries_config(countries_config):
     if len(countries_config) == 0:
         raise ValueError("countries_config 不能为空，至少需要指定一个国家")
     
-    # 提取国家名和比例
+    # 提取国家名和比例（值可以直接是比例，也可以是带 'proportion' 键的人口学配置字典）
     country_names = list(countries_config.keys())
-    proportions = list(countries_config.values())
+    proportions = []
     
     # 校验比例是否为数值类型
-    for country, prop in countries_config.items():
+    for country, value in countries_config.items():
+        if isinstance(value, dict):
+            if 'proportion' not in value:
+                raise ValueError(f"国家 '{country}' 的配置字典缺少 'proportion' 键")
+            prop = value['proportion']
+        else:
+            prop = value
         if not isinstance(prop, (int, float)):
             raise TypeError(f"国家 '{country}' 的比例必须是数值类型，当前类型: {type(prop)}")
         if prop < 0:
             raise ValueError(f"国家 '{country}' 的比例不能为负数: {prop}")
+        proportions.append(prop)
     
     # 计算比例总和
     total_proportion = sum(proportions)
@@ -65,7 +75,611 @@ def validate_countries_config(countries_config):
     
     return country_names, proportions
 
-def create_custom_population(pop_size, layer_config, countries_config):
+# 未指定年龄金字塔时的默认年龄分布：与早期版本一致的 18-65 岁均匀分布
+DEFAULT_AGE_PYRAMID = {'bins': [18, 65], 'weights': [1.0]}
+DEFAULT_SEX_RATIO = 0.5
+
+def validate_demographics(countries_config):
+    '''
+    校验并提取每个国家的人口学配置（年龄金字塔和性别比例）
+    
+    Args:
+        countries_config: 国家配置字典，值为比例或如下格式的字典：
+            {
+                'proportion': 0.6,
+                'age_pyramid': {
+                    'bins': [0, 15, 65, 100],     # 年龄分段边界（严格递增）
+                    'weights': [0.2, 0.7, 0.1],   # 各年龄段的人口占比（无需归一化）
+                },
+                'sex_ratio': 0.51,                # 男性（sex=1）占比
+            }
+            未指定的项使用 DEFAULT_AGE_PYRAMID / DEFAULT_SEX_RATIO
+    
+    Returns:
+        tuple: 每个国家的 (country_name, bins, weights, sex_ratio) 元组组成的元组，
+            可直接作为缓存键使用
+    
+    Raises:
+        TypeError: 如果年龄金字塔不是字典类型
+        ValueError: 如果分段边界、权重或性别比例不合法
+    '''
+    demographics = []
+    for country, value in countries_config.items():
+        value = value if isinstance(value, dict) else {}
+        pyramid = value.get('age_pyramid') or DEFAULT_AGE_PYRAMID
+        sex_ratio = value.get('sex_ratio', DEFAULT_SEX_RATIO)
+        
+        if not isinstance(pyramid, dict):
+            raise TypeError(f"国家 '{country}' 的 age_pyramid 必须是字典类型，当前类型: {type(pyramid)}")
+        bins = tuple(float(b) for b in pyramid.get('bins', ()))
+        weights = tuple(float(w) for w in pyramid.get('weights', ()))
+        
+        if len(bins) < 2 or len(weights) != len(bins) - 1:
+            raise ValueError(
+                f"国家 '{country}' 的 age_pyramid 不合法：需要 n+1 个 bins 和 n 个 weights，"
+                f"当前 bins={len(bins)} 个, weights={len(weights)} 个"
+            )
+        if np.any(np.diff(bins) <= 0) or bins[0] < 0:
+            raise ValueError(f"国家 '{country}' 的 age_pyramid bins 必须非负且严格递增: {bins}")
+        if min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError(f"国家 '{country}' 的 age_pyramid weights 必须非负且总和大于0: {weights}")
+        if not isinstance(sex_ratio, (int, float)) or not 0 <= sex_ratio <= 1:
+            raise ValueError(f"国家 '{country}' 的 sex_ratio 必须是 [0, 1] 之间的数值: {sex_ratio}")
+        
+        demographics.append((country, bins, weights, float(sex_ratio)))
+    
+    return tuple(demographics)
+
+@functools.lru_cache(maxsize=32)
+def _build_demography_tables(demographics):
+    '''
+    将各国年龄金字塔拼接成一张逆 CDF 查找表（按配置缓存，重复构建时无需重新计算）
+    
+    第 c 个国家的累积分布整体平移 c，这样所有国家的表可以拼接成一个单调数组，
+    一次 searchsorted 即可完成所有人的抽样
+    
+    Returns:
+        dict: 'cdf'（平移后的累积分布上界）, 'cdf_lower'（对应下界）, 'age_lower', 'age_width',
+            'sex_ratio'（按国家编号排列）
+    '''
+    cdf, cdf_lower, age_lower, age_width, sex_ratio = [], [], [], [], []
+    for code, (_, bins, weights, ratio) in enumerate(demographics):
+        w = np.asarray(weights) / np.sum(weights)
+        upper = np.cumsum(w)
+        upper[-1] = 1.0
+        cdf.append(upper + code)
+        cdf_lower.append(upper - w + code)
+        age_lower.append(np.asarray(bins[:-1]))
+        age_width.append(np.diff(bins))
+        sex_ratio.append(ratio)
+    
+    tables = {
+        'cdf': np.concatenate(cdf),
+        'cdf_lower': np.concatenate(cdf_lower),
+        'age_lower': np.concatenate(age_lower),
+        'age_width': np.concatenate(age_width),
+        'sex_ratio': np.array(sex_ratio),
+    }
+    for arr in tables.values():
+        arr.flags.writeable = False  # 缓存对象被多次构建共享，禁止原地修改
+    return tables
+
+def sample_demographics(country_codes, countries_config):
+    '''
+    按国家分组一次性向量化抽样年龄和性别
+    
+    Args:
+        country_codes: 每个人所属国家的编号数组（与 countries_config 的键顺序一致）
+        countries_config: 国家配置字典，见 validate_demographics
+    
+    Returns:
+        tuple: (ages, sexes)
+    '''
+    tables = _build_demography_tables(validate_demographics(countries_config))
+    
+    # 逆 CDF：u + code 落在第 code 个国家的表内，searchsorted 直接给出年龄段
+    u = np.random.random(len(country_codes))
+    bin_inds = np.searchsorted(tables['cdf'], u + country_codes, side='right')
+    
+    # 在年龄段内按剩余概率质量线性插值，等价于段内均匀分布
+    lower = tables['cdf_lower'][bin_inds]
+    frac = (u + country_codes - lower) / (tables['cdf'][bin_inds] - lower)
+    ages = tables['age_lower'][bin_inds] + np.clip(frac, 0, 1) * tables['age_width'][bin_inds]
+    
+    sexes = np.random.binomial(1, tables['sex_ratio'][country_codes])
+    
+    return ages, sexes
+
+# popdict 中按人排列的数组的类型策略：
+#   default: 与以前相同（年龄 float64、性别 int64）
+#   compact: 面向千万级人口，年龄 float32、性别 int8，国家只保存 int8 的编号 country_code 和国家名表
+#            country_names，不保存字符串数组 country（按人排列的列中最大的一列）
+# uid、簇编号和边列表（p1、p2）在两种策略下都是 int32；Covasim People 内部的数组总是
+# default_float（float32），与这里的策略无关。'country' 为 None 表示不保存字符串数组，
+# 读取国家时用 country_codes / country_labels，两种保存方式都适用
+DTYPE_POLICIES = {
+    'default': {'uid': cv.default_int, 'age': np.float64, 'sex': np.int64, 'country': np.str_, 'country_code': None,
+                'cluster': cv.default_int},
+    'compact': {'uid': np.int32, 'age': np.float32, 'sex': np.int8, 'country': None, 'country_code': np.int8,
+                'cluster': np.int32},
+}
+
+def resolve_dtype_policy(dtype_policy='default'):
+    '''
+    解析类型策略
+    
+    Args:
+        dtype_policy: 'default'、'compact'，或以 'default' 为基础覆盖部分键的字典，
+            例如 {'age': np.float32}；'country_code' 为 None 表示不保存国家编号，'country' 为 None
+            表示不保存国家名字符串数组（两者不能都为 None）
+    
+    Returns:
+        dict: {数组名: numpy 类型或 None}
+    
+    Raises:
+        ValueError: 如果策略名未知、包含未知的键，或 country 和 country_code 都不保存
+    '''
+    if isinstance(dtype_policy, str):
+        if dtype_policy not in DTYPE_POLICIES:
+            raise ValueError(f"未知的 dtype_policy: {dtype_policy!r}，可选: {list(DTYPE_POLICIES)}")
+        return dict(DTYPE_POLICIES[dtype_policy])
+    unknown = set(dtype_policy) - set(DTYPE_POLICIES['default'])
+    if unknown:
+        raise ValueError(f"dtype_policy 包含未知的键: {sorted(unknown)}，可选: {list(DTYPE_POLICIES['default'])}")
+    policy = dict(DTYPE_POLICIES['default'], **dtype_policy)
+    if policy['country'] is None and policy['country_code'] is None:
+        raise ValueError("dtype_policy 中 'country' 和 'country_code' 不能都为 None，否则无法得知每个人的国家")
+    return {key: (None if value is None else np.dtype(value).type) for key, value in policy.items()}
+
+# 聚类层（家庭/学校/工作场所）的默认参数：
+#   cluster_size: 平均簇大小；age_band: 分簇前按多少岁一档分组（None 表示不按年龄分组）
+CLUSTERED_LAYER_DEFAULTS = {
+    Enums.NetWorkType.household.name: {'cluster_size': 3.0, 'age_band': None},
+    Enums.NetWorkType.school.name: {'cluster_size': 20.0, 'age_band': 1},
+    Enums.NetWorkType.workplace.name: {'cluster_size': 10.0, 'age_band': None},
+}
+
+# 逐国生成的网络类型实际使用的参数及其默认值（与 _make_per_country_contacts 一致）
+PER_COUNTRY_LAYER_DEFAULTS = {
+    Enums.NetWorkType.scale_free.name: {'m_connections': 2},
+    Enums.NetWorkType.random.name: {'n_contacts': 10},
+    Enums.NetWorkType.microstructured.name: {'cluster_size': 3.0},
+}
+
+def validate_layer_config(layer_config):
+    '''
+    校验层配置字典（格式见 create_custom_population）
+    
+    每个层必须指定已知的 network_type；该类型实际使用的参数（scale_free 的 m_connections、
+    random 的 n_contacts、microstructured/聚类层的 cluster_size 等）如果给出则必须合法，
+    不使用的参数可以为 None
+    
+    Args:
+        layer_config: 层配置字典
+    
+    Returns:
+        list: 层名列表
+    
+    Raises:
+        TypeError: 如果 layer_config 或某个层的配置不是字典类型，或参数不是数值类型
+        ValueError: 如果 layer_config 为空，或网络类型未知，或参数取值不合法
+    '''
+    if not isinstance(layer_config, dict):
+        raise TypeError(f"layer_config 必须是字典类型，当前类型: {type(layer_config)}")
+    if len(layer_config) == 0:
+        raise ValueError("layer_config 不能为空，至少需要指定一个层")
+    
+    def check_number(layer_name, key, value, minimum, integer=False, strict=False):
+        if isinstance(value, bool) or not isinstance(value, (int, float, np.number)):
+            raise TypeError(f"层 '{layer_name}' 的 {key} 必须是数值类型，当前值: {value!r}")
+        if integer and int(value) != value:
+            raise ValueError(f"层 '{layer_name}' 的 {key} 必须是整数: {value}")
+        if value < minimum or (strict and value == minimum):
+            raise ValueError(f"层 '{layer_name}' 的 {key} 必须{'大于' if strict else '不小于'} {minimum}: {value}")
+    
+    valid_types = list(PER_COUNTRY_LAYER_DEFAULTS) + list(CLUSTERED_LAYER_DEFAULTS)
+    for layer_name, config in layer_config.items():
+        if not isinstance(config, dict):
+            raise TypeError(f"层 '{layer_name}' 的配置必须是字典类型，当前类型: {type(config)}")
+        network_type = config.get('network_type')
+        if network_type not in valid_types:
+            raise ValueError(f"层 '{layer_name}' 的 network_type 未知: {network_type!r}，可选: {valid_types}")
+        
+        if config.get('beta') is not None:
+            check_number(layer_name, 'beta', config['beta'], 0)
+        age_range = config.get('age_range')
+        if age_range is not None:
+            if not isinstance(age_range, (tuple, list)) or len(age_range) != 2:
+                raise ValueError(f"层 '{layer_name}' 的 age_range 必须是 (min_age, max_age) 或 None: {age_range!r}")
+            check_number(layer_name, 'age_range', age_range[0], 0)
+            check_number(layer_name, 'age_range', age_range[1], 0)
+            if age_range[0] >= age_range[1]:
+                raise ValueError(f"层 '{layer_name}' 的 age_range 下限必须小于上限: {age_range}")
+        if not isinstance(config.get('compact', False), (bool, np.bool_)):
+            raise TypeError(f"层 '{layer_name}' 的 compact 必须是布尔值: {config['compact']!r}")
+        
+        if network_type == Enums.NetWorkType.scale_free.name:
+            check_number(layer_name, 'm_connections', config.get('m_connections', 2), 1, integer=True)
+        elif network_type == Enums.NetWorkType.random.name:
+            check_number(layer_name, 'n_contacts', config.get('n_contacts', 10), 0, strict=True)
+        elif network_type == Enums.NetWorkType.microstructured.name:
+            check_number(layer_name, 'cluster_size', config.get('cluster_size', 3.0), 0, strict=True)
+        else:
+            if config.get('cluster_size') is not None:
+                check_number(layer_name, 'cluster_size', config['cluster_size'], 1)
+            if config.get('age_band') is not None:
+                check_number(layer_name, 'age_band', config['age_band'], 0, strict=True)
+            distribution = config.get('size_distribution')
+            if distribution is not None:
+                if not isinstance(distribution, dict) or len(distribution) == 0:
+                    raise TypeError(f"层 '{layer_name}' 的 size_distribution 必须是非空字典 {{簇大小: 权重}}")
+                for size, weight in distribution.items():
+                    check_number(layer_name, 'size_distribution 的簇大小', size, 1, integer=True)
+                    check_number(layer_name, 'size_distribution 的权重', weight, 0)
+                if sum(distribution.values()) <= 0:
+                    raise ValueError(f"层 '{layer_name}' 的 size_distribution 权重总和必须大于0")
+    
+    return list(layer_config.keys())
+
+def draw_cluster_sizes(n, cluster_size=3.0, size_distribution=None):
+    '''
+    抽样簇大小，直到总人数不少于 n
+    
+    Args:
+        n: 需要覆盖的人数
+        cluster_size: 平均簇大小，按 1 + Poisson(cluster_size - 1) 抽样（保证每簇至少 1 人）
+        size_distribution: 可选，簇大小分布字典 {簇大小: 权重}，指定后忽略 cluster_size
+    
+    Returns:
+        np.ndarray: 簇大小数组，总和 >= n
+    '''
+    if size_distribution is not None:
+        values = np.array(list(size_distribution.keys()), dtype=np.int64)
+        weights = np.array(list(size_distribution.values()), dtype=float)
+        if np.any(values < 1) or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError(f"size_distribution 不合法，簇大小必须 >= 1 且权重非负: {size_distribution}")
+        weights /= weights.sum()
+        mean_size = float(np.dot(values, weights))
+        draw = lambda k: np.random.choice(values, size=k, p=weights)
+    else:
+        if cluster_size is None or cluster_size < 1:
+            raise ValueError(f"cluster_size 必须 >= 1: {cluster_size}")
+        mean_size = float(cluster_size)
+        draw = lambda k: np.random.poisson(mean_size - 1, size=k) + 1
+    
+    # 一次多抽一些，极少数情况下不够再补抽
+    chunks = []
+    total = 0
+    while total < n:
+        chunk = draw(int((n - total) / mean_size * 1.1) + 16)
+        chunks.append(chunk)
+        total += chunk.sum()
+    return np.concatenate(chunks)
+
+def cluster_group_keys(country_codes, ages, age_band, n_countries):
+    '''
+    聚类层的分组键：国家编号（保证国家隔离），可选再叠加年龄段（例如学校按年级分班）
+    
+    键为 年龄段 × 国家数 + 国家编号，只取决于国家数而不取决于人口中的最大年龄，因此之后追加的
+    代理（PopulationGrowth）与构建时的代理得到相同的键，不同的 (国家, 年龄段) 也不会冲突
+    
+    Args:
+        country_codes: 每个人的国家编号（countries_config 的顺序）
+        ages: 每个人的年龄
+        age_band: 每档的岁数，None 或 0 表示不按年龄分组
+        n_countries: 国家数
+    
+    Returns:
+        np.ndarray: int64 的分组键
+    '''
+    keys = np.asarray(country_codes).astype(np.int64)
+    if age_band:
+        keys = keys + (np.asarray(ages) // age_band).astype(np.int64) * n_countries
+    return keys
+
+def make_clustered_contacts(members, group_keys=None, cluster_size=3.0, size_distribution=None):
+    '''
+    批量生成聚类（团）接触：成员先按 group_keys 分组并在组内随机打乱，再切分成簇，簇内两两相连
+    
+    与 cv.make_microstructured_contacts 不同，这里不逐簇循环：簇边界由簇大小的累积和与分组
+    边界合并得到，团内所有边通过 repeat/偏移量运算一次性生成。簇不会跨越分组，因此用国家编号
+    作为（部分）分组键即可保证不同国家之间没有连接。
+    
+    Args:
+        members: 参与该层的人员索引数组
+        group_keys: 与 members 对齐的整数分组键（例如 国家编号 与 年龄段 的组合），None 表示不分组
+        cluster_size: 平均簇大小，见 draw_cluster_sizes
+        size_distribution: 可选的簇大小分布，见 draw_cluster_sizes
+    
+    Returns:
+        tuple: (contacts, cluster_ids)
+            contacts: {'p1': ..., 'p2': ...} 边列表（每条无向边只出现一次）
+            cluster_ids: 与 members 对齐的簇编号数组
+    '''
+    members = np.asarray(members)
+    n = len(members)
+    if n == 0:
+        empty = np.array([], dtype=cv.default_int)
+        return {'p1': empty, 'p2': empty.copy()}, empty.copy()
+    
+    # 组内随机打乱：lexsort 以最后一个键为主键
+    if group_keys is None:
+        order = np.random.permutation(n)
+        group_starts = np.array([], dtype=np.int64)
+    else:
+        group_keys = np.asarray(group_keys)
+        order = np.lexsort((np.random.random(n), group_keys))
+        group_starts = np.flatnonzero(np.diff(group_keys[order])) + 1
+    sorted_members = members[order]
+    
+    # 簇的起点 = 簇大小累积和 ∪ 分组起点（跨组的簇在组边界处被截断）
+    cuts = np.cumsum(draw_cluster_sizes(n, cluster_size, size_distribution))
+    starts = np.union1d(np.concatenate(([0], cuts[cuts < n])), group_starts)
+    sizes = np.diff(np.append(starts, n))
+    p1_pos, p2_pos, cluster_of_pos = _clique_edge_positions(starts, sizes, n)
+    
+    contacts = {
+        'p1': sorted_members[p1_pos].astype(cv.default_int, copy=False),
+        'p2': sorted_members[p2_pos].astype(cv.default_int, copy=False),
+    }
+    cluster_ids = np.empty(n, dtype=cv.default_int)
+    cluster_ids[order] = cluster_of_pos
+    
+    return contacts, cluster_ids
+
+def _make_clustered_contacts_chunked(members, group_keys, cluster_size, size_distribution, chunk_members=None):
+    '''
+    分批调用 make_clustered_contacts：成员按分组键排序后切成不超过 chunk_members 人的批次，
+    每批的临时数组只与批次大小有关，结果边列表以 int32 拼接
+    
+    Returns:
+        tuple: (contacts, cluster_ids)，与 make_clustered_contacts 相同（簇编号在各批之间连续）
+    '''
+    if chunk_members is None or len(members) <= chunk_members:
+        return make_clustered_contacts(members, group_keys=group_keys, cluster_size=cluster_size,
+                                       size_distribution=size_distribution)
+    
+    order = np.argsort(group_keys, kind='stable')
+    all_p1, all_p2 = [], []
+    cluster_ids = np.empty(len(members), dtype=cv.default_int)
+    offset = 0
+    for start in range(0, len(members), int(chunk_members)):
+        part = order[start:start + int(chunk_members)]
+        contacts, part_clusters = make_clustered_contacts(members[part], group_keys=group_keys[part],
+                                                          cluster_size=cluster_size, size_distribution=size_distribution)
+        all_p1.append(contacts['p1'])
+        all_p2.append(contacts['p2'])
+        cluster_ids[part] = part_clusters + offset
+        offset += int(part_clusters.max()) + 1
+    return {'p1': np.concatenate(all_p1), 'p2': np.concatenate(all_p2)}, cluster_ids
+
+class AgeIndex:
+    '''
+    按国家分组、组内按年龄排序的人员索引，用于 age_range 筛选
+    
+    构建一次（O(N log N)）后，任意 age_range 在每个国家内都是两次 searchsorted 得到的一段连续区间，
+    不再需要为每个层、每个国家计算 (ages >= min_age) & (ages < max_age) 的整列掩码。
+    select 返回的下标按 uid 升序排列（与掩码筛选的结果完全相同），因此生成的网络与逐个掩码筛选时一致。
+    
+    Args:
+        country_codes: 每个人的国家编号（0 到 n_countries-1）
+        ages: 每个人的年龄
+        n_countries: 国家数，None 表示 country_codes.max() + 1
+    '''
+    
+    def __init__(self, country_codes, ages, n_countries=None):
+        country_codes = np.asarray(country_codes)
+        n_countries = int(country_codes.max()) + 1 if n_countries is None and len(country_codes) else (n_countries or 0)
+        ages = np.asarray(ages)
+        self.n = len(ages)
+        # 按国家分组（组内保持 uid 顺序），以及按 (国家, 年龄) 排序
+        self.by_country = np.argsort(country_codes, kind='stable')
+        self.by_age = np.lexsort((ages, country_codes))
+        self.sorted_ages = ages[self.by_age]
+        self.bounds = np.concatenate([[0], np.cumsum(np.bincount(country_codes, minlength=n_countries))])
+        return
+    
+    def _age_slice(self, code, age_range):
+        lo, hi = self.bounds[code], self.bounds[code + 1]
+        min_age, max_age = age_range
+        start = lo + np.searchsorted(self.sorted_ages[lo:hi], min_age, side='left')
+        stop = lo + np.searchsorted(self.sorted_ages[lo:hi], max_age, side='left')
+        return self.by_age[start:max(start, stop)]
+    
+    def select(self, code=None, age_range=None):
+        '''
+        某个国家（code=None 表示所有国家）中年龄在 [min_age, max_age) 的人
+        
+        Returns:
+            np.ndarray: 按 uid 升序排列的人员下标
+        '''
+        if code is None:
+            if age_range is None:
+                return np.arange(self.n)
+            parts = [self._age_slice(c, age_range) for c in range(len(self.bounds) - 1)]
+            return np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.int64)
+        if age_range is None:
+            return self.by_country[self.bounds[code]:self.bounds[code + 1]]
+        return np.sort(self._age_slice(code, age_range))
+
+def _reference_scale_free(n, config):
+    return cv.make_scale_free_contacts(n, m_connections=config.get('m_connections', 2))
+
+def _reference_random(n, config):
+    return cv.make_random_contacts(n, n=config.get('n_contacts', 10))
+
+def _reference_microstructured(n, config):
+    return cv.make_microstructured_contacts(n, cluster_size=config.get('cluster_size', 3.0))
+
+def _clique_edge_positions(starts, sizes, n):
+    '''
+    按簇的起点和大小生成簇内两两相连的边（位置编号），簇内第 r 个人与其后的 size-1-r 个人相连
+    
+    Returns:
+        tuple: (p1_pos, p2_pos, cluster_of_pos)
+    '''
+    cluster_of_pos = np.repeat(np.arange(len(starts), dtype=cv.default_int), sizes)
+    rank = np.arange(n) - starts[cluster_of_pos]
+    n_out = sizes[cluster_of_pos] - 1 - rank
+    total = int(n_out.sum())
+    idx_dtype = np.int32 if total < np.iinfo(np.int32).max else np.int64
+    p1_pos = np.repeat(np.arange(n, dtype=idx_dtype), n_out)
+    p2_pos = np.arange(1, total + 1, dtype=idx_dtype)
+    p2_pos -= np.repeat((np.cumsum(n_out) - n_out).astype(idx_dtype), n_out)
+    p2_pos += p1_pos
+    return p1_pos, p2_pos, cluster_of_pos
+
+def _fast_random(n, config):
+    '''
+    与 cv.make_random_contacts 同分布的向量化实现：每人发起 round(Poisson(n_contacts)/2) 条边，
+    另一端在组内有放回地均匀抽取（不用 Python 循环逐人扩展列表）
+    '''
+    n_out = np.round(np.random.poisson(config.get('n_contacts', 10), size=n) / 2.0).astype(np.int64)
+    return {
+        'p1': np.repeat(np.arange(n, dtype=cv.default_int), n_out),
+        'p2': np.random.randint(0, n, size=int(n_out.sum())).astype(cv.default_int),
+    }
+
+def _fast_microstructured(n, config):
+    '''
+    与 cv.make_microstructured_contacts 同分布的向量化实现：簇大小 ~ Poisson(cluster_size)
+    （大小为 0 的簇跳过，最后一个簇截断），按编号顺序依次填入，簇内两两相连
+    '''
+    cluster_size = config.get('cluster_size', 3.0)
+    chunks, total = [], 0
+    while total < n:
+        chunk = np.random.poisson(cluster_size, size=int((n - total) / max(cluster_size, 1) * 1.1) + 16)
+        chunks.append(chunk)
+        total += chunk.sum()
+    sizes = np.concatenate(chunks)
+    sizes = sizes[sizes > 0]
+    cuts = np.cumsum(sizes)
+    starts = np.concatenate(([0], cuts[cuts < n]))
+    sizes = np.diff(np.append(starts, n))
+    p1_pos, p2_pos, _ = _clique_edge_positions(starts, sizes, n)
+    return {'p1': p1_pos.astype(cv.default_int), 'p2': p2_pos.astype(cv.default_int)}
+
+# 逐国生成的网络类型的生成引擎：{引擎名: {网络类型: 函数(组内人数, 层配置) -> 组内编号的边列表}}
+#   reference: Covasim 自带的 cv.make_*_contacts（结果的基准）
+#   fast: 向量化的替代实现，需通过 test_network_equivalence.py 的统计等价检验
+NETWORK_ENGINES = {
+    'reference': {
+        Enums.NetWorkType.scale_free.name: _reference_scale_free,
+        Enums.NetWorkType.random.name: _reference_random,
+        Enums.NetWorkType.microstructured.name: _reference_microstructured,
+    },
+    'fast': {
+        Enums.NetWorkType.random.name: _fast_random,
+        Enums.NetWorkType.microstructured.name: _fast_microstructured,
+    },
+}
+
+def _make_per_country_contacts(config, country_codes, ages, engine='reference', age_index=None):
+    '''
+    按 country 逐组调用网络生成函数（scale_free/random/microstructured），并合并为一个层
+    
+    Args:
+        config: 层配置
+        country_codes: 每个人的国家编号（不需要按人保存国家名的字符串数组）
+        ages: 每个人的年龄
+        engine: NETWORK_ENGINES 中的引擎名，该引擎没有实现的网络类型使用 reference
+        age_index: 这些人的 AgeIndex（逐国生成按它的国家编号顺序），None 表示按 country_codes 建立
+    
+    Returns:
+        dict: {'p1': ..., 'p2': ...} 合并后的边列表
+    '''
+    if engine not in NETWORK_ENGINES:
+        raise ValueError(f"未知的网络生成引擎: {engine!r}，可选: {list(NETWORK_ENGINES)}")
+    network_type = config.get('network_type')
+    generate = NETWORK_ENGINES[engine].get(network_type) or NETWORK_ENGINES['reference'].get(network_type)
+    
+    # 按 country 分组，只允许相同 country 的人之间建立连接
+    if age_index is None:
+        age_index = AgeIndex(country_codes, ages)
+    all_p1 = []
+    all_p2 = []
+    
+    # 为每个 country 分别生成网络：该 country 中符合年龄范围的人由 AgeIndex 直接给出
+    for code in range(len(age_index.bounds) - 1):
+        filtered_indices = age_index.select(code, config.get('age_range'))
+        
+        if len(filtered_indices) == 0 or generate is None:
+            continue  # 跳过没有符合年龄条件的人员的组（或未知的网络类型）
+        
+        # 生成该 country 组的接触网络（组内编号），再映射回原始索引
+        country_contacts = generate(len(filtered_indices), config)
+        
+        # 收集该 country 组的连接（保存为数组，避免用 Python 列表逐个累加整数带来的内存开销）
+        all_p1.append(filtered_indices[country_contacts['p1']].astype(cv.default_int, copy=False))
+        all_p2.append(filtered_indices[country_contacts['p2']].astype(cv.default_int, copy=False))
+    
+    # 合并所有 country 组的连接
+    if len(all_p1) > 0:
+        layer_contacts = {
+            'p1': np.concatenate(all_p1),
+            'p2': np.concatenate(all_p2)
+        }
+    else:
+        # 如果没有连接，创建空的网络
+        layer_contacts = {
+            'p1': np.array([], dtype=cv.default_int),
+            'p2': np.array([], dtype=cv.default_int)
+        }
+    
+    return layer_contacts
+
+def compact_layer_edges(p1, p2, beta=None):
+    '''
+    规范化并去重一个层的边：(p1, p2) 与 (p2, p1) 视为同一条边，自环被删除
+    
+    每条边按 (min, max) 排序后打包成一个 int64 键（高 32 位为较小的 uid），再用基于排序的
+    np.unique 去重。重复边的 beta 求和合并：在单条边传播概率较小时，这与两条独立边的总传播
+    概率一致，因此压缩前后每天的期望传播量基本不变，但 Covasim 每步需要遍历的边数减少。
+    
+    Args:
+        p1: 边的一端
+        p2: 边的另一端
+        beta: 每条边的权重，None 表示全部为 1
+    
+    Returns:
+        tuple: (contacts, stats)
+            contacts: {'p1': ..., 'p2': ..., 'beta': ...} 压缩后的边列表（p1 < p2）
+            stats: {'n_before', 'n_after', 'n_self_loops', 'n_duplicates', 'reduction'}
+    '''
+    p1 = np.asarray(p1, dtype=np.int64)
+    p2 = np.asarray(p2, dtype=np.int64)
+    if beta is None:
+        beta = np.ones(len(p1), dtype=cv.default_float)
+    beta = np.asarray(beta)
+    n_before = len(p1)
+    
+    # 删除自环
+    not_self = p1 != p2
+    n_self_loops = n_before - int(not_self.sum())
+    lo = np.minimum(p1[not_self], p2[not_self])
+    hi = np.maximum(p1[not_self], p2[not_self])
+    
+    # 打包成 int64 键后排序去重，重复边的 beta 累加
+    keys, inverse = np.unique((lo << 32) | hi, return_inverse=True)
+    merged_beta = np.bincount(inverse.ravel(), weights=beta[not_self], minlength=len(keys))
+    
+    contacts = {
+        'p1': (keys >> 32).astype(cv.default_int),
+        'p2': (keys & 0xFFFFFFFF).astype(cv.default_int),
+        'beta': merged_beta.astype(cv.default_float),
+    }
+    n_after = len(keys)
+    stats = {
+        'n_before': n_before,
+        'n_after': n_after,
+        'n_self_loops': n_self_loops,
+        'n_duplicates': n_before - n_self_loops - n_after,
+        'reduction': 1 - n_after / n_before if n_before else 0.0,
+    }
+    return contacts, stats
+
+def create_custom_population(pop_size, layer_config, countries_config, compact_edges=False, chunk_members=None,
+                             dtype_policy='default', engine='reference'):
     '''
     创建完全自定义的人口
     
@@ -80,6 +694,9 @@ def create_custom_population(pop_size, layer_config, countries_config):
                     'cluster_size': 如果是聚类结构，指定聚类大小；否则为 None
                 }
             }
+            network_type 为 household/school/workplace 时还可指定：
+                'size_distribution': {簇大小: 权重}，代替 cluster_size 的 Poisson 抽样
+                'age_band': 按多少岁一档分簇（默认见 CLUSTERED_LAYER_DEFAULTS）
         countries_config: 国家配置字典，格式为：
             {
                 'country_name': proportion,  # 国家名: 占总人口的比例（小数）
@@ -87,114 +704,84 @@ def create_custom_population(pop_size, layer_config, countries_config):
             }
             例如：{'A': 0.6, 'B': 0.4} 表示 A 占60%，B 占40%
             注意：所有比例之和必须等于1.0
+            如需按国家设置年龄金字塔和性别比例，值可写成字典，格式见 validate_demographics
+        compact_edges: 是否对每个层的边去重压缩（见 compact_layer_edges），
+            也可在单个层配置中用 'compact': True/False 覆盖；压缩统计保存在 popdict['edge_stats']
+        chunk_members: 聚类层每批最多处理的人数，None 表示一次处理全部成员；用于降低构建大规模
+            人口时的峰值内存（批次边界处最多截断一个簇），通常由 PopulationPlanner 根据内存预算给出
+        dtype_policy: popdict 中数组的类型策略（见 DTYPE_POLICIES 和 resolve_dtype_policy），
+            'compact' 时年龄为 float32、性别为 int8，国家只保存 int8 的 country_code 和 country_names
+        engine: 逐国生成的层（scale_free/random/microstructured）使用的生成引擎，见 NETWORK_ENGINES
     '''
-    # 校验 countries_config 并获取国家名和比例列表
+    # 校验 layer_config 和 countries_config，并获取国家名和比例列表
+    validate_layer_config(layer_config)
     country_names, proportions = validate_countries_config(countries_config)
+    dtypes = resolve_dtype_policy(dtype_policy)
+    if engine not in NETWORK_ENGINES:
+        raise ValueError(f"未知的网络生成引擎: {engine!r}，可选: {list(NETWORK_ENGINES)}")
+    if dtypes['country_code'] is not None and len(country_names) - 1 > np.iinfo(dtypes['country_code']).max:
+        raise ValueError(f"国家数 {len(country_names)} 超出 country_code 类型 {np.dtype(dtypes['country_code'])} 的范围")
     
-    # 创建基本属性
-    uids = np.arange(pop_size, dtype=cv.default_int)
-    ages = np.random.uniform(18, 65, pop_size)
-    sexes = np.random.binomial(1, 0.5, pop_size)
+    # 使用 np.random.choice 根据比例随机分配国家编号；按人的国家名数组是最大的一列，只在类型策略
+    # 需要保存 country 时才生成，构建接触网络只使用国家编号和 AgeIndex
+    country_codes = np.random.choice(len(country_names), size=pop_size, p=proportions)
     
-    # 根据 countries_config 生成 countries 数组
-    # 使用 np.random.choice 根据比例随机分配
-    countries = np.random.choice(country_names, size=pop_size, p=proportions)
+    # 创建基本属性：年龄和性别按各国的年龄金字塔和性别比例抽样
+    uids = np.arange(pop_size, dtype=dtypes['uid'])
+    ages, sexes = sample_demographics(country_codes, countries_config)
+    ages = ages.astype(dtypes['age'], copy=False)
+    sexes = sexes.astype(dtypes['sex'], copy=False)
+    # 索引按国家名排序编号：逐国生成按国家名的顺序，与以前按 np.unique(countries) 分组时的结果相同
+    name_rank = np.argsort(np.argsort(np.array(country_names)))
+    age_index = AgeIndex(name_rank[country_codes], ages, len(country_names))
     
     # 创建接触网络
     contacts = cv.Contacts()
     layer_keys = []
+    clusters = {}  # 聚类层中每个人所属的簇编号（不在该层的人为 -1）
+    edge_stats = {}  # 各层压缩前后的边数统计（仅在启用压缩时记录）
     
     for layer_name, config in layer_config.items():
         layer_keys.append(layer_name)
         
-        # 按 country 分组，只允许相同 country 的人之间建立连接
-        unique_countries = np.unique(countries)
-        all_p1 = []
-        all_p2 = []
-        
-        # 为每个 country 分别生成网络
-        for country in unique_countries:
-            # 筛选出该 country 的所有人员索引
-            country_mask = countries == country
-            country_indices = np.where(country_mask)[0]
-            
-            if len(country_indices) == 0:
-                continue  # 跳过空组
-            
-            # 在该 country 组内，根据年龄范围进一步筛选（如果有）
+        # 家庭/学校/工作场所等聚类层：所有国家一次性批量生成；其余类型逐国生成
+        network_type = config.get('network_type')
+        if network_type in CLUSTERED_LAYER_DEFAULTS:
+            defaults = CLUSTERED_LAYER_DEFAULTS[network_type]
             if config.get('age_range') is not None:
-                min_age, max_age = config['age_range']
-                age_mask = (ages[country_indices] >= min_age) & (ages[country_indices] < max_age)
-                filtered_indices = country_indices[age_mask]
+                members = age_index.select(None, config['age_range'])
             else:
-                filtered_indices = country_indices
-            
-            if len(filtered_indices) == 0:
-                continue  # 跳过没有符合年龄条件的人员的组
+                members = uids
             
-            # 根据网络类型生成该 country 组的接触网络
-            if config.get('network_type') == Enums.NetWorkType.scale_free.name:
-                # 使用无标度网络
-                m = config.get('m_connections', 2)
-                # 为这个 country 组生成无标度网络，使用 filtered_indices 作为映射
-                country_contacts = cv.make_scale_free_contacts(
-                    len(filtered_indices), 
-                    m_connections=m, 
-                    mapping=filtered_indices
-                )
-                
-            elif config.get('network_type') == Enums.NetWorkType.microstructured.name:
-                # 使用聚类结构
-                cluster_size = config.get('cluster_size', 3.0)
-                # 为这个 country 组生成微结构化网络
-                temp_contacts = cv.make_microstructured_contacts(
-                    len(filtered_indices), 
-                    cluster_size=cluster_size
-                )
-                # 映射回原始索引
-                country_contacts = {
-                    'p1': filtered_indices[temp_contacts['p1']],
-                    'p2': filtered_indices[temp_contacts['p2']]
-                }
-                # 如果有 beta 属性，也保留
-                if 'beta' in temp_contacts:
-                    country_contacts['beta'] = temp_contacts['beta']
-                    
-            elif config.get('network_type') == Enums.NetWorkType.random.name:
-                # 使用随机接触
-                n_contacts = config.get('n_contacts', 10)
-                # 为这个 country 组生成随机网络
-                country_contacts = cv.make_random_contacts(
-                    len(filtered_indices), 
-                    n=n_contacts, 
-                    mapping=filtered_indices
-                )
-            else:
-                # 未知的网络类型，跳过
-                continue
+            # 分组键：国家编号（保证国家隔离），可选再叠加年龄段（例如学校按年级分班）
+            group_keys = cluster_group_keys(country_codes[members], ages[members], config.get('age_band', defaults['age_band']),
+                                            len(country_names))
             
-            # 收集该 country 组的连接
-            all_p1.extend(country_contacts['p1'])
-            all_p2.extend(country_contacts['p2'])
-        
-        # 合并所有 country 组的连接
-        if len(all_p1) > 0:
-            layer_contacts = {
-                'p1': np.array(all_p1, dtype=cv.default_int),
-                'p2': np.array(all_p2, dtype=cv.default_int)
-            }
-            # 如果有 beta 属性，也合并（通常随机网络没有，无标度和微结构化可能有）
-            # 这里简化处理，如果需要可以进一步优化
+            cluster_size = config.get('cluster_size')
+            layer_contacts, member_clusters = _make_clustered_contacts_chunked(
+                members,
+                group_keys=group_keys,
+                cluster_size=cluster_size if cluster_size is not None else defaults['cluster_size'],
+                size_distribution=config.get('size_distribution'),
+                chunk_members=chunk_members
+            )
+            clusters[layer_name] = np.full(pop_size, -1, dtype=dtypes['cluster'])
+            clusters[layer_name][members] = member_clusters
         else:
-            # 如果没有连接，创建空的网络
-            layer_contacts = {
-                'p1': np.array([], dtype=cv.default_int),
-                'p2': np.array([], dtype=cv.default_int)
-            }
+            layer_contacts = _make_per_country_contacts(config, country_codes, ages, engine=engine, age_index=age_index)
+        
+        # 可选：去重并压缩边（层配置中的 'compact' 优先于函数参数 compact_edges）
+        if config.get('compact', compact_edges):
+            layer_contacts, edge_stats[layer_name] = compact_layer_edges(**layer_contacts)
         
-        # 创建层
-        layer = cv.Layer(**layer_contacts, label=layer_name)
+        # 创建层：cv.Layer(**layer_contacts) 会复制每个数组，这里直接放入已是目标类型的数组，避免多一份边列表
+        layer = cv.Layer(label=layer_name)
+        for key, value in layer_contacts.items():
+            layer[key] = np.asarray(value, dtype=layer.meta[key])
+        if 'beta' not in layer_contacts:
+            layer['beta'] = np.ones(len(layer), dtype=layer.meta['beta'])
         contacts.add_layer(**{layer_name: layer})
+        del layer_contacts
     
     # 创建人口字典
     popdict = {
@@ -207,7 +794,205 @@ def create_custom_population(pop_size, layer_config, countries_config):
         'layer_keys': layer_keys,
 
         # 添加自定义属性（如果需要，可以在函数参数中添加更多自定义属性）
-        'country': countries,
+        'clusters': clusters,
+        'edge_stats': edge_stats,
     }
+    if dtypes['country'] is not None:
+        popdict['country'] = np.array(country_names)[country_codes]
+    if dtypes['country_code'] is not None:
+        popdict['country_code'] = country_codes.astype(dtypes['country_code'])
+        popdict['country_names'] = list(country_names)
     
     return popdict, layer_keys
+
+# popdict 中由 Covasim 自身使用、或不是按人排列的键；其余按人排列的数组都视为自定义属性
+POPDICT_RESERVED_KEYS = ('uid', 'age', 'sex', 'contacts', 'layer_keys', 'clusters', 'edge_stats', 'country_names')
+
+def attach_custom_attributes(people, popdict):
+    '''
+    将 popdict 中的自定义属性（如 country）挂到 sim.people 上，方便在干预措施中使用
+    
+    等价于脚本中手写的 sim.people.country = custom_popdict['country']，对所有长度等于人口数的
+    自定义数组生效；compact 策略下还会挂载国家名表 country_names（与 country_code 对应）
+    
+    Args:
+        people: sim.people 对象（需在 sim.initialize() 之后调用）
+        popdict: create_custom_population 返回的人口字典
+    
+    Returns:
+        list: 挂载的属性名列表
+    '''
+    attached = []
+    for key, value in popdict.items():
+        if key in POPDICT_RESERVED_KEYS or not isinstance(value, np.ndarray) or len(value) != len(people):
+            continue
+        setattr(people, key, value)
+        attached.append(key)
+    if 'country_code' in attached and 'country_names' in popdict:
+        people.country_names = list(popdict['country_names'])
+    return attached
+
+def _get_field(obj, key):
+    '''从 popdict（字典）或 sim.people 上取一个字段，不存在时返回 None'''
+    return obj.get(key) if isinstance(obj, dict) else getattr(obj, key, None)
+
+def has_country(obj):
+    '''popdict 或 sim.people 上是否有每个人的国家（country 字符串数组，或 country_code 和 country_names）'''
+    return _get_field(obj, 'country') is not None or (_get_field(obj, 'country_code') is not None
+                                                     and _get_field(obj, 'country_names') is not None)
+
+def country_codes(obj):
+    '''
+    每个人的国家编号和对应的国家名
+    
+    compact 策略的人口直接使用 country_code 和 country_names（countries_config 的顺序）；
+    只有字符串数组 country 时按国家名排序编号（与 np.unique 相同）
+    
+    Args:
+        obj: popdict，或已调用 attach_custom_attributes 的 sim.people
+    
+    Returns:
+        tuple: (编号数组, 国家名列表)
+    
+    Raises:
+        AttributeError: 如果没有国家信息
+    '''
+    codes, names = _get_field(obj, 'country_code'), _get_field(obj, 'country_names')
+    if codes is not None and names is not None:
+        return np.asarray(codes), list(names)
+    countries = _get_field(obj, 'country')
+    if countries is None:
+        raise AttributeError("没有 country 或 country_code 属性，sim.people 需要先调用 ContactNetwork.attach_custom_attributes(sim.people, popdict)")
+    names, codes = np.unique(np.asarray(countries), return_inverse=True)
+    return codes, names.tolist()
+
+def country_labels(obj, inds):
+    '''inds 中每个人的国家名（只转换这些人，不生成整列字符串数组）'''
+    codes, names = _get_field(obj, 'country_code'), _get_field(obj, 'country_names')
+    if codes is not None and names is not None:
+        return np.array(names)[np.asarray(codes)[inds]]
+    countries = _get_field(obj, 'country')
+    if countries is None:
+        raise AttributeError("没有 country 或 country_code 属性，sim.people 需要先调用 ContactNetwork.attach_custom_attributes(sim.people, popdict)")
+    return np.asarray(countries)[inds]
+
+def set_agent_values(people, key, values, inds=None):
+    '''
+    原地设置 sim.people 上的按人参数（例如 rel_sus、rel_trans）
+    
+    sim.people.rel_sus = np.random.uniform(...) 会用新分配的 float64 数组替换 Covasim 的
+    float32 数组（每人多占 4 字节，且千万级人口时多一次整块分配）；这里写入已有数组，
+    保持原有类型
+    
+    Args:
+        people: sim.people 对象
+        key: 参数名，例如 'rel_sus'
+        values: 标量或数组（长度与 inds 或人口数相同）
+        inds: 需要设置的人的下标或布尔掩码，None 表示所有人
+    
+    Returns:
+        np.ndarray: 被修改的数组（与 people[key] 是同一个对象）
+    '''
+    target = people[key]
+    if inds is None:
+        target[:] = values
+    else:
+        target[inds] = values
+    return target
+
+def scale_agent_values(people, key, factor, inds=None):
+    '''
+    原地将 sim.people 上的按人参数乘以 factor（保持原有类型，见 set_agent_values）
+    
+    Returns:
+        np.ndarray: 被修改的数组（与 people[key] 是同一个对象）
+    '''
+    target = people[key]
+    if inds is None:
+        np.multiply(target, factor, out=target, casting='unsafe')
+    else:
+        target[inds] *= np.asarray(factor, dtype=target.dtype)
+    return target
+
+def attribute_mask(people, attr, attr_value):
+    '''
+    sim.people 上属性 attr 等于 attr_value 的位置
+    
+    attr_value 通常是参数名中的字符串（例如 'rel_sus:age=30' 中的 '30'），先转换成该属性的类型
+    再比较，因此数值属性按数值相等匹配（'30' 与 30.0 相同）；attr 为 'country' 时按 country_codes
+    读取，compact 策略（只有 country_code）的人口也适用
+    
+    Raises:
+        AttributeError: people 上没有该属性
+        ValueError: attr_value 不能转换成该属性的类型，或者没有人匹配（通常是写错了取值）
+    '''
+    if attr == 'country':
+        inverse, labels = country_codes(people)
+        mask = np.array([label == str(attr_value) for label in labels], dtype=bool)[inverse]
+        existing = labels
+    else:
+        if not hasattr(people, attr):
+            raise AttributeError(f"sim.people 上没有属性 '{attr}'，自定义属性需要先调用 ContactNetwork.attach_custom_attributes")
+        values = np.asarray(getattr(people, attr))
+        mask = values == _cast_attribute_value(attr, attr_value, values.dtype)
+        existing = None
+    if not mask.any():
+        if existing is None:
+            existing = np.unique(values)
+        shown = ', '.join(str(v) for v in existing[:10]) + (' ...' if len(existing) > 10 else '')
+        raise ValueError(f"sim.people 上没有 {attr} 等于 {attr_value!r} 的人，已有的取值: {shown}")
+    return mask
+
+def _cast_attribute_value(attr, attr_value, dtype):
+    '''把 attr_value 转换成属性的类型（布尔值接受 True/False/1/0，整数接受整数值的浮点数）'''
+    if dtype.kind in 'USO':
+        return str(attr_value)
+    try:
+        if dtype.kind == 'b':
+            text = str(attr_value).strip().lower()
+            if text not in ('true', 'false', '1', '0'):
+                raise ValueError(text)
+            return text in ('true', '1')
+        number = float(attr_value)
+        if dtype.kind in 'iu' and not number.is_integer():
+            raise ValueError(number)
+        return dtype.type(number)
+    except (TypeError, ValueError):
+        raise ValueError(f"属性 {attr} 的类型为 {dtype}，不能与 {attr_value!r} 比较") from None
+
+class DiagnosisWatch:
+    '''
+    包装 people.test：记录检测阳性、已排定诊断日期（date_diagnosed）的人，之后只在这些人中查找
+    某天的诊断，不扫描整个人口（EventLog、StratifiedResults 使用）。保存在 people 的属性中，
+    复制 sim 时随 people 一起复制；需要在分析器的 initialize 中 attach，才能记下第 0 天的检测
+    '''
+
+    def __init__(self, people):
+        self.people = people
+        self.pending = np.zeros(0, dtype=np.int64)
+        self._day = None
+        self._diagnosed = None
+        return
+
+    @classmethod
+    def attach(cls, people):
+        '''返回 people 上已有的包装，没有时新建一个（同一个 people 上的多个分析器共享）'''
+        watch = vars(people).get('test')
+        if not isinstance(watch, cls) or watch.people is not people:
+            watch = cls(people)
+            vars(people)['test'] = watch  # people 被锁定时也可以设置
+        return watch
+
+    def __call__(self, inds, *args, **kwargs):
+        final_inds = type(self.people).test(self.people, inds, *args, **kwargs)
+        self.pending = np.concatenate([self.pending, final_inds])
+        return final_inds
+
+    def diagnosed_on(self, t):
+        '''第 t 天诊断的人（date_diagnosed == t），之后丢弃诊断日期已过的记录'''
+        if self._day != t:
+            dates = self.people.date_diagnosed[self.pending]
+            self._diagnosed = np.unique(self.pending[dates == t])
+            self.pending = self.pending[dates > t]
+            self._day = t
+        return self._diagnosed
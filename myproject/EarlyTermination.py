@@ -0,0 +1,196 @@
+'''
+疫情灭绝或饱和时提前结束模拟，并解析地填充剩余天数的结果
+
+小规模初始感染（例如 pop_infected: 10）加上国家之间隔离的网络时，很多次运行在前几周就已经没有
+感染者了，但仍然会逐天运行完所有 n_days。这里提供一个可选的停止规则（通过 Covasim 自带的
+stopping_func 参数接入，每步只做很少的计算），满足条件时结束循环，再按已有感染者的预定日期
+（date_infectious、date_symptomatic、date_recovered、date_dead 等）用 bincount 一次性推算
+剩余天数的流量和存量，最后调用 sim.finalize()。
+
+停止条件：
+- 灭绝：没有任何处于感染状态（exposed）的人，此后结果精确不变；
+- 饱和（可选）：按国家（或全体）统计曾经感染过的比例达到 saturation，此后假设不再有新的传播，
+  只让已感染者按预定日期完成病程（这是近似）。
+by_country=True 时所有国家都灭绝或饱和才停止。
+
+注意：有输入病例（n_imports > 0）或之后还会引入新变异株时不会停止；检测、隔离、疫苗等干预措施
+产生的结果和抗体水平（pop_nabs 等）在停止后保持停止时的数值。
+'''
+import numpy as np
+import covasim.defaults as cvd
+import ContactNetwork
+
+class EarlyStop:
+    '''
+    停止规则，作为 sim['stopping_func'] 使用
+
+    Args:
+        check_every: 每隔多少天检查一次（按国家检查需要遍历人员数组）
+        min_day: 最早允许停止的天数
+        saturation: 曾经感染比例达到该值视为饱和，None 表示只在灭绝时停止
+        by_country: 是否按 sim.people.country 分国家判断（需要 attach_custom_attributes 挂载的 country）
+
+    停止后 day 和 reason 记录停止的天数和原因（'extinct' 或 'saturated'），未停止时为 None。
+    '''
+
+    def __init__(self, check_every=1, min_day=1, saturation=None, by_country=False):
+        self.check_every = max(int(check_every), 1)
+        self.min_day = max(int(min_day), 1)
+        self.saturation = saturation
+        self.by_country = by_country
+        self.day = None
+        self.reason = None
+        self._codes = None
+
+    def _can_stop(self, sim):
+        '''之后还会有外部输入的感染时不能停止'''
+        if np.any(np.asarray(sim['n_imports']) > 0):
+            return False
+        for variant in sim['variants']:
+            days = getattr(variant, 'days', None)
+            if days is not None and np.any(np.asarray(sim.day(days)) >= sim.t):
+                return False
+        return True
+
+    def __call__(self, sim):
+        t = sim.t
+        if t < self.min_day or t % self.check_every or not self._can_stop(sim):
+            return False
+
+        people = sim.people
+        if not self.by_country:
+            if sim.results['n_exposed'][t - 1] == 0:  # 上一步结束时的存量，O(1)
+                return self._stop(t, 'extinct')
+            if self.saturation is not None:
+                ever_infected = np.count_nonzero(~np.isnan(people.date_exposed))
+                if ever_infected >= self.saturation * len(people):
+                    return self._stop(t, 'saturated')
+            return False
+
+        if self._codes is None or len(self._codes) != len(people):
+            if not ContactNetwork.has_country(people):
+                raise AttributeError("by_country=True 需要 sim.people.country，请先调用 ContactNetwork.attach_custom_attributes")
+            self._codes = ContactNetwork.country_codes(people)[0].astype(np.int64)
+        n_countries = self._codes.max() + 1
+        exposed = np.bincount(self._codes[people.exposed], minlength=n_countries)
+        done = exposed == 0
+        if self.saturation is not None:
+            sizes = np.bincount(self._codes, minlength=n_countries)
+            ever_infected = np.bincount(self._codes[~np.isnan(people.date_exposed)], minlength=n_countries)
+            done |= ever_infected >= self.saturation * sizes
+        if done.all():
+            return self._stop(t, 'extinct' if not exposed.any() else 'saturated')
+        return False
+
+    def _stop(self, t, reason):
+        self.day = t
+        self.reason = reason
+        return True
+
+def _project_stock(in_state, dates, end, t, n):
+    '''
+    推算未来每天处于某状态的人数：已处于该状态的从 t 开始，其余从预定日期开始，到 end 结束
+
+    Returns:
+        np.ndarray: 长度为 n 的数组，对应第 t 到 t+n-1 天
+    '''
+    start = np.where(in_state, t, dates)
+    valid = ~np.isnan(start) & (start < end)
+    start = start[valid].astype(np.int64) - t
+    stop = end[valid] - t
+    delta = np.bincount(start, minlength=n + 1)[:n + 1] - np.bincount(stop, minlength=n + 1)[:n + 1]
+    return np.cumsum(delta)[:n]
+
+def _project_flow(in_state, dates, end, t, n, weights=None):
+    '''推算未来每天新进入某状态的人数（预定日期落在 [t, t+n) 且早于 end）'''
+    valid = ~in_state & ~np.isnan(dates) & (dates < end)
+    days = dates[valid].astype(np.int64) - t
+    keep = (days >= 0) & (days < n)
+    return np.bincount(days[keep], weights=None if weights is None else weights[valid][keep], minlength=n)[:n]
+
+def fill_remaining(sim):
+    '''
+    在模拟被停止规则提前结束后，推算剩余天数的结果并完成 sim.finalize()
+
+    只使用当前处于感染状态的人的预定日期，不再模拟传播，因此计算量只与剩余感染者数量有关。
+    '''
+    t, npts = sim.t, sim.npts
+    n = npts - t
+    people = sim.people
+    res = sim.results
+    if n > 0:
+        inds = np.flatnonzero(people.exposed)
+        date_recovered = people.date_recovered[inds]
+        date_dead = people.date_dead[inds]
+        end = np.where(np.isnan(date_recovered), date_dead, date_recovered)
+        end = np.clip(np.nan_to_num(end, nan=npts), t, npts).astype(np.int64)
+        none = np.zeros(len(inds), dtype=bool)
+
+        # 流量：进入各状态、康复和死亡
+        recoveries = _project_flow(none, date_recovered, end + 1, t, n)
+        deaths = _project_flow(none, date_dead, end + 1, t, n)
+        diagnosed = people.diagnosed[inds].astype(float)
+        res['new_recoveries'].values[t:] = recoveries
+        res['new_deaths'].values[t:] = deaths
+        res['new_known_deaths'].values[t:] = _project_flow(none, date_dead, end + 1, t, n, weights=diagnosed)
+        for key in ['infectious', 'symptomatic', 'severe', 'critical']:
+            in_state = people[key][inds]
+            dates = people[f'date_{key}'][inds]
+            res[f'new_{key}'].values[t:] = _project_flow(in_state, dates, end, t, n)
+            res[f'n_{key}'].values[t:] = _project_stock(in_state, dates, end, t, n)
+        res['n_exposed'].values[t:] = _project_stock(~none, np.full(len(inds), np.nan), end, t, n)
+
+        # 存量：康复、死亡及受其影响的诊断状态，其余存量保持停止时的数值
+        projected = {'infectious', 'symptomatic', 'severe', 'critical', 'exposed'}
+        for key in cvd.result_stocks.keys():
+            if key not in projected:
+                res[f'n_{key}'].values[t:] = res[f'n_{key}'].values[t - 1]
+        res['n_recovered'].values[t:] += np.cumsum(recoveries)
+        res['n_dead'].values[t:] += np.cumsum(deaths)
+        res['n_known_dead'].values[t:] += np.cumsum(res['new_known_deaths'].values[t:])
+        if sim['use_waning']:
+            res['n_susceptible'].values[t:] += np.cumsum(recoveries)
+            res['n_diagnosed'].values[t:] -= np.cumsum(_project_flow(none, date_recovered, end + 1, t, n, weights=diagnosed))
+        for key in ['pop_nabs', 'pop_protection', 'pop_symp_protection']:
+            res[key].values[t:] = res[key].values[t - 1]
+
+        # 按变异株：与 Covasim 的统计方式一致，有症状/重症按变异株的流量在感染时计入（停止后为 0），
+        # 按变异株的存量只在康复时清除（死亡不清除，已死亡的人一直计入）
+        variant = people.exposed_variant[inds]
+        variant = np.where(np.isnan(variant), 0, variant).astype(np.int64)
+        end_variant = np.clip(np.nan_to_num(date_recovered, nan=npts), t, npts).astype(np.int64)
+        for v in range(sim['n_variants']):
+            is_v = variant == v
+            infectious = people.infectious[inds][is_v]
+            date_infectious = people.date_infectious[inds][is_v]
+            res['variant']['new_infectious_by_variant'].values[v, t:] = _project_flow(infectious, date_infectious, end[is_v], t, n)
+            res['variant']['n_infectious_by_variant'].values[v, t:] = _project_stock(infectious, date_infectious, end_variant[is_v], t, n) \
+                + np.count_nonzero(people.infectious_by_variant[v] & people.dead)
+            res['variant']['n_exposed_by_variant'].values[v, t:] = _project_stock(
+                np.ones(is_v.sum(), dtype=bool), np.full(is_v.sum(), np.nan), end_variant[is_v], t, n) \
+                + np.count_nonzero(people.exposed_by_variant[v] & people.dead)
+
+    sim.t = npts
+    sim.complete = True
+    sim.finalize(verbose=0)
+    return sim
+
+def run_with_early_stop(sim, rule=None, **kwargs):
+    '''
+    运行模拟，满足停止规则时提前结束并推算剩余结果
+
+    Args:
+        sim: cv.Sim（可以已初始化，也可以未初始化）
+        rule: EarlyStop 对象，None 表示用 kwargs 创建一个
+        kwargs: 传给 EarlyStop 的参数
+
+    Returns:
+        cv.Sim: 已完成的模拟；停止信息在 rule.day 和 rule.reason 中，也记录在 sim.early_stop
+    '''
+    rule = rule or EarlyStop(**kwargs)
+    sim['stopping_func'] = rule
+    sim.run()
+    if not sim.complete:
+        fill_remaining(sim)
+    sim.early_stop = {'day': rule.day, 'reason': rule.reason}
+    return sim
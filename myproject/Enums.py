@@ -6,4 +6,7 @@ class Country(Enum):
 class NetWorkType(Enum):
     scale_free = 1
     random = 2
-    microstructured = 3
\ No newline at end of file
+    microstructured = 3
+    household = 4
+    school = 5
+    workplace = 6
@@ -0,0 +1,271 @@
+'''
+事件日志输出：只记录状态转移，而不是每天的人员数组快照
+
+做逐人的病例列表（line list）分析时需要知道谁在哪天、通过哪一层传染了谁、双方属于哪个国家，
+以前只能每天复制人员数组。EventLog 分析器每步只追加新发生的事件：
+- 感染：从 infection_log 读取自上一步以来的新增记录（感染者、传染源、层、变异株）；
+- 症状出现、死亡：感染发生时 Covasim 已经确定了 date_symptomatic、date_dead，在感染时一并追加，
+  运行结束（或保存）时丢弃还没到的日期；
+- 诊断：由检测干预在运行中产生。初始化时把 people.test 包装一层，记下检测阳性、已排定诊断日期的人，
+  每步只在这些人中按 date_diagnosed 查找当天的诊断，不扫描整个人口。
+各列写入预先分配、按倍数扩展的 PopulationGrowth.GrowableArray，因此每步的开销只与新增事件数
+有关。运行结束后可以保存为一个紧凑的列式 .npz 文件，离线用 load_events 读回并用
+infection_tree 重建传播树，不需要重新运行。
+
+用法：
+    log = EventLog.EventLog()
+    sim = cv.Sim(..., analyzers=log)
+    sim.run()
+    log = sim.get_analyzer(EventLog.EventLog)
+    log.save('events.npz')
+
+    events = EventLog.load_events('events.npz')
+    tree = EventLog.infection_tree(events)
+    df = EventLog.to_dataframe(events)
+'''
+import os
+import numpy as np
+import pandas as pd
+import covasim as cv
+import ContactNetwork
+from PopulationGrowth import GrowableArray
+
+# 事件类型，按编号排列
+EVENT_TYPES = ['infection', 'symptomatic', 'diagnosis', 'death']
+
+# 感染时即可确定日期的事件：事件类型 -> 日期属性
+SCHEDULED_EVENTS = {
+    'symptomatic': 'date_symptomatic',
+    'death': 'date_dead',
+}
+
+# 各列的类型；day 的类型按模拟天数在 initialize 时确定
+COLUMN_DTYPES = {
+    'event': np.int8,
+    'person': np.int32,
+    'source': np.int32,    # -1 表示没有传染源（初始感染、输入病例）
+    'layer': np.int16,     # 在 layers 中的编号，非感染事件为 -1
+    'country': np.int16,   # 在 countries 中的编号，people 上没有国家（country 或 country_code）时为 -1
+    'variant': np.int8,    # 在 variants 中的编号，非感染事件为 -1
+}
+
+# 编号列对应的名称列表
+NAME_LISTS = ['event_types', 'layers', 'countries', 'variants']
+
+class _Codes:
+    '''名称到编号的映射，按第一次出现的顺序编号'''
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+
+    def encode(self, values):
+        '''把一组名称转换为编号（只对本批的不同取值查一次字典）'''
+        values = np.asarray(values)
+        if not len(values):
+            return np.zeros(0, dtype=np.int64)
+        unique, inverse = np.unique(values, return_inverse=True)
+        codes = np.empty(len(unique), dtype=np.int64)
+        for i, name in enumerate(unique.tolist()):
+            if name not in self.index:
+                self.index[name] = len(self.names)
+                self.names.append(name)
+            codes[i] = self.index[name]
+        return codes[inverse]
+
+class EventLog(cv.Analyzer):
+    '''
+    记录状态转移事件的分析器
+
+    Args:
+        capacity: 各列缓冲区的初始容量，不足时按倍数扩展
+        kwargs: 传给 cv.Analyzer 的参数（例如 label）
+
+    运行结束后：
+        self.events: 按 (日期, 事件类型) 排序的列字典，格式与 load_events 的返回值相同
+        self.n_events: 已记录的事件数
+    '''
+
+    def __init__(self, capacity=10000, **kwargs):
+        super().__init__(**kwargs)
+        self.capacity = capacity
+        self.columns = None
+        return
+
+    def initialize(self, sim):
+        super().initialize(sim)
+        if sim['rescale'] and sim['pop_scale'] > 1:
+            raise ValueError("EventLog 不支持动态缩放（rescale=True 且 pop_scale > 1）：缩放时 make_naive 会改变"
+                             "已感染者的病程日期。请设置 rescale=False")
+        day_dtype = np.int16 if sim.npts < np.iinfo(np.int16).max else np.int32
+        self.columns = {key: GrowableArray(np.zeros(0, dtype=dtype), capacity=self.capacity)
+                        for key, dtype in dict(COLUMN_DTYPES, day=day_dtype).items()}
+        self.layers = _Codes()
+        self.countries = _Codes()
+        self.variants = _Codes()
+        self.pop_size = len(sim.people)
+        self._log_pos = 0
+        self._last_day = -1
+        ContactNetwork.DiagnosisWatch.attach(sim.people)
+        return
+
+    @property
+    def n_events(self):
+        return len(self.columns['event']) if self.columns is not None else 0
+
+    def _append(self, event, day, person, source=-1, layer=-1, country=-1, variant=-1):
+        '''追加一批同类事件，标量参数会广播到整批'''
+        n = len(person)
+        values = {'event': EVENT_TYPES.index(event), 'day': day, 'person': person, 'source': source,
+                  'layer': layer, 'country': country, 'variant': variant}
+        for key, column in self.columns.items():
+            column.extend(np.broadcast_to(values[key], n))
+        return
+
+    def _country_codes(self, people, inds):
+        if not ContactNetwork.has_country(people):
+            return -1
+        return self.countries.encode(ContactNetwork.country_labels(people, inds))
+
+    def apply(self, sim):
+        people = sim.people
+        t = sim.t
+        self.pop_size = len(people)
+        self._last_day = t
+
+        new_entries = people.infection_log[self._log_pos:]
+        self._log_pos = len(people.infection_log)
+        if new_entries:
+            n = len(new_entries)
+            targets = np.fromiter((e['target'] for e in new_entries), dtype=np.int64, count=n)
+            sources = np.fromiter((-1 if e['source'] is None else e['source'] for e in new_entries), dtype=np.int64, count=n)
+            days = np.fromiter((e['date'] for e in new_entries), dtype=np.int64, count=n)
+            variants = self.variants.encode([e['variant'] for e in new_entries])
+            layers = self.layers.encode([e['layer'] for e in new_entries])
+            countries = self._country_codes(people, targets)
+            self._append('infection', days, targets, sources, layers, countries, variants)
+
+            for event, date_key in SCHEDULED_EVENTS.items():
+                dates = people[date_key][targets]
+                ok = ~np.isnan(dates)
+                country = countries[ok] if np.ndim(countries) else countries
+                self._append(event, dates[ok].astype(np.int64), targets[ok], country=country)
+
+        # 诊断由检测干预产生，只在检测阳性、等待诊断的人中查找
+        diagnosed = ContactNetwork.DiagnosisWatch.attach(people).diagnosed_on(t)
+        if len(diagnosed):
+            self._append('diagnosis', t, diagnosed, country=self._country_codes(people, diagnosed))
+        return
+
+    def finalize(self, sim):
+        super().finalize(sim)
+        if self.columns is not None:
+            self._compact()
+        return
+
+    def _compact(self):
+        '''丢弃还没到的预定事件，并按 (日期, 事件类型) 稳定排序'''
+        day = self.columns['day'].view
+        keep = np.flatnonzero(day <= self._last_day)
+        order = keep[np.lexsort((self.columns['event'].view[keep], day[keep]))]
+        for column in self.columns.values():
+            values = column.view[order]
+            column.n = 0
+            column.extend(values)
+        return
+
+    @property
+    def events(self):
+        '''当前已记录事件的列字典（运行中调用时不包含还没到的预定事件）'''
+        if self.columns is None:
+            raise RuntimeError("EventLog 还没有初始化，请先运行模拟")
+        day = self.columns['day'].view
+        keep = np.flatnonzero(day <= self._last_day)
+        order = keep[np.lexsort((self.columns['event'].view[keep], day[keep]))]
+        events = {key: column.view[order] for key, column in self.columns.items()}
+        events.update(event_types=list(EVENT_TYPES), layers=list(self.layers.names),
+                      countries=list(self.countries.names),
+                      variants=list(self.variants.names), n_days=self._last_day + 1, pop_size=self.pop_size)
+        return events
+
+    def save(self, path, compress=True):
+        '''把事件写成一个列式 .npz 文件（先写临时文件，再原子重命名），返回文件名'''
+        return save_events(self.events, path, compress=compress)
+
+#%% 读写和离线分析
+
+def save_events(events, path, compress=True):
+    '''把 events 列字典写成 .npz 文件'''
+    columns = {key: events[key] for key in list(COLUMN_DTYPES) + ['day']}
+    for key in NAME_LISTS:
+        columns[f'__{key}__'] = np.array(events[key], dtype=str)
+    columns['__n_days__'] = np.array(events['n_days'])
+    columns['__pop_size__'] = np.array(events['pop_size'])
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        (np.savez_compressed if compress else np.savez)(f, **columns)
+    os.replace(tmp_path, path)
+    return path
+
+def load_events(path):
+    '''读取 save_events 写出的文件，返回与 EventLog.events 相同格式的列字典'''
+    with np.load(path) as data:
+        events = {key: data[key] for key in list(COLUMN_DTYPES) + ['day']}
+        for key in NAME_LISTS:
+            events[key] = data[f'__{key}__'].tolist()
+        events['n_days'] = int(data['__n_days__'])
+        events['pop_size'] = int(data['__pop_size__'])
+    return events
+
+def select(events, event):
+    '''某一类事件的行号'''
+    return np.flatnonzero(events['event'] == events['event_types'].index(event))
+
+def infection_tree(events):
+    '''
+    由感染事件重建传播树
+
+    一个人可能多次感染，因此树的节点是感染事件而不是人：每次感染的父节点是传染源在这一天之前
+    最近的一次感染。
+
+    Returns:
+        dict:
+            'rows': 感染事件在 events 中的行号（按日期排序），以下数组都与之对齐
+            'parent': 父节点在 rows 中的位置，-1 表示没有传染源（初始感染、输入病例）
+            'generation': 代数，没有传染源的感染为 0
+            'offspring': 直接传染的人数（次级病例数）
+    '''
+    rows = select(events, 'infection')
+    person = events['person'][rows].astype(np.int64)
+    source = events['source'][rows].astype(np.int64)
+    day = events['day'][rows].astype(np.int64)
+
+    # 以 (人, 日期) 排序，在其中查找传染源在当天及之前的最后一次感染
+    n_days = int(day.max()) + 1 if len(day) else 1
+    keys = person * n_days + day
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    parent = np.full(len(rows), -1, dtype=np.int64)
+    has_source = np.flatnonzero(source >= 0)
+    pos = np.searchsorted(sorted_keys, source[has_source] * n_days + day[has_source], side='right') - 1
+    found = (pos >= 0) & (person[order[np.maximum(pos, 0)]] == source[has_source])
+    parent[has_source[found]] = order[pos[found]]
+
+    # 父节点的感染日期早于子节点，按日期顺序逐日传递代数
+    generation = np.zeros(len(rows), dtype=np.int64)
+    linked = np.flatnonzero(parent >= 0)
+    boundaries = np.flatnonzero(np.diff(day[linked])) + 1
+    for chunk in np.split(linked, boundaries):
+        generation[chunk] = generation[parent[chunk]] + 1
+
+    offspring = np.bincount(parent[linked], minlength=len(rows))
+    return {'rows': rows, 'parent': parent, 'generation': generation, 'offspring': offspring}
+
+def to_dataframe(events):
+    '''转换为 pandas.DataFrame，编号列替换为名称'''
+    df = pd.DataFrame({key: events[key] for key in ['day', 'event', 'person', 'source', 'layer', 'country', 'variant']})
+    df['event'] = pd.Categorical.from_codes(df['event'], events['event_types'])
+    df['layer'] = pd.Categorical.from_codes(df['layer'], events['layers'])
+    df['country'] = pd.Categorical.from_codes(df['country'], events['countries'])
+    df['variant'] = pd.Categorical.from_codes(df['variant'], events['variants'])
+    return df
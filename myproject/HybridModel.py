@@ -0,0 +1,304 @@
+'''
+混合模式：部分国家用仓室模型（SEIR），其余国家用代理模型，二者通过跨境接触耦合
+
+当 countries_config 中某个国家占绝大多数人口（例如中缅边境人口中中国占 0.95）时，几乎所有
+计算都花在远离关注区域的代理上。混合模式下：
+- plan_hybrid 把 countries_config 拆成代理国家（重新归一化后传给 create_custom_population）
+  和仓室国家（只记录真实人口），代理国家共享一个缩放因子；
+- SEIRCompartments 对所有仓室国家向量化地逐日推进 S→E→I→R（二项分布的离散时间链，
+  stochastic=False 时取期望值），每天的计算量与人口规模无关；
+- HybridCoupling 作为 Covasim 干预在每天传播之前：按仓室国家的感染比例给代理国家的易感者
+  施加输入感染的风险（people.infect，layer='hybrid_import'），同时把代理国家的传染者人数
+  （按缩放因子换算为真实人数）计入仓室国家的感染力。
+
+耦合采用质量作用的跨境接触：contact_rates[仓室国][代理国] 是代理国家每个真实居民每天与
+该仓室国家居民的接触数，每次接触的传播概率为 cross_beta。于是
+    代理国易感者的风险 = cross_beta × Σ_c rate[c][a] × I_c / N_c
+    仓室国易感者的风险 = cross_beta × Σ_a rate[c][a] × I_a（真实人数）/ N_c
+两个方向的接触总数相同（rate × N_a）。
+
+用法：
+    plan = HybridModel.plan_hybrid(countries_config, total_population=100e6, compartmental=['China'], pop_size=50000)
+    popdict, _ = ContactNetwork.create_custom_population(plan['pop_size'], layer_config, plan['countries_config'])
+    coupling = HybridModel.HybridCoupling(plan['compartments'], {'China': {'Myanmar': 0.5}}, initial_infected={'China': 1000})
+    sim = cv.Sim(HybridModel.make_hybrid_pars(pars, plan), interventions=coupling)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)  # 需要 sim.people.country
+    sim.run()
+    coupling = sim.get_intervention(HybridModel.HybridCoupling)
+    coupling.results['new_infections']  # (npts, 仓室国家数)
+'''
+import numpy as np
+import covasim as cv
+import ContactNetwork
+
+# 代理国家输入感染在 infection_log 中的层名
+IMPORT_LAYER = 'hybrid_import'
+
+def plan_hybrid(countries_config, total_population, compartmental, pop_size):
+    '''
+    把国家配置拆成代理国家和仓室国家
+
+    Args:
+        countries_config: 国家配置字典（见 ContactNetwork.validate_countries_config）
+        total_population: 所有国家的真实总人口，按配置中的比例分配到各国
+        compartmental: 用仓室模型模拟的国家名列表
+        pop_size: 代理国家的代理总数
+
+    Returns:
+        dict: {
+            'pop_size': 代理总数,
+            'countries_config': 代理国家的配置（比例重新归一化，年龄金字塔等保留）,
+            'compartments': {仓室国家名: 真实人口},
+            'agent_population': {代理国家名: 真实人口},
+            'pop_scale': 每个代理代表的真实人数,
+        }
+    '''
+    country_names, proportions = ContactNetwork.validate_countries_config(countries_config)
+    compartmental = [compartmental] if isinstance(compartmental, str) else list(compartmental)
+    unknown = [c for c in compartmental if c not in country_names]
+    if unknown:
+        raise ValueError(f"compartmental 中的国家不在 countries_config 中: {unknown}")
+    agents = [c for c in country_names if c not in compartmental]
+    if not agents:
+        raise ValueError("至少需要保留一个代理国家")
+
+    population = {c: total_population * p for c, p in zip(country_names, proportions)}
+    agent_total = sum(population[c] for c in agents)
+    if agent_total < pop_size:
+        raise ValueError(f"代理国家的真实人口 ({agent_total:.0f}) 少于代理数 ({pop_size})")
+
+    agent_config = {}
+    for c in agents:
+        proportion = population[c] / agent_total
+        value = countries_config[c]
+        agent_config[c] = dict(value, proportion=proportion) if isinstance(value, dict) else proportion
+
+    return {
+        'pop_size': int(pop_size),
+        'countries_config': agent_config,
+        'compartments': {c: float(population[c]) for c in compartmental},
+        'agent_population': {c: float(population[c]) for c in agents},
+        'pop_scale': agent_total / pop_size,
+    }
+
+def make_hybrid_pars(pars, plan):
+    '''
+    生成与混合方案匹配的模拟参数：代理数、代理国家的 pop_scale，并关闭 Covasim 自身的动态缩放
+    （否则代理国家的真实人数会随时间变化，耦合强度也随之改变）
+    '''
+    pars = dict(pars)
+    pars['pop_size'] = plan['pop_size']
+    pars['pop_scale'] = plan['pop_scale']
+    pars['rescale'] = False
+    return pars
+
+class SEIRCompartments:
+    '''
+    多个国家的 SEIR 仓室模型，所有国家按数组一起推进
+
+    Args:
+        populations: {国家名: 人口}
+        beta: 每个传染者每天的有效接触率（数值或 {国家名: 数值}），R0 = beta × infectious_days
+        latent_days: 平均潜伏期（E→I）
+        infectious_days: 平均传染期（I→R）
+        ifr: 感染致死率，死亡在 I→R 时按该比例计入 'deaths'
+        stochastic: True 时每天的转移人数按二项分布抽样，False 时取期望值
+    '''
+
+    def __init__(self, populations, beta, latent_days=4.5, infectious_days=8.0, ifr=0.0, stochastic=True):
+        if latent_days <= 0 or infectious_days <= 0:
+            raise ValueError(f"latent_days 和 infectious_days 必须大于 0: {latent_days}, {infectious_days}")
+        self.names = list(populations)
+        self.N = np.array([populations[c] for c in self.names], dtype=float)
+        if isinstance(beta, dict):
+            missing = [c for c in self.names if c not in beta]
+            if missing:
+                raise ValueError(f"beta 缺少以下国家: {missing}")
+            beta = [beta[c] for c in self.names]
+        self.beta = np.broadcast_to(np.asarray(beta, dtype=float), self.N.shape).copy()
+        self.sigma = 1 - np.exp(-1 / latent_days)
+        self.gamma = 1 - np.exp(-1 / infectious_days)
+        self.ifr = ifr
+        self.stochastic = stochastic
+        self.S = self.N.copy() if not stochastic else np.round(self.N)
+        self.E = np.zeros_like(self.N)
+        self.I = np.zeros_like(self.N)
+        self.R = np.zeros_like(self.N)
+        self.D = np.zeros_like(self.N)
+        return
+
+    def seed(self, infected):
+        '''把 {国家名: 人数} 从 S 移到 I'''
+        for c, n in infected.items():
+            i = self.names.index(c)
+            n = min(n, self.S[i])
+            self.S[i] -= n
+            self.I[i] += n
+        return
+
+    def _draw(self, n, prob):
+        if self.stochastic:
+            return np.random.binomial(n.astype(np.int64), prob).astype(float)
+        return n * prob
+
+    def step(self, external_hazard=0.0):
+        '''
+        推进一天
+
+        Args:
+            external_hazard: 每个国家易感者额外的感染风险（例如来自代理国家的输入）
+
+        Returns:
+            dict: 当天的 {'infections', 'infectious', 'recoveries', 'deaths'}（每个国家一项）
+        '''
+        hazard = self.beta * self.I / self.N + external_hazard
+        infections = self._draw(self.S, 1 - np.exp(-hazard))
+        infectious = self._draw(self.E, self.sigma)
+        recoveries = self._draw(self.I, self.gamma)
+        deaths = self._draw(recoveries, self.ifr)
+        self.S -= infections
+        self.E += infections - infectious
+        self.I += infectious - recoveries
+        self.R += recoveries - deaths
+        self.D += deaths
+        return {'infections': infections, 'infectious': infectious, 'recoveries': recoveries, 'deaths': deaths}
+
+class HybridCoupling(cv.Intervention):
+    '''
+    把仓室国家与代理国家耦合起来
+
+    Args:
+        compartments: {仓室国家名: 真实人口}（通常为 plan_hybrid 的 'compartments'）
+        contact_rates: {仓室国家名: {代理国家名: 代理国家每个真实居民每天与该仓室国家居民的接触数}}
+        cross_beta: 跨境接触的传播概率，None 表示使用 sim['beta']
+        beta: 仓室国家内部每个传染者每天的有效接触率，None 表示由 r0 换算
+        r0: 仓室国家的基本再生数（beta 为 None 时使用）
+        latent_days, infectious_days: 仓室模型的平均潜伏期和传染期，None 表示取 sim['dur']
+            中 exp2inf 与 asym2rec 的均值
+        ifr: 仓室国家的感染致死率
+        initial_infected: 仓室国家初始的传染者人数 {国家名: 人数}
+        stochastic: 仓室模型是否随机（见 SEIRCompartments）
+        variant: 仓室国家输入代理国家的变异株（sim 中的变异株编号或名称），默认为原始株
+        kwargs: 传给 cv.Intervention 的参数（例如 label）
+
+    运行中和运行结束后：
+        self.model: SEIRCompartments
+        self.results: {'S', 'E', 'I', 'R', 'D', 'new_infections': (npts, 仓室国家数)，
+                       'imports_from_agents': (npts, 仓室国家数) 其中由代理国家传入的感染,
+                       'agent_imports': (npts, 代理国家数) 代理国家每天的输入感染（代理数）}
+    '''
+
+    def __init__(self, compartments, contact_rates, cross_beta=None, beta=None, r0=2.5, latent_days=None,
+                 infectious_days=None, ifr=0.0, initial_infected=None, stochastic=True, variant=0, **kwargs):
+        super().__init__(**kwargs)
+        self.compartments = dict(compartments)
+        self.contact_rates = {c: dict(rates) for c, rates in contact_rates.items()}
+        self.cross_beta = cross_beta
+        self.beta = beta
+        self.r0 = r0
+        self.latent_days = latent_days
+        self.infectious_days = infectious_days
+        self.ifr = ifr
+        self.initial_infected = dict(initial_infected or {})
+        self.stochastic = stochastic
+        self.variant = variant
+        return
+
+    def initialize(self, sim):
+        super().initialize(sim)
+        unknown = [c for c in list(self.contact_rates) + list(self.initial_infected) if c not in self.compartments]
+        if unknown:
+            raise ValueError(f"以下国家不在 compartments 中: {sorted(set(unknown))}，仓室国家: {list(self.compartments)}")
+        for c, rates in self.contact_rates.items():
+            if min(rates.values(), default=0) < 0:
+                raise ValueError(f"仓室国家 '{c}' 的接触数必须非负: {rates}")
+        if isinstance(self.variant, str):
+            labels = {label: i for i, label in sim['variant_map'].items()}
+            if self.variant not in labels:
+                raise ValueError(f"sim 中没有变异株 '{self.variant}'，可选: {list(labels)}")
+            self.variant = labels[self.variant]
+        elif not 0 <= self.variant < sim['n_variants']:
+            raise ValueError(f"变异株编号 {self.variant} 超出范围，sim 中共有 {sim['n_variants']} 个变异株")
+        if self.cross_beta is None:
+            self.cross_beta = sim['beta']
+        latent_days = self.latent_days or sim['dur']['exp2inf']['par1']
+        infectious_days = self.infectious_days or sim['dur']['asym2rec']['par1']
+        beta = self.beta if self.beta is not None else self.r0 / infectious_days
+        self.model = SEIRCompartments(self.compartments, beta, latent_days, infectious_days, self.ifr, self.stochastic)
+        self.model.seed(self.initial_infected)
+        self.npts = sim.npts
+        self.codes = None
+        return
+
+    def _setup_people(self, people):
+        '''第一次调用时（people 上已挂载 country）建立代理国家编号和耦合矩阵'''
+        if not ContactNetwork.has_country(people):
+            raise ValueError("sim.people 上没有 country 属性，请先调用 ContactNetwork.attach_custom_attributes(sim.people, popdict)")
+        self.codes, self.agent_names = ContactNetwork.country_codes(people)
+        self.codes = self.codes.astype(np.int64)
+        overlap = [c for c in self.agent_names if c in self.compartments]
+        if overlap:
+            raise ValueError(f"以下国家同时是代理国家和仓室国家: {overlap}")
+        unknown = [a for rates in self.contact_rates.values() for a in rates if a not in self.agent_names]
+        if unknown:
+            raise ValueError(f"contact_rates 中的代理国家不在人口中: {sorted(set(unknown))}，人口中的国家: {self.agent_names}")
+        index = {a: i for i, a in enumerate(self.agent_names)}
+        self.rates = np.zeros((len(self.model.names), len(self.agent_names)))
+        for i, c in enumerate(self.model.names):
+            for a, rate in self.contact_rates.get(c, {}).items():
+                self.rates[i, index[a]] = rate
+        self.n_agents = np.bincount(self.codes, minlength=len(self.agent_names))
+
+        n_comp = len(self.model.names)
+        self.results = {key: np.zeros((self.npts, n_comp)) for key in ['S', 'E', 'I', 'R', 'D', 'new_infections', 'imports_from_agents']}
+        self.results['agent_imports'] = np.zeros((self.npts, len(self.agent_names)))
+        return
+
+    def _import_to_agents(self, people, prevalence):
+        '''按仓室国家的感染比例感染代理国家的易感者，返回每个代理国家的输入感染数'''
+        hazard = self.cross_beta * (prevalence @ self.rates)  # 每个代理国家易感者的风险
+        counts = np.zeros(len(self.agent_names))
+        if not np.any(hazard > 0):
+            return counts
+        sus = cv.true(people.susceptible)
+        sus = sus[hazard[self.codes[sus]] > 0]
+        rel = people.rel_sus[sus] * (1 - people.sus_imm[self.variant, sus])
+        prob = 1 - np.exp(-hazard[self.codes[sus]] * rel)
+        inds = sus[np.random.random(len(sus)) < prob]
+        if len(inds):
+            people.infect(inds=inds, layer=IMPORT_LAYER, variant=self.variant)
+            counts = np.bincount(self.codes[inds], minlength=len(self.agent_names)).astype(float)
+        return counts
+
+    def apply(self, sim):
+        t = sim.t
+        if self.codes is None:
+            self._setup_people(sim.people)
+        people = sim.people
+        model = self.model
+
+        # 当天开始时两侧的传染者：仓室国家的感染比例，代理国家的真实传染者人数
+        prevalence = model.I / model.N
+        scale = sim.rescale_vec[t]
+        agent_infectious = np.bincount(self.codes, weights=people.infectious * people.rel_trans,
+                                       minlength=len(self.agent_names)) * scale
+
+        agent_hazard = self.cross_beta * (self.rates @ agent_infectious) / model.N
+        internal_hazard = model.beta * model.I / model.N
+        flows = model.step(agent_hazard)
+        total_hazard = internal_hazard + agent_hazard
+        share = np.divide(agent_hazard, total_hazard, out=np.zeros_like(total_hazard), where=total_hazard > 0)
+
+        self.results['agent_imports'][t] = self._import_to_agents(people, prevalence)
+        for key in ['S', 'E', 'I', 'R', 'D']:
+            self.results[key][t] = getattr(model, key)
+        self.results['new_infections'][t] = flows['infections']
+        self.results['imports_from_agents'][t] = flows['infections'] * share
+        return
+
+    def country_results(self, key='new_infections'):
+        '''{仓室国家名: 该国的结果数组}'''
+        return {c: self.results[key][:, i] for i, c in enumerate(self.model.names)}
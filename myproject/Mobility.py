@@ -0,0 +1,269 @@
+'''
+跨国出行：代理按出行矩阵离开本国若干天，期间在目的国建立接触，每天只增量修改接触层
+
+create_custom_population 在构建时固定了每个人的国家，逐国生成的层（random、scale_free 等）
+只在同一国家内连边；如果要改变某个人所在的国家，以前只能重建整个层。CountryMobility 作为
+Covasim 干预在每天传播之前：
+- 按出行矩阵 travel_matrix[出发国][目的国]（每人每天出发的概率）从在本国的常住人口中抽取
+  出行者，出行天数 ~ 1 + Poisson(trip_days - 1)；
+- 出行者在指定层中的本国边被暂停（该边的 beta 置 0，原值保存在干预中），回国且对方也在本国时恢复；
+- 出行者在目的国的接触每天从该国的接触池（在本国的常住人口）中重新抽取，写在原有边之后：
+  层的各列是干预持有的缓冲区的视图，长度随当天的接触数调整（缓冲区容量不足时成倍扩展），
+  不改变原有边的位置，前一天的接触也不会作为 beta=0 的死边留在层中；
+- Covasim 每天重建的动态层（dynam_layer）会覆盖这些修改，因此不支持；
+- 每个人的本国边位置由初始化时建立的一次索引（按人排序的边编号）查找。
+因此每天的计算量只与出行者人数（及其接触数）有关，与人口规模无关。
+
+用法：
+    mobility = Mobility.CountryMobility({'A': {'B': 0.002}, 'B': {'A': 0.001}}, layers=['community'], trip_days=5)
+    sim = cv.Sim(..., interventions=mobility)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)  # 需要 sim.people.country
+    sim.run()
+    mobility.results['travellers']   # (npts, 出发国, 目的国) 每天在外的人数
+'''
+import numpy as np
+import covasim as cv
+import ContactNetwork
+
+class CountryMobility(cv.Intervention):
+    '''
+    按出行矩阵在国家之间移动代理
+
+    Args:
+        travel_matrix: {出发国: {目的国: 每人每天出发的概率}}，每个出发国的概率之和不超过 1
+        layers: 出行期间暂停本国边、在目的国建立接触的层名列表（不能是 dynam_layer 的层）
+        n_contacts: 出行者每天在目的国的平均接触数（Poisson），可以是数值或 {层名: 数值}；
+            0 表示只暂停本国边（例如家庭层），None 表示使用该层的平均度数
+        trip_days: 平均出行天数
+        contact_beta: 目的国接触边的 beta
+        start_day: 开始出行的天数
+        end_day: 停止出发的天数（已在外的人仍按计划回国），None 表示一直出行
+        kwargs: 传给 cv.Intervention 的参数（例如 label）
+
+    运行中和运行结束后：
+        self.location: 每个人当前所在国家的编号（与 self.country_names 对应）
+        self.away: 每个人是否在外
+        self.results: {'travellers': (npts, 国家数, 国家数) 每天在外的人数，
+                       'departures': (npts, 国家数, 国家数) 每天出发的人数}
+    '''
+
+    def __init__(self, travel_matrix, layers, n_contacts=None, trip_days=7, contact_beta=1.0,
+                 start_day=0, end_day=None, **kwargs):
+        super().__init__(**kwargs)
+        self.travel_matrix = {origin: dict(dests) for origin, dests in travel_matrix.items()}
+        self.layers = [layers] if isinstance(layers, str) else list(layers)
+        self.n_contacts = n_contacts
+        self.trip_days = trip_days
+        self.contact_beta = contact_beta
+        self.start_day = start_day
+        self.end_day = end_day
+        return
+
+    def initialize(self, sim):
+        super().initialize(sim)
+        if self.trip_days < 1:
+            raise ValueError(f"trip_days 必须不小于 1: {self.trip_days}")
+        for origin, dests in self.travel_matrix.items():
+            probs = list(dests.values())
+            if min(probs, default=0) < 0 or sum(probs) > 1:
+                raise ValueError(f"出发国 '{origin}' 的出行概率必须非负且总和不超过 1: {dests}")
+            if origin in dests:
+                raise ValueError(f"出发国 '{origin}' 不能出行到本国")
+        missing = [lkey for lkey in self.layers if lkey not in sim.people.contacts]
+        if missing:
+            raise ValueError(f"sim.people.contacts 中没有以下层: {missing}，可选: {list(sim.people.contacts.keys())}")
+        dynamic = [lkey for lkey in self.layers if sim['dynam_layer'].get(lkey)]
+        if dynamic:
+            raise ValueError(f"CountryMobility 不支持每天重建的动态层（dynam_layer）: {dynamic}，重建会覆盖暂停的边和出行者的接触")
+        self.npts = sim.npts
+        self.codes = None
+        return
+
+    def _setup_people(self, people):
+        '''第一次调用时（people 上已挂载 country）建立国家编号、接触池和每个人的边索引'''
+        if not ContactNetwork.has_country(people):
+            raise ValueError("sim.people 上没有 country 属性，请先调用 ContactNetwork.attach_custom_attributes(sim.people, popdict)")
+        self.codes, self.country_names = ContactNetwork.country_codes(people)
+        self.codes = self.codes.astype(np.int64)
+        unknown = [c for origin, dests in self.travel_matrix.items() for c in [origin, *dests] if c not in self.country_names]
+        if unknown:
+            raise ValueError(f"travel_matrix 中的国家不在人口中: {sorted(set(unknown))}，人口中的国家: {self.country_names}")
+        n = len(self.country_names)
+        index = {c: i for i, c in enumerate(self.country_names)}
+        self.rates = np.zeros((n, n))
+        for origin, dests in self.travel_matrix.items():
+            for dest, prob in dests.items():
+                self.rates[index[origin], index[dest]] = prob
+
+        n_people = len(people)
+        self.location = self.codes.copy()
+        self.away = np.zeros(n_people, dtype=bool)
+        self.n_home = np.bincount(self.codes, minlength=n)
+        # 接触池：各国常住人口（按编号排序后切片），出行者不在本国时抽到会被剔除
+        order = np.argsort(self.codes, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(self.codes, minlength=n))])
+        self.residents = [order[bounds[c]:bounds[c + 1]] for c in range(n)]
+
+        self._layers = {}
+        for lkey in self.layers:
+            layer = people.contacts[lkey]
+            p1, p2 = layer['p1'], layer['p2']
+            n_edges = len(p1)
+            # 每个人的本国边编号：按端点排序的边编号 + 每人的起始位置
+            ends = np.concatenate([p1, p2])
+            order = np.argsort(ends, kind='stable')
+            indptr = np.concatenate([[0], np.cumsum(np.bincount(ends, minlength=n_people))])
+            n_contacts = self.n_contacts.get(lkey) if isinstance(self.n_contacts, dict) else self.n_contacts
+            if n_contacts is None:
+                n_members = np.count_nonzero(indptr[1:] > indptr[:-1])
+                n_contacts = 2 * n_edges / max(n_members, 1)
+            # 层的各列换成缓冲区的视图，出行者的接触追加在原有边之后
+            buffers = {key: np.array(layer[key]) for key in ['p1', 'p2', 'beta']}
+            for key, buffer in buffers.items():
+                layer[key] = buffer[:n_edges]
+            self._layers[lkey] = {
+                'buffers': buffers,
+                'n_edges': n_edges,
+                'edge_ids': (order % max(n_edges, 1)).astype(np.int64),
+                'indptr': indptr,
+                'beta0': np.array(layer['beta']),
+                'n_contacts': n_contacts,
+                'n_used': 0,
+            }
+
+        self.results = {
+            'travellers': np.zeros((self.npts, n, n)),
+            'departures': np.zeros((self.npts, n, n)),
+        }
+        self._returns = {}
+        return
+
+    def _home_edges(self, lkey, inds):
+        '''inds 中每个人的本国边编号（按人拼接）'''
+        info = self._layers[lkey]
+        starts = info['indptr'][inds]
+        lengths = info['indptr'][inds + 1] - starts
+        total = lengths.sum()
+        if total == 0:
+            return np.array([], dtype=np.int64)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return info['edge_ids'][np.repeat(starts, lengths) + offsets]
+
+    def _suspend(self, people, inds):
+        '''暂停出行者的本国边'''
+        for lkey in self.layers:
+            people.contacts[lkey]['beta'][self._home_edges(lkey, inds)] = 0
+        return
+
+    def _restore(self, people, inds):
+        '''恢复回国者的本国边（对方仍在外的边等对方回国时恢复）'''
+        for lkey in self.layers:
+            layer = people.contacts[lkey]
+            edges = self._home_edges(lkey, inds)
+            present = ~self.away[layer['p1'][edges]] & ~self.away[layer['p2'][edges]]
+            edges = edges[present]
+            layer['beta'][edges] = self._layers[lkey]['beta0'][edges]
+        return
+
+    def _depart(self, sim, t):
+        '''按出行矩阵抽取今天出发的人'''
+        people = sim.people
+        n = len(self.country_names)
+        for origin in range(n):
+            probs = self.rates[origin]
+            if not probs.any() or self.n_home[origin] == 0:
+                continue
+            counts = np.random.multinomial(self.n_home[origin], np.append(probs, max(1 - probs.sum(), 0)))[:n]
+            if not counts.any():
+                continue
+            # 有放回地抽取再去重，并剔除已在外或已死亡的人：抽样量与出行人数成正比
+            pool = self.residents[origin]
+            candidates = np.unique(pool[np.random.randint(len(pool), size=2 * counts.sum() + 10)])
+            candidates = candidates[~self.away[candidates] & ~people.dead[candidates]]
+            np.random.shuffle(candidates)
+            start = 0
+            for dest in np.flatnonzero(counts):
+                travellers = candidates[start:start + counts[dest]]
+                start += counts[dest]
+                if len(travellers) == 0:
+                    continue
+                self.away[travellers] = True
+                self.location[travellers] = dest
+                self.n_home[origin] -= len(travellers)
+                self.results['departures'][t, origin, dest] += len(travellers)
+                durations = 1 + np.random.poisson(self.trip_days - 1, size=len(travellers))
+                for day in np.unique(durations):
+                    self._returns.setdefault(t + int(day), []).append(travellers[durations == day])
+                self._suspend(people, travellers)
+        return
+
+    def _return(self, sim, t):
+        '''今天回国的人'''
+        batches = self._returns.pop(t, None)
+        if not batches:
+            return
+        inds = np.concatenate(batches)
+        self.away[inds] = False
+        self.location[inds] = self.codes[inds]
+        self.n_home += np.bincount(self.codes[inds], minlength=len(self.country_names))
+        self._restore(sim.people, inds)
+        return
+
+    def _draw_visitor_contacts(self, people, lkey, visitors):
+        '''为所有在外的人重新抽取今天在目的国的接触，写入层末尾的空闲位置'''
+        info = self._layers[lkey]
+        layer = people.contacts[lkey]
+        n_edges = info['n_edges']
+        p1, p2 = [], []
+        if len(visitors) and info['n_contacts'] > 0:
+            n_per = np.random.poisson(info['n_contacts'], size=len(visitors))
+            sources = np.repeat(visitors, n_per)
+            dests = self.location[sources]
+            for dest in np.unique(dests):
+                pool = self.residents[dest]
+                mask = dests == dest
+                targets = pool[np.random.randint(len(pool), size=mask.sum())]
+                ok = ~self.away[targets]
+                p1.append(sources[mask][ok])
+                p2.append(targets[ok])
+        p1 = np.concatenate(p1) if p1 else np.array([], dtype=layer.meta['p1'])
+        p2 = np.concatenate(p2) if p2 else np.array([], dtype=layer.meta['p2'])
+
+        # 容量不足时成倍扩展缓冲区（摊销后与出行人数成正比），然后把层的各列换成覆盖今天接触的视图，
+        # 昨天的接触直接被覆盖或截掉
+        buffers = info['buffers']
+        n_total = n_edges + len(p1)
+        capacity = len(buffers['p1'])
+        if n_total > capacity:
+            new_capacity = max(2 * capacity, n_total)
+            for key, buffer in buffers.items():
+                grown = np.zeros(new_capacity, dtype=buffer.dtype)
+                grown[:n_edges] = buffer[:n_edges]
+                buffers[key] = grown
+        buffers['p1'][n_edges:n_total] = p1
+        buffers['p2'][n_edges:n_total] = p2
+        buffers['beta'][n_edges:n_total] = self.contact_beta
+        for key, buffer in buffers.items():
+            layer[key] = buffer[:n_total]
+        info['n_used'] = len(p1)
+        return
+
+    def apply(self, sim):
+        t = sim.t
+        if self.codes is None:
+            self._setup_people(sim.people)
+        self._return(sim, t)
+        if t >= self.start_day and (self.end_day is None or t < self.end_day):
+            self._depart(sim, t)
+
+        # 在外的人（_returns 中尚未回国的批次）
+        batches = [inds for day_batches in self._returns.values() for inds in day_batches]
+        visitors = np.concatenate(batches) if batches else np.array([], dtype=np.int64)
+        for lkey in self.layers:
+            self._draw_visitor_contacts(sim.people, lkey, visitors)
+        if len(visitors):
+            np.add.at(self.results['travellers'][t], (self.codes[visitors], self.location[visitors]), 1)
+        return
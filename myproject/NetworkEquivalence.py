@@ -0,0 +1,187 @@
+'''
+网络生成器的统计等价检验
+
+create_custom_population 中的网络生成器（Covasim 的 cv.make_*_contacts、聚类层的批量生成等）
+如果换成更快的实现，生成的网络必须在统计上等价，否则模拟结果会改变。这里提供：
+- network_statistics: 一个层的度分布、各国边数、局部聚类系数，以及必须严格满足的隔离条件
+  （跨国家的边、年龄范围之外的人参与的边都为 0）；
+- compare_networks: 对两组（同一组种子下）重复构建的统计量，合并后用 KS 检验比较度分布和聚类
+  系数，用卡方检验比较各国边数的构成和自环比例（cv.make_random_contacts 本身会产生少量自环，
+  基准没有自环时替代实现也不能有），并检查隔离条件。
+同一个簇里的人度数相同、边成团出现，个体和边都不是独立样本，直接做 KS/卡方检验会过于敏感；
+这里用重复构建之间的方差估计设计效应（实际方差 / 独立样本时的方差），据此缩小有效样本量
+（KS）或除以离散系数（卡方）。
+用法见 test_network_equivalence.py：
+    reference = [network_statistics(build(seed, 'reference'), 'layer', config) for seed in seeds]
+    candidate = [network_statistics(build(seed, 'fast'), 'layer', config) for seed in seeds]
+    report = compare_networks(reference, candidate)
+    report['passed']
+'''
+import numpy as np
+import scipy.sparse as sp
+import scipy.stats as stats
+import ContactNetwork
+
+# 必须严格为 0 的隔离条件
+ISOLATION_KEYS = ('cross_country', 'outside_age_range')
+
+# compare_networks 中的统计检验
+TESTS = ('degree', 'clustering', 'country_edges', 'self_loops')
+
+def local_clustering(p1, p2, n):
+    '''
+    每个节点的局部聚类系数（重复边和方向合并后计算，度数小于 2 的节点不计入）
+
+    Returns:
+        np.ndarray: 度数不小于 2 的节点的聚类系数
+    '''
+    keep = p1 != p2
+    rows = np.concatenate([p1[keep], p2[keep]])
+    cols = np.concatenate([p2[keep], p1[keep]])
+    adjacency = sp.csr_matrix((np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=(n, n))
+    adjacency.data[:] = 1  # 合并重复边
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    triangles = np.asarray((adjacency @ adjacency).multiply(adjacency).sum(axis=1)).ravel() / 2
+    ok = degree >= 2
+    return 2 * triangles[ok] / (degree[ok] * (degree[ok] - 1))
+
+def network_statistics(popdict, layer_name, config=None):
+    '''
+    计算一个层的统计量
+
+    Args:
+        popdict: create_custom_population 返回的人口字典
+        layer_name: 层名
+        config: 该层的配置（用于 age_range），None 表示所有人都可以参与
+
+    Returns:
+        dict: {
+            'degrees': 可参与该层的每个人的度数（包括 0）,
+            'clustering': 局部聚类系数（见 local_clustering）,
+            'country_edges': {国家名: 边数},
+            'n_edges': 总边数,
+            'self_loops': 自环数,
+            'cross_country', 'outside_age_range': 隔离条件的违反次数
+        }
+    '''
+    layer = popdict['contacts'][layer_name]
+    p1, p2 = np.asarray(layer['p1']), np.asarray(layer['p2'])
+    codes, names = ContactNetwork.country_codes(popdict)
+    ages = popdict['age']
+    n = len(codes)
+
+    eligible = np.ones(n, dtype=bool)
+    age_range = (config or {}).get('age_range')
+    if age_range is not None:
+        eligible = (ages >= age_range[0]) & (ages < age_range[1])
+
+    degree = np.bincount(np.concatenate([p1, p2]), minlength=n)
+    country_edges = np.bincount(codes[p1], minlength=len(names))
+    return {
+        'degrees': degree[eligible],
+        'clustering': local_clustering(p1, p2, n),
+        'country_edges': dict(zip(names, country_edges.tolist())),
+        'n_edges': len(p1),
+        'cross_country': int(np.sum(codes[p1] != codes[p2])),
+        'self_loops': int(np.sum(p1 == p2)),
+        'outside_age_range': int(np.sum(~eligible[p1] | ~eligible[p2])),
+    }
+
+def design_effect(reference, candidate):
+    '''
+    由重复构建之间的差异估计设计效应：各次构建均值的实际方差 / 独立样本时应有的方差（不小于 1）
+
+    Args:
+        reference, candidate: 每次构建的样本数组列表（两组分别以各自的均值为中心）
+    '''
+    deviations, expected = [], []
+    for group in (reference, candidate):
+        group = [np.asarray(x, dtype=float) for x in group if len(x) > 0]
+        if len(group) < 2:
+            continue
+        means = np.array([x.mean() for x in group])
+        pooled = np.concatenate(group)
+        deviations.append(np.sum((means - means.mean()) ** 2) / (len(means) - 1))
+        expected.append(pooled.var() / np.mean([len(x) for x in group]))
+    if not deviations or sum(expected) == 0:
+        return 1.0
+    return max(sum(deviations) / sum(expected), 1.0)
+
+def _ks(reference, candidate, alpha):
+    '''合并各次构建的样本做两样本 KS 检验，有效样本量按设计效应缩小'''
+    pooled_ref, pooled_cand = np.concatenate(reference), np.concatenate(candidate)
+    if len(pooled_ref) == 0 or len(pooled_cand) == 0:
+        passed = len(pooled_ref) == len(pooled_cand)
+        return {'statistic': None, 'pvalue': None, 'passed': passed}
+    statistic = stats.ks_2samp(pooled_ref, pooled_cand).statistic
+    deff = design_effect(reference, candidate)
+    n_eff = len(pooled_ref) * len(pooled_cand) / (len(pooled_ref) + len(pooled_cand)) / deff
+    pvalue = float(stats.kstwobign.sf(statistic * np.sqrt(n_eff)))
+    return {'statistic': float(statistic), 'pvalue': pvalue, 'passed': bool(pvalue >= alpha), 'design_effect': deff}
+
+def _chi2(table, dispersion=1.0):
+    '''列联表卡方检验，统计量除以离散系数'''
+    chi2, _, dof, _ = stats.chi2_contingency(table)
+    chi2 /= dispersion
+    return float(chi2), float(stats.chi2.sf(chi2, dof))
+
+def compare_networks(reference, candidate, alpha=1e-3):
+    '''
+    比较两组重复构建的网络统计量
+
+    Args:
+        reference: 基准生成器的 network_statistics 列表（每个种子一项）
+        candidate: 替代生成器的 network_statistics 列表
+        alpha: 显著性水平，p 值低于 alpha 时判为不等价（检验较多且样本较大，默认取得较严）
+
+    Returns:
+        dict: {
+            'degree': KS 检验结果, 'clustering': KS 检验结果,
+            'country_edges', 'self_loops': 卡方检验结果, 'isolation': {条件: (基准违反次数, 替代违反次数)},
+            'passed': 是否全部通过
+        }
+        每个检验结果为 {'statistic', 'pvalue', 'passed'}
+    '''
+    report = {
+        'degree': _ks([s['degrees'] for s in reference], [s['degrees'] for s in candidate], alpha),
+        'clustering': _ks([s['clustering'] for s in reference], [s['clustering'] for s in candidate], alpha),
+    }
+
+    # 各国边数的构成：2 × 国家数 的列联表；边成团出现，离散系数由各国边数在重复构建之间的方差估计
+    countries = sorted(set().union(*[s['country_edges'] for s in reference + candidate]))
+    counts = np.array([[[s['country_edges'].get(c, 0) for c in countries] for s in group] for group in (reference, candidate)])
+    table = counts.sum(axis=1)
+    keep = table.sum(axis=0) > 0
+    if keep.sum() >= 2:
+        counts = counts[:, :, keep]
+        means = counts.mean(axis=1)
+        variances = counts.var(axis=1, ddof=1) if counts.shape[1] > 1 else means
+        dispersion = max(float(np.sum(variances) / np.sum(means)), 1.0)
+        chi2, pvalue = _chi2(table[:, keep], dispersion)
+        report['country_edges'] = {'statistic': chi2, 'pvalue': pvalue, 'passed': bool(pvalue >= alpha), 'dispersion': dispersion}
+    else:
+        report['country_edges'] = {'statistic': None, 'pvalue': None, 'passed': True}
+
+    # 自环比例：基准没有自环时要求替代实现也没有
+    self_loops = np.array([[sum(s['self_loops'] for s in group), sum(s['n_edges'] - s['self_loops'] for s in group)]
+                           for group in (reference, candidate)])
+    if self_loops[0, 0] == 0:
+        report['self_loops'] = {'statistic': None, 'pvalue': None, 'passed': bool(self_loops[1, 0] == 0)}
+    else:
+        chi2, pvalue = _chi2(self_loops)
+        report['self_loops'] = {'statistic': chi2, 'pvalue': pvalue, 'passed': bool(pvalue >= alpha)}
+
+    report['isolation'] = {key: (sum(s[key] for s in reference), sum(s[key] for s in candidate)) for key in ISOLATION_KEYS}
+    isolated = all(counts == (0, 0) for counts in report['isolation'].values())
+    report['passed'] = isolated and all(report[key]['passed'] for key in TESTS)
+    return report
+
+def format_report(report):
+    '''把 compare_networks 的结果格式化为一行'''
+    parts = []
+    for key in TESTS:
+        result = report[key]
+        parts.append(f"{key} p={result['pvalue']:.3g}" if result['pvalue'] is not None else f"{key} -")
+    violations = {key: counts for key, counts in report['isolation'].items() if counts != (0, 0)}
+    parts.append(f"隔离违反 {violations}" if violations else "隔离条件满足")
+    return '，'.join(parts)
@@ -0,0 +1,605 @@
+'''
+人口增长和输入：在模拟过程中追加代理（出生、移民、输入病例），属性和接触边按
+create_custom_population 的同一套逐国规则生成
+
+Covasim 的 People 数组在初始化时按 pop_size 固定长度，以前要么按最坏情况预留，要么重建人口。
+这里把 sim.people 的每个按人数组（包括 attach_custom_attributes 挂载的 country 等自定义属性）
+和每个接触层的 p1/p2/beta 换成 GrowableArray 的视图：
+- GrowableArray 的底层缓冲区容量不足时按倍数扩展（复制一次），因此追加的均摊代价为 O(1)；
+- 新代理总是追加在末尾，已有代理的下标（uid）不变，外部保存的下标数组仍然有效；
+- 扩展后 people[key] 会换成新缓冲区上的视图，之前取出的数组引用不再同步，应重新读取
+  （Covasim 每一步都从 people 上重新读取，不受影响）。
+
+新代理的属性和边：
+- 国家按调用时给定的人数，年龄和性别按该国的年龄金字塔和性别比例抽样（sample_demographics），
+  也可以直接指定年龄（例如出生时为 0）；Covasim 的状态与新建人口相同，预后参数按年龄设置；
+- 逐国生成的层只在同一国家、且在该层 age_range 内的人之间连边：random 层每个新代理按
+  cv.make_random_contacts 的度数分布与该国的成员均匀连边，scale_free 层按度数优先连接
+  m_connections 条边，microstructured 层在同一批新代理之间按 NETWORK_ENGINES 的生成函数成簇；
+- 聚类层（household/school/workplace）的新代理按相同的分组键（国家、年龄段）组成新簇，
+  或者（join_clusters 中的层，例如出生加入家庭）加入同组中的一个已有簇并与簇内所有人相连。
+
+为新代理选择接触对象使用存储上的增量索引（GroupPools、ClusterChains）：第一次追加时按分组键
+建立一次各层的成员、scale_free 层的边端点和聚类层的簇成员索引（耗时与人口规模成正比），之后每次
+追加只把新代理和新边追加到索引中，耗时只与新代理人数和它们的边数有关。
+
+注意：
+- sim['pop_size'] 随之增长；Covasim 在结束时用最终的 pop_size 换算 n_alive/n_naive，
+  每天的代理数请看 Arrivals 的 results['n_agents']；
+- 其他在初始化时按人数缓存数组的干预（例如 Mobility.CountryMobility）不会感知新代理。
+
+用法：
+    arrivals = PopulationGrowth.Arrivals(layer_config, countries_config, rates={'A': 20, 'B': 5},
+                                         infected={'B': 0.05}, clusters=popdict['clusters'])
+    sim = cv.Sim(..., interventions=arrivals)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)  # 需要 sim.people.country
+    sim.run()
+    arrivals = sim.get_intervention(PopulationGrowth.Arrivals)
+    arrivals.results['arrivals']  # (npts, 国家数) 每天到达的代理数
+'''
+import numpy as np
+import covasim as cv
+import covasim.utils as cvu
+import ContactNetwork
+
+# 到达时已感染的代理在 infection_log 中的层名
+ARRIVAL_LAYER = 'arrival'
+
+class GrowableArray:
+    '''
+    沿最后一个轴追加的数组，容量不足时按 growth 倍扩展底层缓冲区
+
+    Args:
+        values: 初始数组（一维，或最后一个轴为人的二维数组，例如 Covasim 的 sus_imm）
+        capacity: 初始容量，None 表示与 values 相同
+        growth: 扩展倍数
+    '''
+
+    def __init__(self, values, capacity=None, growth=2.0):
+        values = np.asarray(values)
+        if growth <= 1:
+            raise ValueError(f"growth 必须大于 1: {growth}")
+        self.n = values.shape[-1]
+        self.growth = growth
+        self.n_reallocations = 0
+        self.buffer = np.empty(values.shape[:-1] + (max(capacity or 0, self.n, 1),), dtype=values.dtype)
+        self.buffer[..., :self.n] = values
+        return
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def capacity(self):
+        return self.buffer.shape[-1]
+
+    @property
+    def view(self):
+        '''当前长度的视图（与缓冲区共享内存）'''
+        return self.buffer[..., :self.n]
+
+    def reserve(self, capacity):
+        '''保证容量不小于 capacity'''
+        if capacity > self.capacity:
+            buffer = np.empty(self.buffer.shape[:-1] + (int(capacity),), dtype=self.buffer.dtype)
+            buffer[..., :self.n] = self.buffer[..., :self.n]
+            self.buffer = buffer
+            self.n_reallocations += 1
+        return
+
+    def extend(self, values):
+        '''在末尾追加 values（最后一个轴），返回新的视图'''
+        values = np.asarray(values)
+        k = values.shape[-1]
+        if self.n + k > self.capacity:
+            self.reserve(max(self.n + k, int(np.ceil(self.capacity * self.growth))))
+        self.buffer[..., self.n:self.n + k] = values
+        self.n += k
+        return self.view
+
+def _set_prognoses(people, inds):
+    '''按年龄设置 inds 的预后参数（与 cv.People.set_prognoses 相同，但只处理新代理且不重置种子）'''
+    progs = people.pars['prognoses']
+    age_bins = np.digitize(people.age[inds], progs['age_cutoffs']) - 1
+    people.symp_prob[inds] = progs['symp_probs'][age_bins]
+    people.severe_prob[inds] = progs['severe_probs'][age_bins] * progs['comorbidities'][age_bins]
+    people.crit_prob[inds] = progs['crit_probs'][age_bins]
+    people.death_prob[inds] = progs['death_probs'][age_bins]
+    people.rel_sus[inds] = progs['sus_ORs'][age_bins]
+    people.rel_trans[inds] = progs['trans_ORs'][age_bins] * cvu.sample(**people.pars['beta_dist'], size=len(inds))
+    return
+
+class GroupPools:
+    '''
+    按分组键（例如国家编号）保存成员的增量索引：每个键一个 GrowableArray，追加时只对新成员分组，
+    抽取时只对抽取的项排序，与已有成员数无关
+    '''
+
+    def __init__(self):
+        self.pools = {}
+        return
+
+    @staticmethod
+    def _groups(keys):
+        '''按键稳定排序后的顺序，以及每个键的 (键, 起点, 终点)'''
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        return order, zip(sorted_keys[starts].tolist(), starts, ends)
+
+    def add(self, members, keys):
+        members = np.asarray(members, dtype=np.int64)
+        if len(members) == 0:
+            return
+        order, groups = self._groups(np.asarray(keys, dtype=np.int64))
+        for key, start, end in groups:
+            if key not in self.pools:
+                self.pools[key] = GrowableArray(np.empty(0, dtype=np.int64))
+            self.pools[key].extend(members[order[start:end]])
+        return
+
+    def sizes(self, keys):
+        '''每个键的成员数'''
+        unique, inverse = np.unique(np.asarray(keys, dtype=np.int64), return_inverse=True)
+        return np.array([len(self.pools[key]) if key in self.pools else 0 for key in unique.tolist()], dtype=np.int64)[inverse]
+
+    def draw(self, keys, n_draws):
+        '''为每个键有放回地均匀抽取 n_draws 个成员（按 np.repeat(keys, n_draws) 的顺序拼接），没有成员的键为 -1'''
+        keys = np.repeat(np.asarray(keys, dtype=np.int64), n_draws)
+        drawn = np.full(len(keys), -1, dtype=np.int64)
+        if len(keys) == 0:
+            return drawn
+        order, groups = self._groups(keys)
+        for key, start, end in groups:
+            pool = self.pools.get(key)
+            if pool is not None and len(pool):
+                drawn[order[start:end]] = pool.view[(np.random.random(end - start) * len(pool)).astype(np.int64)]
+        return drawn
+
+class ClusterChains:
+    '''
+    簇成员的增量索引（链表）：head[簇] 是最后加入的成员，after[人] 是同簇中在他之前加入的成员，
+    没有时为 -1。加入一个成员只修改两个位置，沿链表即可得到他加入时簇内已有的所有人
+
+    Args:
+        ids: 每个人的簇编号，-1 表示不在任何簇中
+    '''
+
+    def __init__(self, ids):
+        ids = np.asarray(ids)
+        self.head = GrowableArray(np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64))
+        self.after = GrowableArray(np.full(len(ids), -1, dtype=np.int64))
+        members = np.flatnonzero(ids >= 0)
+        self.add(members, ids[members])
+        return
+
+    @property
+    def n_clusters(self):
+        return len(self.head)
+
+    def add(self, inds, clusters):
+        '''按 (簇, 下标) 的顺序把 inds 加入各自的簇'''
+        inds = np.asarray(inds, dtype=np.int64)
+        if len(inds) == 0:
+            return
+        clusters = np.asarray(clusters, dtype=np.int64)
+        if clusters.max() >= self.n_clusters:
+            self.head.extend(np.full(clusters.max() + 1 - self.n_clusters, -1, dtype=np.int64))
+        if inds.max() >= len(self.after):
+            self.after.extend(np.full(inds.max() + 1 - len(self.after), -1, dtype=np.int64))
+        order = np.lexsort((inds, clusters))
+        inds, clusters = inds[order], clusters[order]
+        first = np.r_[True, clusters[1:] != clusters[:-1]]
+        last = np.r_[first[1:], True]
+        head, after = self.head.view, self.after.view
+        after[inds[first]] = head[clusters[first]]
+        after[inds[1:][~first[1:]]] = inds[:-1][~first[1:]]
+        head[clusters[last]] = inds[last]
+        return
+
+    def before(self, inds):
+        '''同簇中在 inds 之前加入的所有人，返回 (inds 中的位置, 成员)，循环次数为最大簇规模'''
+        after = self.after.view
+        pos = np.arange(len(inds))
+        current = after[np.asarray(inds, dtype=np.int64)]
+        found_pos, found = [pos[:0]], [current[:0]]
+        while len(pos):
+            keep = current >= 0
+            pos, current = pos[keep], current[keep]
+            found_pos.append(pos)
+            found.append(current)
+            current = after[current]
+        return np.concatenate(found_pos), np.concatenate(found)
+
+class PeopleStorage:
+    '''
+    sim.people 的可增长存储：每个按人数组、自定义属性、接触层和簇编号对应一个 GrowableArray，
+    people 上的数组是它们的视图。同一个 people 上的所有 GrowablePeople（例如出生和移民两个
+    Arrivals）共享一个存储，见 attach
+
+    Args:
+        people: 已挂载 country 的 sim.people
+        country_names: 国家编号对应的国家名（countries_config 的顺序）
+        clusters: 可选，{层名: 每个人的簇编号}
+        capacity: 初始容量（代理数），None 表示与当前人口相同
+    '''
+
+    def __init__(self, people, country_names, clusters=None, capacity=None):
+        n = len(people)
+        index = {c: i for i, c in enumerate(country_names)}
+        inverse, names = ContactNetwork.country_codes(people)
+        missing = [c for c in names if c not in index]
+        if missing:
+            raise ValueError(f"人口中的国家不在 countries_config 中: {missing}")
+        self.people = people
+        self.country_names = list(country_names)
+        self.codes = GrowableArray(np.array([index[c] for c in names], dtype=np.int64)[inverse], capacity)
+
+        # Covasim 的状态数组，以及长度与人口相同的自定义属性（country、country_code 等）
+        self.custom_keys = [key for key, value in vars(people).items()
+                            if key not in people.keys() and isinstance(value, np.ndarray) and value.ndim == 1 and len(value) == n]
+        self.arrays = {key: GrowableArray(people[key], capacity) for key in people.keys() + self.custom_keys}
+        self.layers = {lkey: {key: GrowableArray(people.contacts[lkey][key]) for key in people.contacts[lkey].meta_keys()}
+                       for lkey in people.contacts.keys()}
+        self.clusters = {lkey: GrowableArray(ids, capacity) for lkey, ids in (clusters or {}).items()}
+        self.indexes = {}  # GrowablePeople 的增量索引：{(类别, 层名): GroupPools 或 ClusterChains}
+        self.publish()
+        return
+
+    @classmethod
+    def attach(cls, people, country_names, clusters=None, capacity=None):
+        '''
+        返回 people 上已有的存储，没有（或 people 被复制过，数组已不是存储的视图）时新建一个；
+        已有存储中没有的簇编号会被补充
+        '''
+        storage = vars(people).get('_growable_storage')
+        if storage is not None and not storage.is_current(people):
+            clusters = dict({lkey: arr.view for lkey, arr in storage.clusters.items()}, **(clusters or {}))
+            storage = None
+        if storage is None:
+            storage = cls(people, country_names, clusters, capacity)
+            vars(people)['_growable_storage'] = storage  # people 被锁定时也可以保存
+        elif list(country_names) != storage.country_names:
+            raise ValueError(f"countries_config 的国家顺序与已有存储不一致: {list(country_names)} vs {storage.country_names}")
+        else:
+            for lkey, ids in (clusters or {}).items():
+                if lkey not in storage.clusters:
+                    storage.clusters[lkey] = GrowableArray(ids, storage.codes.capacity)
+        return storage
+
+    def is_current(self, people):
+        '''people 的数组是否仍是这个存储的视图（sim 被深复制后不是）'''
+        return people is self.people and people['uid'].base is self.arrays['uid'].buffer and len(people) == len(self)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def publish(self):
+        '''把 people 上的数组换成当前缓冲区的视图'''
+        for key, arr in self.arrays.items():
+            self.people[key] = arr.view
+        for lkey, arrays in self.layers.items():
+            for key, arr in arrays.items():
+                self.people.contacts[lkey][key] = arr.view
+        return
+
+    def append_people(self, codes, ages, sexes):
+        '''追加 Covasim 状态（与新建人口相同的默认值）和自定义属性，返回新代理的下标'''
+        people = self.people
+        n_old, k = len(self), len(codes)
+        fresh = cv.People(dict(people.pars, pop_size=k))
+        values = {key: fresh[key] for key in people.keys()}
+        values['uid'] = np.arange(n_old, n_old + k, dtype=cv.default_int)
+        values['age'] = ages
+        values['sex'] = sexes
+        for key in self.custom_keys:
+            if key == 'country':
+                values[key] = np.array(self.country_names)[codes]
+            elif key == 'country_code':
+                values[key] = codes  # compact 策略下 country_code 与 countries_config 的顺序一致
+            else:
+                values[key] = np.zeros(k, dtype=self.arrays[key].buffer.dtype)
+        for key, arr in self.arrays.items():
+            arr.extend(values[key])
+        self.codes.extend(codes)
+        for arr in self.clusters.values():
+            arr.extend(np.full(k, -1, dtype=arr.buffer.dtype))
+        people.pars['pop_size'] = len(self)  # 与 sim.pars 是同一个字典
+        self.publish()
+        inds = np.arange(n_old, n_old + k)
+        _set_prognoses(people, inds)
+        return inds
+
+    def append_edges(self, lkey, p1, p2):
+        layer = self.layers[lkey]
+        layer['p1'].extend(np.asarray(p1, dtype=cv.default_int))
+        layer['p2'].extend(np.asarray(p2, dtype=cv.default_int))
+        layer['beta'].extend(np.ones(len(p1), dtype=cv.default_float))
+        return
+
+class GrowablePeople:
+    '''
+    按 create_custom_population 的规则向 sim.people 追加代理
+
+    Args:
+        people: 已初始化、已挂载 country 的 sim.people
+        layer_config: 构建人口时使用的层配置（见 create_custom_population）
+        countries_config: 构建人口时使用的国家配置
+        clusters: 可选，popdict['clusters']；提供后新代理的簇编号会被记录，join_clusters 需要它
+        join_clusters: 新代理加入已有簇（而不是组成新簇）的聚类层名列表
+        engine: microstructured 层使用的生成引擎，见 ContactNetwork.NETWORK_ENGINES
+        capacity: 初始容量（代理数），None 表示与当前人口相同，之后按倍数扩展
+    '''
+
+    def __init__(self, people, layer_config, countries_config, clusters=None, join_clusters=(), engine='reference',
+                 capacity=None):
+        if not ContactNetwork.has_country(people):
+            raise ValueError("sim.people 上没有 country 属性，请先调用 ContactNetwork.attach_custom_attributes(sim.people, popdict)")
+        ContactNetwork.validate_layer_config(layer_config)
+        self.country_names, _ = ContactNetwork.validate_countries_config(countries_config)
+        if engine not in ContactNetwork.NETWORK_ENGINES:
+            raise ValueError(f"未知的网络生成引擎: {engine!r}，可选: {list(ContactNetwork.NETWORK_ENGINES)}")
+        self.layer_config = {lkey: config for lkey, config in layer_config.items() if lkey in people.contacts}
+        self.countries_config = countries_config
+        self.engine = engine
+        self.join_clusters = [join_clusters] if isinstance(join_clusters, str) else list(join_clusters)
+        unknown = [lkey for lkey in self.join_clusters
+                   if self.layer_config.get(lkey, {}).get('network_type') not in ContactNetwork.CLUSTERED_LAYER_DEFAULTS]
+        if unknown:
+            raise ValueError(f"join_clusters 中的层不是聚类层（household/school/workplace）: {unknown}")
+        if self.join_clusters and clusters is None:
+            raise ValueError("join_clusters 需要提供 clusters（popdict['clusters']）")
+        self.people = people
+        self.capacity = capacity
+        clusters = {lkey: ids for lkey, ids in (clusters or {}).items() if lkey in self.layer_config}
+        self.storage = PeopleStorage.attach(people, self.country_names, clusters, capacity)
+        return
+
+    def __len__(self):
+        return len(self.storage)
+
+    @property
+    def codes(self):
+        '''每个人的国家编号（countries_config 的顺序）'''
+        return self.storage.codes
+
+    @property
+    def clusters(self):
+        return self.storage.clusters
+
+    def _eligible(self, config, inds):
+        age_range = config.get('age_range')
+        if age_range is None:
+            return inds
+        ages = self.people.age[inds]
+        return inds[(ages >= age_range[0]) & (ages < age_range[1])]
+
+    def _group_keys(self, config, inds):
+        '''与 create_custom_population 相同的聚类分组键，见 ContactNetwork.cluster_group_keys'''
+        age_band = config.get('age_band', ContactNetwork.CLUSTERED_LAYER_DEFAULTS[config['network_type']]['age_band'])
+        return ContactNetwork.cluster_group_keys(self.codes.view[inds], self.people.age[inds], age_band, len(self.country_names))
+
+    def _build_indexes(self):
+        '''建立还没有的增量索引（只在第一次追加、追加新代理之前执行一次，耗时与人口规模成正比）'''
+        indexes = self.storage.indexes
+        everyone = np.arange(len(self))
+        for lkey, config in self.layer_config.items():
+            network_type = config.get('network_type')
+            if network_type in ('random', 'scale_free') and ('members', lkey) not in indexes:
+                members = self._eligible(config, everyone)
+                indexes['members', lkey] = GroupPools()
+                indexes['members', lkey].add(members, self.codes.view[members])
+            if network_type == 'scale_free' and ('ends', lkey) not in indexes:
+                layer = self.storage.layers[lkey]
+                ends = np.concatenate([layer['p1'].view, layer['p2'].view])
+                indexes['ends', lkey] = GroupPools()
+                indexes['ends', lkey].add(ends, self.codes.view[ends])
+            if lkey in self.clusters and ('clusters', lkey) not in indexes:
+                indexes['clusters', lkey] = ClusterChains(self.clusters[lkey].view)
+            if lkey in self.join_clusters and ('hosts', lkey) not in indexes:
+                hosts = np.flatnonzero(self.clusters[lkey].view >= 0)
+                indexes['hosts', lkey] = GroupPools()
+                indexes['hosts', lkey].add(hosts, self._group_keys(config, hosts))
+        return
+
+    def _random_edges(self, lkey, config, new_inds):
+        # 与 cv.make_random_contacts 相同的度数：发起 round(Poisson(n)/2) 条边，另有约 n/2 条由其他人发起
+        n_contacts = config.get('n_contacts', ContactNetwork.PER_COUNTRY_LAYER_DEFAULTS['random']['n_contacts'])
+        k = len(new_inds)
+        n_draws = np.round(np.random.poisson(n_contacts, size=k) / 2.0).astype(np.int64) + np.random.poisson(n_contacts / 2.0, size=k)
+        members = self.storage.indexes['members', lkey]
+        members.add(new_inds, self.codes.view[new_inds])
+        partners = members.draw(self.codes.view[new_inds], n_draws)
+        self.storage.append_edges(lkey, np.repeat(new_inds, n_draws), partners)
+        return
+
+    def _scale_free_edges(self, lkey, config, new_inds):
+        # 按度数优先连接：在该国已有边的端点中均匀抽取，等价于按度数加权
+        m = config.get('m_connections', ContactNetwork.PER_COUNTRY_LAYER_DEFAULTS['scale_free']['m_connections'])
+        ends, members = self.storage.indexes['ends', lkey], self.storage.indexes['members', lkey]
+        new_codes = self.codes.view[new_inds]
+        members.add(new_inds, new_codes)
+        p1 = np.repeat(new_inds, m)
+        p2 = ends.draw(new_codes, m)
+        no_edges = np.repeat(ends.sizes(new_codes) == 0, m)
+        if no_edges.any():  # 该国还没有边：在同国成员中均匀连接
+            p2[no_edges] = members.draw(np.repeat(new_codes, m)[no_edges], 1)
+        self.storage.append_edges(lkey, p1, p2)
+        ends.add(np.concatenate([p1, p2]), np.concatenate([self.codes.view[p1], self.codes.view[p2]]))
+        return
+
+    def _microstructured_edges(self, lkey, config, new_inds):
+        generators = ContactNetwork.NETWORK_ENGINES
+        generate = generators[self.engine].get(config['network_type']) or generators['reference'][config['network_type']]
+        codes = self.codes.view[new_inds]
+        for code in np.unique(codes):
+            group = new_inds[codes == code]
+            contacts = generate(len(group), config)
+            self.storage.append_edges(lkey, group[contacts['p1']], group[contacts['p2']])
+        return
+
+    def _new_cluster_edges(self, lkey, config, new_inds):
+        defaults = ContactNetwork.CLUSTERED_LAYER_DEFAULTS[config['network_type']]
+        cluster_size = config.get('cluster_size')
+        contacts, member_clusters = ContactNetwork.make_clustered_contacts(
+            new_inds, group_keys=self._group_keys(config, new_inds),
+            cluster_size=cluster_size if cluster_size is not None else defaults['cluster_size'],
+            size_distribution=config.get('size_distribution'))
+        self.storage.append_edges(lkey, contacts['p1'], contacts['p2'])
+        if lkey in self.clusters:
+            chains = self.storage.indexes['clusters', lkey]
+            ids = self.clusters[lkey].view
+            ids[new_inds] = member_clusters + chains.n_clusters
+            chains.add(new_inds, ids[new_inds])
+            if ('hosts', lkey) in self.storage.indexes:
+                self.storage.indexes['hosts', lkey].add(new_inds, self._group_keys(config, new_inds))
+        return
+
+    def _join_cluster_edges(self, lkey, config, new_inds):
+        '''新代理加入同组中一个已有成员所在的簇，与簇内（包括同一批先加入的）所有人相连'''
+        ids = self.clusters[lkey].view
+        hosts, chains = self.storage.indexes['hosts', lkey], self.storage.indexes['clusters', lkey]
+        new_keys = self._group_keys(config, new_inds)
+        joining = hosts.sizes(new_keys) > 0
+        if (~joining).any():  # 同组没有已有簇：组成新簇
+            self._new_cluster_edges(lkey, config, new_inds[~joining])
+        if not joining.any():
+            return
+        joiners = new_inds[joining]
+        ids[joiners] = ids[hosts.draw(new_keys[joining], 1)]
+
+        # 按 (簇, uid) 的顺序加入簇，每个新代理与同簇中在它之前加入的所有人相连
+        chains.add(joiners, ids[joiners])
+        pos, members = chains.before(joiners)
+        self.storage.append_edges(lkey, joiners[pos], members)
+        hosts.add(joiners, new_keys[joining])
+        return
+
+    def add_agents(self, counts, ages=None):
+        '''
+        追加代理
+
+        Args:
+            counts: {国家名: 人数}
+            ages: None 表示按该国的年龄金字塔抽样；数值或 {国家名: 数值} 表示固定年龄（例如出生为 0）
+
+        Returns:
+            np.ndarray: 新代理的下标（按国家在 countries_config 中的顺序排列）
+        '''
+        unknown = [c for c in counts if c not in self.country_names]
+        if unknown:
+            raise ValueError(f"以下国家不在 countries_config 中: {unknown}，可选: {self.country_names}")
+        codes = np.repeat(np.arange(len(self.country_names)),
+                          [int(counts.get(c, 0)) for c in self.country_names])
+        if len(codes) == 0:
+            return np.array([], dtype=np.int64)
+        sampled_ages, sexes = ContactNetwork.sample_demographics(codes, self.countries_config)
+        if isinstance(ages, dict):
+            fixed = np.array([ages.get(c, np.nan) for c in self.country_names], dtype=float)[codes]
+            sampled_ages = np.where(np.isnan(fixed), sampled_ages, fixed)
+        elif ages is not None:
+            sampled_ages = np.full(len(codes), ages, dtype=float)
+        self.storage = PeopleStorage.attach(self.people, self.country_names, capacity=self.capacity)
+        self._build_indexes()
+        new_inds = self.storage.append_people(codes, sampled_ages, sexes)
+
+        for lkey, config in self.layer_config.items():
+            eligible = self._eligible(config, new_inds)
+            if len(eligible) == 0:
+                continue
+            network_type = config.get('network_type')
+            if network_type in ContactNetwork.CLUSTERED_LAYER_DEFAULTS:
+                if lkey in self.join_clusters:
+                    self._join_cluster_edges(lkey, config, eligible)
+                else:
+                    self._new_cluster_edges(lkey, config, eligible)
+            elif network_type == 'random':
+                self._random_edges(lkey, config, eligible)
+            elif network_type == 'scale_free':
+                self._scale_free_edges(lkey, config, eligible)
+            elif network_type == 'microstructured':
+                self._microstructured_edges(lkey, config, eligible)
+        self.storage.publish()
+        return new_inds
+
+class Arrivals(cv.Intervention):
+    '''
+    每天按国家追加代理（出生、移民、输入病例）
+
+    Args:
+        layer_config, countries_config: 构建人口时使用的配置
+        rates: {国家名: 每天平均到达人数}（Poisson），或函数 rates(sim) -> {国家名: 人数}
+        ages: 新代理的年龄，见 GrowablePeople.add_agents
+        infected: {国家名: 到达时已感染的比例}，用于输入病例
+        clusters, join_clusters, engine, capacity: 见 GrowablePeople
+        start_day, end_day: 到达的起止天数（end_day 为 None 表示一直到达）
+        kwargs: 传给 cv.Intervention 的参数（例如 label）
+
+    运行中和运行结束后：
+        self.population: GrowablePeople
+        self.results: {'arrivals': (npts, 国家数) 每天到达的代理数，
+                       'infected_arrivals': (npts, 国家数) 其中已感染的代理数，
+                       'n_agents': (npts,) 每天结束追加后的代理总数}
+    '''
+
+    def __init__(self, layer_config, countries_config, rates, ages=None, infected=None, clusters=None, join_clusters=(),
+                 engine='reference', capacity=None, start_day=0, end_day=None, **kwargs):
+        super().__init__(**kwargs)
+        self.layer_config = layer_config
+        self.countries_config = countries_config
+        self.rates = rates if callable(rates) else dict(rates)
+        self.ages = ages
+        self.infected = dict(infected or {})
+        self.clusters = clusters
+        self.join_clusters = join_clusters
+        self.engine = engine
+        self.capacity = capacity
+        self.start_day = start_day
+        self.end_day = end_day
+        return
+
+    def initialize(self, sim):
+        super().initialize(sim)
+        self.country_names, _ = ContactNetwork.validate_countries_config(self.countries_config)
+        keys = ([] if callable(self.rates) else list(self.rates)) + list(self.infected)
+        unknown = [c for c in keys if c not in self.country_names]
+        if unknown:
+            raise ValueError(f"以下国家不在 countries_config 中: {sorted(set(unknown))}")
+        bad = {c: p for c, p in self.infected.items() if not 0 <= p <= 1}
+        if bad:
+            raise ValueError(f"infected 中的比例必须在 0 到 1 之间: {bad}")
+        n = len(self.country_names)
+        self.results = {
+            'arrivals': np.zeros((sim.npts, n)),
+            'infected_arrivals': np.zeros((sim.npts, n)),
+            'n_agents': np.zeros(sim.npts),
+        }
+        self.population = None
+        return
+
+    def apply(self, sim):
+        t = sim.t
+        if self.population is None:
+            self.population = GrowablePeople(sim.people, self.layer_config, self.countries_config, clusters=self.clusters,
+                                             join_clusters=self.join_clusters, engine=self.engine, capacity=self.capacity)
+        if t >= self.start_day and (self.end_day is None or t < self.end_day):
+            if callable(self.rates):
+                counts = self.rates(sim)
+            else:
+                counts = {c: np.random.poisson(rate) for c, rate in self.rates.items()}
+            new_inds = self.population.add_agents(counts, ages=self.ages)
+            if len(new_inds):
+                codes = self.population.codes.view[new_inds]
+                self.results['arrivals'][t] = np.bincount(codes, minlength=len(self.country_names))
+                prob = np.array([self.infected.get(c, 0.0) for c in self.country_names])[codes]
+                infected = new_inds[np.random.random(len(new_inds)) < prob]
+                if len(infected):
+                    sim.people.infect(inds=infected, layer=ARRIVAL_LAYER)
+                    self.results['infected_arrivals'][t] = np.bincount(self.population.codes.view[infected],
+                                                                       minlength=len(self.country_names))
+        self.results['n_agents'][t] = len(sim.people)
+        return
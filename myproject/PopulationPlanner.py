@@ -0,0 +1,497 @@
+'''
+构建人口前的预估（dry run）：校验配置，预测每个层的边数、内存占用和构建/运行时间
+
+在启动千万级人口的 create_custom_population 之前，先根据 layer_config（m_connections、
+n_contacts、cluster_size、age_range 等）和 countries_config（比例、年龄金字塔）解析地估计：
+- 每个层参与的人数和期望边数；
+- 内存：popdict 中的人员数组、各层边列表、Covasim People 的状态数组，以及构建和运行过程中的
+  临时数组峰值；
+- 时间：按基准测试标定的系数（每条边、每人、每人每天的耗时）估计构建和运行时间。
+超过内存预算时：稳态内存放不下则拒绝构建（MemoryError）；只是构建峰值超出时，对聚类层分批
+构建（create_custom_population 的 chunk_members）以降低峰值。
+
+系数默认取 DEFAULT_COST_MODEL（在开发机上测得），换机器后可以用 calibrate_cost_model() 重新标定：
+    model = PopulationPlanner.calibrate_cost_model()
+    plan = PopulationPlanner.plan_population(10_000_000, layer_config, countries_config,
+                                             n_days=180, memory_budget='16GB', cost_model=model)
+    PopulationPlanner.print_plan(plan)
+    popdict, keys = PopulationPlanner.build_population(plan)
+'''
+import math
+import re
+import time
+import tracemalloc
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+
+# 默认的成本模型系数（开发机上由 calibrate_cost_model 测得）
+#   build_seconds_per_edge: 各网络类型每条边的构建耗时
+#   build_bytes_per_member / build_bytes_per_edge: 构建一个层时除输出的边列表外的临时内存，
+#       按参与人数和边数线性估计（两种接触密度下测得后解出）
+#   build_seconds_per_agent: 人口学属性和国家分配的每人耗时
+#   people_bytes_per_agent: Covasim People 每人的状态数组内存（不含接触层）
+#   run_seconds_per_agent_day / run_seconds_per_edge_day: 运行时每人每天、每条边每天的耗时
+#   run_bytes_per_edge: 计算传播时按边分配的临时内存（只计最大的层）
+DEFAULT_COST_MODEL = {
+    'build_seconds_per_edge': {
+        Enums.NetWorkType.scale_free.name: 2.0e-6,
+        Enums.NetWorkType.random.name: 8.0e-7,
+        Enums.NetWorkType.microstructured.name: 3.5e-6,
+        Enums.NetWorkType.household.name: 3.0e-7,
+        Enums.NetWorkType.school.name: 5.0e-8,
+        Enums.NetWorkType.workplace.name: 8.0e-8,
+    },
+    'build_bytes_per_member': {
+        Enums.NetWorkType.scale_free.name: 120.0,
+        Enums.NetWorkType.random.name: 44.0,
+        Enums.NetWorkType.microstructured.name: 25.0,
+        Enums.NetWorkType.household.name: 48.0,
+        Enums.NetWorkType.school.name: 38.0,
+        Enums.NetWorkType.workplace.name: 40.0,
+    },
+    'build_bytes_per_edge': {
+        Enums.NetWorkType.scale_free.name: 40.0,
+        Enums.NetWorkType.random.name: 66.0,
+        Enums.NetWorkType.microstructured.name: 42.0,
+        Enums.NetWorkType.household.name: 14.0,
+        Enums.NetWorkType.school.name: 16.0,
+        Enums.NetWorkType.workplace.name: 16.0,
+    },
+    'build_seconds_per_agent': 2.0e-7,
+    'people_bytes_per_agent': 202.0,
+    'run_seconds_per_agent_day': 2.3e-7,
+    'run_seconds_per_edge_day': 7.7e-9,
+    'run_bytes_per_edge': 16.0,
+}
+
+# 每条边在层中占用的字节数：p1、p2（int32）和 beta（float32）
+LAYER_BYTES_PER_EDGE = 12
+
+# 生成函数输出的边列表（p1、p2，int32）每条边的字节数；分批或逐国生成时拼接需要两份
+OUTPUT_BYTES_PER_EDGE = 8
+
+# 压缩（compact_layer_edges）时每条边的临时内存：int64 的端点、键、排序副本和逆索引
+COMPACT_BYTES_PER_EDGE = 48
+
+_UNITS = {'': 1, 'B': 1, 'KB': 2**10, 'MB': 2**20, 'GB': 2**30, 'TB': 2**40}
+
+def parse_memory(value):
+    '''
+    将内存大小转换为字节数
+
+    Args:
+        value: 字节数（数值）或带单位的字符串，例如 '512MB'、'16GB'
+
+    Returns:
+        int: 字节数
+    '''
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?B?)\s*', str(value).upper())
+    if not match:
+        raise ValueError(f"无法解析内存大小: {value!r}，示例: '512MB'、'16GB'")
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+def format_bytes(n):
+    '''将字节数格式化为便于阅读的字符串'''
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(n) < 1024:
+            return f'{n:.1f}{unit}'
+        n /= 1024
+    return f'{n:.1f}TB'
+
+def age_fraction(countries_config, age_range):
+    '''
+    按各国年龄金字塔（段内均匀分布）计算年龄落在 [min_age, max_age) 的人口比例
+
+    Returns:
+        np.ndarray: 按 countries_config 键顺序排列的比例
+    '''
+    demographics = ContactNetwork.validate_demographics(countries_config)
+    if age_range is None:
+        return np.ones(len(demographics))
+    min_age, max_age = age_range
+    fractions = []
+    for _, bins, weights, _ in demographics:
+        bins = np.asarray(bins)
+        weights = np.asarray(weights) / np.sum(weights)
+        lower, upper = bins[:-1], bins[1:]
+        overlap = np.clip(np.minimum(upper, max_age) - np.maximum(lower, min_age), 0, None) / (upper - lower)
+        fractions.append(float(np.dot(weights, overlap)))
+    return np.array(fractions)
+
+def _poisson_pmf(mean, n_max):
+    k = np.arange(n_max + 1)
+    if mean <= 0:
+        return k, (k == 0).astype(float)
+    log_pmf = k * math.log(mean) - mean - np.array([math.lgamma(i + 1) for i in k])
+    return k, np.exp(log_pmf)
+
+def edges_per_member(config):
+    '''
+    估计一个层中每个参与者贡献的期望边数（每条无向边只计一次）
+
+    - random: Covasim 为每人抽 Poisson(n_contacts) 个接触并取一半（四舍五入）作为发起的边
+    - microstructured: 簇大小 ~ Poisson(cluster_size)，簇内两两相连，每人约 cluster_size/2 条边
+    - scale_free: 每个新加入的节点连接 m_connections 条边
+    - household/school/workplace: 簇大小 k ~ 1 + Poisson(cluster_size - 1) 或 size_distribution，
+      每人 E[k(k-1)/2] / E[k] 条边
+    '''
+    network_type = config['network_type']
+    if network_type == Enums.NetWorkType.random.name:
+        n = config.get('n_contacts', 10)
+        k, pmf = _poisson_pmf(n, int(n + 10 * math.sqrt(n) + 20))
+        return float(np.dot(pmf, np.round(k / 2.0)))
+    if network_type == Enums.NetWorkType.microstructured.name:
+        return config.get('cluster_size', 3.0) / 2.0
+    if network_type == Enums.NetWorkType.scale_free.name:
+        return float(config.get('m_connections', 2))
+
+    sizes, weights = _cluster_size_pmf(config)
+    return float(np.dot(weights, sizes * (sizes - 1) / 2) / np.dot(weights, sizes))
+
+def _cluster_size_pmf(config):
+    '''聚类层的簇大小分布：(簇大小, 概率)'''
+    distribution = config.get('size_distribution')
+    if distribution is not None:
+        sizes = np.array(list(distribution.keys()), dtype=float)
+        weights = np.array(list(distribution.values()), dtype=float)
+        return sizes, weights / weights.sum()
+    cluster_size = config.get('cluster_size')
+    if cluster_size is None:
+        cluster_size = ContactNetwork.CLUSTERED_LAYER_DEFAULTS[config['network_type']]['cluster_size']
+    k, weights = _poisson_pmf(cluster_size - 1, int(cluster_size + 10 * math.sqrt(cluster_size) + 20))
+    return k + 1.0, weights
+
+def edges_lost_per_group(config):
+    '''
+    聚类层每个分组末尾被截断的簇少掉的期望边数
+
+    make_clustered_contacts 的簇边界（簇大小的累积和）与分组边界相互独立，分组边界落在大小为 k 的簇中的
+    概率与 k 成正比、在簇内的位置均匀，把簇切成 a 和 k - a 两段时少 a(k - a) 条边，因此期望为
+    E[(k³ - k) / 6] / E[k]（最后一个分组在人口末尾截断，同样计入）
+    '''
+    sizes, weights = _cluster_size_pmf(config)
+    return float(np.dot(weights, (sizes ** 3 - sizes) / 6) / np.dot(weights, sizes))
+
+def group_members(pop_size, countries_config, config):
+    '''
+    聚类层每个分组（国家 × 年龄段，见 ContactNetwork.cluster_group_keys）的期望人数
+
+    Returns:
+        np.ndarray: (国家数, 年龄段数) 的期望人数；没有 age_band 时只有一列
+    '''
+    _, proportions = ContactNetwork.validate_countries_config(countries_config)
+    totals = pop_size * np.asarray(proportions)
+    age_band = config.get('age_band', ContactNetwork.CLUSTERED_LAYER_DEFAULTS[config['network_type']]['age_band'])
+    age_range = config.get('age_range')
+    if not age_band:
+        return (totals * age_fraction(countries_config, age_range))[:, None]
+    demographics = ContactNetwork.validate_demographics(countries_config)
+    min_age = min(bins[0] for _, bins, _, _ in demographics)
+    max_age = max(bins[-1] for _, bins, _, _ in demographics)
+    if age_range is not None:
+        min_age, max_age = max(min_age, age_range[0]), min(max_age, age_range[1])
+    members = np.zeros((len(totals), max(math.ceil(max_age / age_band) - math.floor(min_age / age_band), 1)))
+    for i, band in enumerate(range(math.floor(min_age / age_band), math.ceil(max_age / age_band))):
+        lower, upper = max(band * age_band, min_age), min((band + 1) * age_band, max_age)
+        members[:, i] = totals * age_fraction(countries_config, [lower, upper])
+    return members
+
+def plan_population(pop_size, layer_config, countries_config, n_days=None, memory_budget=None,
+                    cost_model=None, compact_edges=False, keep_popdict=True, dtype_policy='default'):
+    '''
+    预估构建和运行一个自定义人口所需的边数、内存和时间（不实际构建）
+
+    Args:
+        pop_size: 人口大小
+        layer_config: 层配置（会完整校验）
+        countries_config: 国家配置（会完整校验，包括年龄金字塔）
+        n_days: 模拟天数，None 表示只构建人口（例如构建后保存到磁盘）：不估计运行时间，
+            内存预算也只检查构建过程
+        memory_budget: 内存预算（字节数或 '16GB' 这样的字符串），None 表示不限制
+        cost_model: 成本模型系数，None 表示使用 DEFAULT_COST_MODEL
+        compact_edges: 是否压缩边（与 create_custom_population 的参数相同，层配置中的 'compact' 优先）
+        keep_popdict: 运行时是否仍保留 popdict（Covasim 初始化时会复制接触层，保留 popdict 时
+            边列表占两份内存，例如 ReplicateRunner 在所有运行之间共享 popdict）
+        dtype_policy: popdict 的类型策略（与 create_custom_population 的参数相同）
+
+    Returns:
+        dict: {
+            'pop_size', 'n_days', 'layers': {层名: {'network_type', 'members', 'edges',
+                'edges_per_member', 'bytes', 'build_bytes', 'chunkable', 'per_chunk_member', 'build_seconds'}},
+            'edges': 总边数,
+            'memory': {'popdict', 'layers', 'people', 'steady', 'build_peak', 'run_peak'}（字节）,
+            'build_seconds', 'run_seconds', 'memory_budget', 'chunk_members', 'fits'
+        }
+
+    Raises:
+        MemoryError: 如果设置了 memory_budget 且稳态内存或不可分批的构建峰值超出预算
+    '''
+    ContactNetwork.validate_layer_config(layer_config)
+    country_names, proportions = ContactNetwork.validate_countries_config(countries_config)
+    model = dict(DEFAULT_COST_MODEL, **(cost_model or {}))
+    proportions = np.asarray(proportions)
+
+    layers = {}
+    for layer_name, config in layer_config.items():
+        network_type = config['network_type']
+        members_by_country = pop_size * proportions * age_fraction(countries_config, config.get('age_range'))
+        members = float(members_by_country.sum())
+        per_member = edges_per_member(config)
+        edges = members * per_member
+        clustered = network_type in ContactNetwork.CLUSTERED_LAYER_DEFAULTS
+        if clustered:
+            # 簇不跨越分组：每个非空分组的最后一个簇只填了一部分（很小的分组最多是一个完全图）
+            groups = group_members(pop_size, countries_config, config).ravel()
+            expected = groups * per_member - edges_lost_per_group(config) * -np.expm1(-groups)
+            edges = float(np.clip(expected, 0, groups * np.maximum(groups - 1, 0) / 2).sum())
+        compact = config.get('compact', compact_edges)
+        # 构建时的临时内存按参与人数和边数线性估计：聚类层一次处理整个层（可以分批），
+        # 逐国生成的层峰值取决于最大的国家，之前各国的结果在拼接前一直保留
+        per_chunk_member = (model['build_bytes_per_member'][network_type]
+                            + model['build_bytes_per_edge'][network_type] * per_member)
+        transient = per_chunk_member * (members if clustered else members_by_country.max())
+        build_bytes = edges * OUTPUT_BYTES_PER_EDGE + transient
+        if not clustered:
+            build_bytes = max(build_bytes, 2 * edges * OUTPUT_BYTES_PER_EDGE)
+        if compact:
+            build_bytes = max(build_bytes, edges * COMPACT_BYTES_PER_EDGE)
+        layers[layer_name] = {
+            'network_type': network_type,
+            'members': int(round(members)),
+            'edges': int(round(edges)),
+            'edges_per_member': per_member,
+            'bytes': edges * LAYER_BYTES_PER_EDGE,
+            'build_bytes': build_bytes,
+            # 压缩需要整个层一起排序，不能分批
+            'chunkable': clustered and not compact,
+            'per_chunk_member': per_chunk_member,
+            'build_seconds': edges * model['build_seconds_per_edge'][network_type],
+        }
+
+    n_clustered = sum(layer['network_type'] in ContactNetwork.CLUSTERED_LAYER_DEFAULTS for layer in layers.values())
+    # uid + age + sex + country（Unicode，compact 策略不保存） + country_code（compact 策略） + 每个聚类层的簇编号，
+    # 类型见 dtype_policy
+    dtypes = ContactNetwork.resolve_dtype_policy(dtype_policy)
+    name_bytes = 0 if dtypes['country'] is None else 4 * max(len(str(name)) for name in country_names)
+    per_agent = sum(np.dtype(dtypes[key]).itemsize for key in ['uid', 'age', 'sex'])
+    per_agent += 0 if dtypes['country_code'] is None else np.dtype(dtypes['country_code']).itemsize
+    popdict_bytes = pop_size * (per_agent + name_bytes + np.dtype(dtypes['cluster']).itemsize * n_clustered)
+    layer_bytes = sum(layer['bytes'] for layer in layers.values())
+    people_bytes = pop_size * model['people_bytes_per_agent']
+    total_edges = sum(layer['edges'] for layer in layers.values())
+    largest_layer = max((layer['edges'] for layer in layers.values()), default=0)
+    run_transient = largest_layer * model['run_bytes_per_edge']
+
+    steady = popdict_bytes + layer_bytes * (2 if keep_popdict else 1) + people_bytes
+    plan = {
+        'pop_size': int(pop_size),
+        'n_days': n_days,
+        'layer_config': layer_config,
+        'countries_config': countries_config,
+        'compact_edges': compact_edges,
+        'dtype_policy': dtype_policy,
+        'layers': layers,
+        'edges': total_edges,
+        'memory': {
+            'popdict': popdict_bytes,
+            'layers': layer_bytes,
+            'people': people_bytes,
+            'steady': steady,
+            'build_peak': _build_peak(popdict_bytes, layers),
+            'run_peak': steady + run_transient,
+        },
+        'build_seconds': pop_size * model['build_seconds_per_agent'] + sum(layer['build_seconds'] for layer in layers.values()),
+        'run_seconds': None if n_days is None else
+            n_days * (pop_size * model['run_seconds_per_agent_day'] + total_edges * model['run_seconds_per_edge_day']),
+        'memory_budget': None,
+        'chunk_members': None,
+        'fits': True,
+    }
+    if memory_budget is not None:
+        _apply_budget(plan, parse_memory(memory_budget))
+    return plan
+
+def _chunked_build_bytes(layer, chunk_members):
+    '''聚类层分批构建时的峰值：各批结果和拼接后的输出（两份边列表）、排序索引和一批的临时数组'''
+    chunk_members = min(chunk_members, layer['members'])
+    edges_bytes = layer['edges'] * OUTPUT_BYTES_PER_EDGE
+    return max(edges_bytes + layer['per_chunk_member'] * chunk_members, 2 * edges_bytes) + 8 * layer['members']
+
+def _build_peak(popdict_bytes, layers, chunk_members=None):
+    '''按层的构建顺序累计：之前各层的边列表 + 当前层的构建峰值'''
+    peak = popdict_bytes
+    built = popdict_bytes
+    for layer in layers.values():
+        build_bytes = layer['build_bytes']
+        if chunk_members is not None and layer['chunkable'] and layer['members'] > chunk_members:
+            build_bytes = _chunked_build_bytes(layer, chunk_members)
+        peak = max(peak, built + build_bytes)
+        built += layer['bytes']
+    return peak
+
+def _apply_budget(plan, budget):
+    '''按内存预算决定是否拒绝构建，或为聚类层选择分批大小'''
+    plan['memory_budget'] = budget
+    memory = plan['memory']
+    if plan['n_days'] is not None and memory['run_peak'] > budget:
+        plan['fits'] = False
+        raise MemoryError(
+            f"预计运行时内存 {format_bytes(memory['run_peak'])} 超出预算 {format_bytes(budget)}"
+            f"（人员数组 {format_bytes(memory['popdict'])}，接触层 {format_bytes(memory['layers'])}，"
+            f"Covasim People {format_bytes(memory['people'])}），请减小 pop_size 或接触数"
+        )
+    if memory['build_peak'] <= budget:
+        return plan
+
+    # 构建峰值超出：聚类层可以分批（峰值随批次大小线性下降），逐国生成的层和压缩不能分批
+    layers = plan['layers']
+    min_chunk = 1000
+    if _build_peak(memory['popdict'], layers, min_chunk) > budget:
+        plan['fits'] = False
+        raise MemoryError(
+            f"预计构建峰值 {format_bytes(memory['build_peak'])} 超出预算 {format_bytes(budget)}，"
+            f"且分批构建聚类层后仍然超出（超出部分来自逐国生成或压缩的层，或者边列表本身）"
+        )
+    # 二分查找满足预算的最大批次
+    low, high = min_chunk, max(layer['members'] for layer in layers.values())
+    while high - low > max(low // 100, 1):
+        mid = (low + high) // 2
+        if _build_peak(memory['popdict'], layers, mid) <= budget:
+            low = mid
+        else:
+            high = mid
+    plan['chunk_members'] = low
+    memory['build_peak'] = _build_peak(memory['popdict'], layers, low)
+    return plan
+
+def print_plan(plan):
+    '''打印预估结果'''
+    print(f"人口规模: {plan['pop_size']:,}，总边数: {plan['edges']:,}")
+    for name, layer in plan['layers'].items():
+        print(f"  层 {name} ({layer['network_type']}): {layer['members']:,} 人参与，"
+              f"约 {layer['edges']:,} 条边（每人 {layer['edges_per_member']:.2f}），"
+              f"边列表 {format_bytes(layer['bytes'])}，构建约 {layer['build_seconds']:.1f}s")
+    memory = plan['memory']
+    print(f"  内存: 人员数组 {format_bytes(memory['popdict'])}，接触层 {format_bytes(memory['layers'])}，"
+          f"Covasim People {format_bytes(memory['people'])}")
+    print(f"  内存峰值: 构建 {format_bytes(memory['build_peak'])}"
+          + (f"，运行 {format_bytes(memory['run_peak'])}" if plan['n_days'] is not None else '')
+          + (f"（预算 {format_bytes(plan['memory_budget'])}）" if plan['memory_budget'] else ''))
+    if plan['chunk_members']:
+        print(f"  聚类层将分批构建，每批最多 {plan['chunk_members']:,} 人")
+    print(f"  预计构建时间 {plan['build_seconds']:.1f}s"
+          + (f"，运行 {plan['n_days']} 天约 {plan['run_seconds']:.1f}s" if plan['run_seconds'] is not None else ''))
+
+def build_population(plan):
+    '''
+    按预估结果构建人口（使用预估选定的分批大小）
+
+    Args:
+        plan: plan_population 的返回值
+
+    Returns:
+        tuple: create_custom_population 的返回值 (popdict, layer_keys)
+    '''
+    if not plan['fits']:
+        raise MemoryError("该预估结果超出内存预算，不能构建")
+    return ContactNetwork.create_custom_population(plan['pop_size'], plan['layer_config'], plan['countries_config'],
+                                                   compact_edges=plan['compact_edges'], chunk_members=plan['chunk_members'],
+                                                   dtype_policy=plan['dtype_policy'])
+
+def calibrate_cost_model(pop_size=100000, n_days=10, network_types=None, verbose=True):
+    '''
+    在当前机器上用小规模基准测试标定成本模型系数
+
+    对每种网络类型在两种接触密度下单独调用层生成函数，记录耗时和临时内存峰值（tracemalloc，
+    与计时分开进行，避免追踪开销影响计时），解出每人和每条边的临时内存；再用两个不同接触数的
+    随机网络各运行 n_days 天，解出每人每天和每条边每天的运行耗时。
+
+    Args:
+        pop_size: 基准人口规模
+        n_days: 基准运行天数
+        network_types: 需要标定的网络类型，None 表示全部（当前 Covasim 不支持的类型保留默认值）
+        verbose: 是否打印标定结果
+
+    Returns:
+        dict: 与 DEFAULT_COST_MODEL 格式相同的系数
+    '''
+    model = {key: (dict(value) if isinstance(value, dict) else value) for key, value in DEFAULT_COST_MODEL.items()}
+    countries_config = {'A': 0.5, 'B': 0.5}
+    network_types = network_types or list(model['build_seconds_per_edge'])
+
+    # 每人的基础开销：国家分配和人口学抽样
+    start = time.perf_counter()
+    codes = np.random.choice(2, size=pop_size, p=[0.5, 0.5])
+    countries = np.array(['A', 'B'])[codes]
+    ages, _ = ContactNetwork.sample_demographics(codes, countries_config)
+    model['build_seconds_per_agent'] = (time.perf_counter() - start) / pop_size
+
+    # 每种网络类型在两种接触密度下构建一个层，解出每人和每条边的临时内存
+    densities = {
+        Enums.NetWorkType.scale_free.name: ('m_connections', [2, 4]),
+        Enums.NetWorkType.random.name: ('n_contacts', [4, 16]),
+        Enums.NetWorkType.microstructured.name: ('cluster_size', [3.0, 8.0]),
+    }
+    members = np.arange(pop_size)
+    single_country = np.zeros(pop_size, dtype=np.int64)
+    for network_type in network_types:
+        if network_type == Enums.NetWorkType.scale_free.name and not hasattr(cv, 'make_scale_free_contacts'):
+            continue  # 当前 Covasim 没有 make_scale_free_contacts，保留默认系数
+        if network_type in ContactNetwork.CLUSTERED_LAYER_DEFAULTS:
+            cluster_size = ContactNetwork.CLUSTERED_LAYER_DEFAULTS[network_type]['cluster_size']
+            builds = [lambda c=c: ContactNetwork.make_clustered_contacts(members, group_keys=codes, cluster_size=c)[0]
+                      for c in [cluster_size, 2 * cluster_size]]
+        else:
+            key, values = densities[network_type]
+            builds = [lambda v=v: ContactNetwork._make_per_country_contacts({'network_type': network_type, key: v}, single_country, ages)
+                      for v in values]
+        measurements = []
+        for build in builds:
+            start = time.perf_counter()
+            contacts = build()
+            seconds = time.perf_counter() - start
+            n_edges = len(contacts['p1'])
+            del contacts
+            tracemalloc.start()
+            contacts = build()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del contacts
+            measurements.append((n_edges, seconds, peak - n_edges * OUTPUT_BYTES_PER_EDGE))
+        (e1, s1, m1), (e2, s2, m2) = measurements
+        if e2 <= e1:
+            continue
+        per_edge = max((m2 - m1) / (e2 - e1), 0)
+        model['build_bytes_per_edge'][network_type] = per_edge
+        model['build_bytes_per_member'][network_type] = max(m1 - per_edge * e1, 0) / pop_size
+        model['build_seconds_per_edge'][network_type] = (s1 + s2) / (e1 + e2)
+
+    # 运行耗时：两个接触数不同的随机网络，解二元线性方程
+    timings = []
+    for n_contacts in [4, 20]:
+        layer_config = {'layer': {'network_type': Enums.NetWorkType.random.name, 'n_contacts': n_contacts}}
+        popdict, _ = ContactNetwork.create_custom_population(pop_size, layer_config, countries_config)
+        sim = cv.Sim(pop_size=pop_size, pop_infected=10, n_days=n_days, verbose=0)
+        sim.popdict = popdict
+        sim.reset_layer_pars()
+        sim.initialize()
+        if len(timings) == 0:
+            arrays = [value for value in sim.people.__dict__.values() if isinstance(value, np.ndarray)]
+            model['people_bytes_per_agent'] = sum(arr.nbytes for arr in arrays) / pop_size
+        start = time.perf_counter()
+        sim.run()
+        timings.append((len(sim.people.contacts['layer']), (time.perf_counter() - start) / n_days))
+    (e1, t1), (e2, t2) = timings
+    per_edge = max((t2 - t1) / (e2 - e1), 0)
+    model['run_seconds_per_edge_day'] = per_edge
+    model['run_seconds_per_agent_day'] = max(t1 - per_edge * e1, 0) / pop_size
+
+    if verbose:
+        print("标定的成本模型:")
+        for key, value in model.items():
+            print(f"  {key}: {value}")
+    return model
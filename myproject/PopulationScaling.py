@@ -0,0 +1,250 @@
+'''
+按国家缩放人口：用较少的代理模拟很大的真实人口，同时保留自定义人口结构和自定义属性
+
+Covasim 自带的 pop_scale/rescale 只有一个全局缩放因子，所有代理代表相同数量的真实人口；
+当各国人口规模差别很大（例如 1 亿人口中一国占 95%）时，我们希望每个国家使用不同的缩放因子，
+并在各国疫情分别发展到阈值时分别动态缩放。
+
+用法：
+    plan = PopulationScaling.plan_scaled_population(countries_config, {'A': 95e6, 'B': 5e6}, pop_size=1e6)
+    popdict, keys = ContactNetwork.create_custom_population(plan['pop_size'], layer_config, plan['countries_config'])
+    sim = cv.Sim(pars=PopulationScaling.make_scaled_pars(pars, plan),
+                 analyzers=PopulationScaling.CountryRescale(plan['country_scales']))
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)  # 需要 sim.people.country
+    sim.run()
+
+此时 Covasim 自身的动态缩放必须关闭（rescale=False），由 CountryRescale 负责：
+- 每个国家一个缩放因子，动态模式下从 1 开始，当该国非 naive 代理比例超过 rescale_threshold 时
+  按 rescale_factor 增大，并把该国部分非 naive 代理重新设为 naive（与 Covasim 的做法相同，但只在该国内抽样）；
+- sim.people.weight 保存每个代理当前代表的真实人数；
+- 模拟结束时用各国的缩放因子对主要结果加权，覆盖 sim.results 中对应的结果。
+重置为 naive 只改变 Covasim 的疾病状态，country 等自定义属性和接触网络保持不变。
+'''
+import numpy as np
+import covasim as cv
+import ContactNetwork
+
+# 按国家加权的流量结果（new_*/cum_*）：每步由 date_* == t 统计
+TRACKED_FLOW_DATES = {
+    'infectious': 'date_infectious',
+    'symptomatic': 'date_symptomatic',
+    'severe': 'date_severe',
+    'critical': 'date_critical',
+    'recoveries': 'date_recovered',
+    'deaths': 'date_dead',
+    'diagnoses': 'date_diagnosed',
+}
+
+# 按国家加权的存量结果（n_*）
+TRACKED_STOCKS = ('exposed', 'infectious', 'symptomatic', 'severe', 'critical', 'recovered', 'diagnosed')
+
+def plan_scaled_population(countries_config, scaled_pops, pop_size=None, pop_scales=None):
+    '''
+    根据各国真实人口和代理数预算，计算各国的代理比例和缩放因子
+
+    Args:
+        countries_config: 国家配置字典（见 ContactNetwork.validate_countries_config），
+            其中的比例会被替换为代理比例，年龄金字塔等人口学配置保留
+        scaled_pops: 各国真实人口 {国家名: 人数}
+        pop_size: 代理总数；未在 pop_scales 中指定的国家共享同一个缩放因子
+        pop_scales: 可选，部分或全部国家的缩放因子 {国家名: 每个代理代表的人数}；
+            全部国家都指定时 pop_size 可以省略
+
+    Returns:
+        dict: {
+            'pop_size': 代理总数,
+            'countries_config': 代理层面的国家配置（可直接传给 create_custom_population）,
+            'country_scales': {国家名: 最大缩放因子},
+            'scaled_pop': 真实总人口,
+        }
+    '''
+    country_names, _ = ContactNetwork.validate_countries_config(countries_config)
+    pop_scales = dict(pop_scales or {})
+    missing = [c for c in country_names if c not in scaled_pops]
+    if missing:
+        raise ValueError(f"scaled_pops 缺少以下国家的真实人口: {missing}")
+    unknown = [c for c in pop_scales if c not in countries_config]
+    if unknown:
+        raise ValueError(f"pop_scales 中的国家不在 countries_config 中: {unknown}")
+
+    fixed = [c for c in country_names if c in pop_scales]
+    free = [c for c in country_names if c not in pop_scales]
+    agents = {c: scaled_pops[c] / pop_scales[c] for c in fixed}
+    if free:
+        if pop_size is None:
+            raise ValueError(f"以下国家没有指定缩放因子，需要提供 pop_size: {free}")
+        budget = pop_size - sum(agents.values())
+        if budget <= 0:
+            raise ValueError(f"pop_size ({pop_size}) 不足以容纳已指定缩放因子的国家所需的 {sum(agents.values()):.0f} 个代理")
+        common_scale = sum(scaled_pops[c] for c in free) / budget
+        for c in free:
+            pop_scales[c] = common_scale
+            agents[c] = scaled_pops[c] / common_scale
+
+    for c in country_names:
+        if pop_scales[c] < 1:
+            raise ValueError(f"国家 '{c}' 的缩放因子 ({pop_scales[c]:.3f}) 小于 1：代理数不能多于真实人口")
+
+    total_agents = sum(agents.values())
+    agent_config = {}
+    for c in country_names:
+        proportion = agents[c] / total_agents
+        value = countries_config[c]
+        agent_config[c] = dict(value, proportion=proportion) if isinstance(value, dict) else proportion
+
+    return {
+        'pop_size': int(round(total_agents if pop_size is None else pop_size)),
+        'countries_config': agent_config,
+        'country_scales': {c: float(pop_scales[c]) for c in country_names},
+        'scaled_pop': float(sum(scaled_pops[c] for c in country_names)),
+    }
+
+def make_scaled_pars(pars, plan):
+    '''
+    生成与缩放方案匹配的模拟参数：代理数、全局 pop_scale（仅用于总人口换算）并关闭 Covasim 自身的动态缩放
+    '''
+    pars = dict(pars)
+    pars['pop_size'] = plan['pop_size']
+    pars['pop_scale'] = plan['scaled_pop'] / plan['pop_size']
+    pars['rescale'] = False
+    pars.pop('scaled_pop', None)
+    return pars
+
+class CountryRescale(cv.Analyzer):
+    '''
+    按国家的（动态）人口缩放
+
+    Args:
+        country_scales: {国家名: 最大缩放因子}，通常来自 plan_scaled_population
+        dynamic: True 表示各国缩放因子从 1 开始按疫情发展逐步增大（与 Covasim 的 rescale=True 相同）；
+            False 表示从一开始就使用最大缩放因子
+        threshold: 触发缩放的非 naive 比例，默认使用 sim['rescale_threshold']
+        factor: 每次缩放的倍数，默认使用 sim['rescale_factor']
+        kwargs: 传给 cv.Analyzer
+
+    运行结束后：
+        self.scales: (时间点数, 国家数) 每天各国的缩放因子
+        self.results: {结果键: (时间点数, 国家数)} 各国加权后的结果
+        self.country_names: 与结果列对应的国家名
+    '''
+
+    def __init__(self, country_scales, dynamic=True, threshold=None, factor=None, **kwargs):
+        super().__init__(**kwargs)
+        self.country_scales = dict(country_scales)
+        self.dynamic = dynamic
+        self.threshold = threshold
+        self.factor = factor
+
+    def initialize(self, sim):
+        super().initialize(sim)
+        if sim['rescale']:
+            raise ValueError("使用 CountryRescale 时需要设置 rescale=False（可用 make_scaled_pars 生成参数），由它负责按国家缩放")
+        self.country_names = list(self.country_scales.keys())
+        self.n_countries = len(self.country_names)
+        self.threshold = sim['rescale_threshold'] if self.threshold is None else self.threshold
+        self.factor = sim['rescale_factor'] if self.factor is None else self.factor
+        self.max_scale = np.array([self.country_scales[c] for c in self.country_names], dtype=float)
+        self.scale = np.ones(self.n_countries) if self.dynamic else self.max_scale.copy()
+
+        npts = sim.npts
+        self.scales = np.zeros((npts, self.n_countries))
+        self.flows = {key: np.zeros((npts, self.n_countries)) for key in ['infections'] + list(TRACKED_FLOW_DATES)}
+        self.stocks = {key: np.zeros((npts, self.n_countries)) for key in TRACKED_STOCKS}
+        self.n_seeds = np.zeros(self.n_countries)
+        self._log_pos = 0
+        self._codes = None
+        return
+
+    def _setup_people(self, people):
+        '''第一次调用时（people 上已挂载 country）建立国家编号和权重数组'''
+        if not ContactNetwork.has_country(people):
+            raise ValueError("sim.people 上没有 country 属性，请先调用 ContactNetwork.attach_custom_attributes(sim.people, popdict)")
+        index = {c: i for i, c in enumerate(self.country_names)}
+        inverse, names = ContactNetwork.country_codes(people)
+        missing = [c for c in names if c not in index]
+        if missing:
+            raise ValueError(f"country_scales 缺少以下国家的缩放因子: {missing}")
+        self._codes = np.array([index[c] for c in names])[inverse]
+        self.n_agents = np.bincount(self._codes, minlength=self.n_countries)
+        people.weight = self.scale[self._codes]
+        return
+
+    def _count_new_infections(self, people):
+        '''读取 infection_log 中自上一步以来新增的记录（只处理新事件），按国家计数'''
+        log = people.infection_log
+        new_entries = log[self._log_pos:]
+        self._log_pos = len(log)
+        self._reinfected_codes = np.array([], dtype=np.int64)
+        if not new_entries:
+            return
+        targets = np.fromiter((e['target'] for e in new_entries), dtype=np.int64, count=len(new_entries))
+        is_seed = np.fromiter((e['layer'] == 'seed_infection' for e in new_entries), dtype=bool, count=len(new_entries))
+        dates = np.fromiter((e['date'] for e in new_entries), dtype=np.int64, count=len(new_entries))
+        codes = self._codes[targets]
+        self.n_seeds += np.bincount(codes[is_seed], minlength=self.n_countries)
+        np.add.at(self.flows['infections'], (dates[~is_seed], codes[~is_seed]), 1)
+        self._reinfected_codes = codes[people.n_infections[targets] > 1]
+        return
+
+    def _rescale(self, people):
+        '''对非 naive 比例超过阈值、且尚未达到最大缩放因子的国家进行缩放'''
+        not_naive_inds = cv.false(people.naive)
+        not_naive_codes = self._codes[not_naive_inds]
+        n_not_naive = np.bincount(not_naive_codes, minlength=self.n_countries)
+        ratio = n_not_naive / np.maximum(self.n_agents, 1)
+        for c in np.flatnonzero((self.scale < self.max_scale) & (ratio > self.threshold)):
+            proposed = max(ratio[c] / self.threshold, self.factor)
+            scaling = min(proposed, self.max_scale[c] / self.scale[c])
+            self.scale[c] *= scaling
+            country_not_naive = not_naive_inds[not_naive_codes == c]
+            n = int(round(len(country_not_naive) * (1.0 - 1.0 / scaling)))
+            if n > 0:
+                people.make_naive(country_not_naive[cv.choose(len(country_not_naive), n)])
+            people.weight[self._codes == c] = self.scale[c]
+        return
+
+    def apply(self, sim):
+        people = sim.people
+        t = sim.t
+        if self._codes is None:
+            self._setup_people(people)
+
+        # 记录本步（缩放之前）的各国结果和缩放因子
+        self.scales[t] = self.scale
+        self._count_new_infections(people)
+        for key, date_key in TRACKED_FLOW_DATES.items():
+            self.flows[key][t] = np.bincount(self._codes[people[date_key] == t], minlength=self.n_countries)
+
+        # 开启 waning 时，当天康复又被再次感染的人 date_recovered 已被重置；总数以 Covasim 的流量为准，
+        # 差额归入当天再感染者所在的国家
+        residual = int(people.flows['new_recoveries'] - self.flows['recoveries'][t].sum())
+        if residual > 0:
+            self.flows['recoveries'][t] += np.bincount(self._reinfected_codes[:residual], minlength=self.n_countries)
+        for key in TRACKED_STOCKS:
+            self.stocks[key][t] = np.bincount(self._codes, weights=people[key], minlength=self.n_countries)
+
+        # 步末缩放等价于 Covasim 在下一步开始时缩放，新的缩放因子从下一步起生效
+        if self.dynamic:
+            self._rescale(people)
+        return
+
+    def finalize(self, sim):
+        super().finalize(sim)
+        self._count_new_infections(sim.people)  # 最后一步传播产生的感染
+
+        self.results = {}
+        for key, values in self.flows.items():
+            self.results[f'new_{key}'] = values * self.scales
+            self.results[f'cum_{key}'] = np.cumsum(self.results[f'new_{key}'], axis=0)
+        self.results['cum_infections'] += self.n_seeds * self.scales[0]
+        for key, values in self.stocks.items():
+            self.results[f'n_{key}'] = values * self.scales
+
+        # 用各国加权之和覆盖 Covasim 按全局 pop_scale 缩放的结果（之后 compute_results 会据此重新计算派生结果）
+        for key, values in self.results.items():
+            sim.results[key].values[:] = values.sum(axis=1)
+        sim.results['n_dead'].values[:] = sim.results['cum_deaths'].values
+        return
@@ -0,0 +1,144 @@
+'''
+批量多次重复运行（不同随机种子）同一个自定义人口，并汇总分位数区间
+
+人口只由 create_custom_population 构建一次，保存在本模块的全局变量中：
+- 支持 fork 的系统（Linux/macOS）上，工作进程通过写时复制（copy-on-write）直接共享父进程中的
+  popdict 数组，不做任何序列化或复制；
+- 不支持 fork 的系统（Windows）上，每个工作进程在初始化时接收一份 popdict。
+两种情况下内存占用都只与工作进程数有关，与重复次数 N 无关。
+'''
+import copy
+import multiprocessing as mp
+import os
+import numpy as np
+import covasim as cv
+import ContactNetwork
+import EarlyTermination
+
+# 默认汇总的结果键
+DEFAULT_RESULT_KEYS = ('cum_infections', 'cum_deaths', 'cum_severe', 'cum_critical', 'new_infections', 'n_infectious')
+
+# 工作进程共享的状态：fork 时由父进程直接继承，spawn 时由 _init_worker 填充
+_shared = {}
+
+def _init_worker(shared):
+    '''spawn 模式下的工作进程初始化：接收 popdict 等共享状态（每个工作进程只接收一次）'''
+    _shared.update(shared)
+
+def _run_one(task):
+    '''
+    在工作进程中运行一次模拟
+
+    Args:
+        task: (run_index, seed)
+
+    Returns:
+        tuple: (run_index, {result_key: 结果数组})
+    '''
+    run_index, seed = task
+    pars = dict(_shared['pars'], rand_seed=seed, verbose=0)
+
+    sim = cv.Sim(pars=pars)
+    sim.popdict = _shared['popdict']  # make_people 会复制数组，父进程/共享的 popdict 不会被修改
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, _shared['popdict'])
+    if _shared['setup'] is not None:
+        _shared['setup'](sim)  # 例如设置 rel_sus / rel_trans
+    if _shared['early_stop'] is not None:
+        EarlyTermination.run_with_early_stop(sim, copy.deepcopy(_shared['early_stop']))
+    else:
+        sim.run()
+
+    return run_index, {key: np.array(sim.results[key].values) for key in _shared['result_keys']}
+
+def _scalar_pars(pars):
+    '''提取参数中的标量部分，用于写入结果存储'''
+    return {key: value for key, value in pars.items() if isinstance(value, (bool, int, float, str))}
+
+def run_replicates(pars, popdict, n_runs=10, seeds=None, n_cpus=None, setup=None,
+                   result_keys=DEFAULT_RESULT_KEYS, quantiles=(0.05, 0.5, 0.95), keep_raw=True, store=None,
+                   early_stop=None):
+    '''
+    用同一个人口并行运行 N 个随机种子，并返回各结果的分位数区间
+
+    Args:
+        pars: cv.Sim 参数字典（pop_size 必须与 popdict 一致）
+        popdict: create_custom_population 返回的人口字典，只构建一次，所有重复运行共享
+        n_runs: 重复次数（seeds 为 None 时使用）
+        seeds: 随机种子列表，None 表示使用 pars['rand_seed'] 起的 n_runs 个连续种子
+        n_cpus: 工作进程数，None 表示使用全部 CPU；1 表示在当前进程中串行运行
+        setup: 可选函数 setup(sim)，在 sim.initialize() 之后、运行之前调用，用于自定义传播参数等；
+            spawn 模式下必须是可序列化的模块级函数
+        result_keys: 需要汇总的 sim.results 键
+        quantiles: 需要计算的分位数
+        keep_raw: 是否在返回值中保留每次运行的原始结果
+        store: 可选的 ResultStore.ResultStore，每完成一次运行就追加写入（参数中包含 seed）
+        early_stop: 可选的 EarlyTermination.EarlyStop，疫情灭绝/饱和时提前结束每次运行（每次运行使用一份副本）
+
+    Returns:
+        dict: {
+            'seeds': 种子列表,
+            'quantiles': {result_key: {q: 数组}},
+            'mean': {result_key: 数组},
+            'raw': {result_key: (n_runs, n_days+1) 数组}（keep_raw=True 时）
+        }
+    '''
+    if seeds is None:
+        base_seed = pars.get('rand_seed', 1)
+        seeds = [base_seed + i for i in range(n_runs)]
+    seeds = list(seeds)
+    if len(seeds) == 0:
+        raise ValueError("至少需要运行一次：seeds 为空或 n_runs 为 0")
+    if pars.get('pop_size') is not None and pars['pop_size'] != len(popdict['uid']):
+        raise ValueError(f"pars['pop_size'] ({pars['pop_size']}) 与 popdict 的人口数 ({len(popdict['uid'])}) 不一致")
+
+    shared = {
+        'pars': dict(pars, pop_size=len(popdict['uid'])),
+        'popdict': popdict,
+        'setup': setup,
+        'early_stop': early_stop,
+        'result_keys': tuple(result_keys),
+    }
+    tasks = list(enumerate(seeds))
+    n_cpus = min(n_cpus or os.cpu_count() or 1, len(seeds))
+
+    # 预分配结果数组：只保存结果时间序列，不保存 sim 对象
+    raw = {}
+    def collect(run_index, results):
+        if store is not None:
+            store.append(results, params=dict(_scalar_pars(pars), seed=seeds[run_index]))
+        for key, values in results.items():
+            if key not in raw:
+                raw[key] = np.zeros((len(seeds), len(values)))
+            raw[key][run_index] = values
+
+    _shared.clear()
+    _shared.update(shared)
+    try:
+        if n_cpus == 1:
+            for task in tasks:
+                collect(*_run_one(task))
+        else:
+            if 'fork' in mp.get_all_start_methods():
+                ctx = mp.get_context('fork')
+                pool = ctx.Pool(n_cpus)  # 工作进程继承 _shared，写时复制共享 popdict
+            else:
+                ctx = mp.get_context('spawn')
+                pool = ctx.Pool(n_cpus, initializer=_init_worker, initargs=(shared,))
+            with pool:
+                for run_index, results in pool.imap_unordered(_run_one, tasks):
+                    collect(run_index, results)
+    finally:
+        _shared.clear()
+        if store is not None:
+            store.flush()
+
+    output = {
+        'seeds': seeds,
+        'quantiles': {key: dict(zip(quantiles, np.quantile(values, quantiles, axis=0))) for key, values in raw.items()},
+        'mean': {key: values.mean(axis=0) for key, values in raw.items()},
+    }
+    if keep_raw:
+        output['raw'] = raw
+    return output
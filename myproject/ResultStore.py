@@ -0,0 +1,241 @@
+'''
+大规模参数扫描的结果持久化：按块（chunk）追加写入的列式存储
+
+目录结构：
+    store_dir/
+        chunk-<pid>-<序号>-<随机串>.npz    每个块是一个压缩的 .npz 文件
+
+每个块内按列保存：
+    - 每个结果键一列，形状为 (块内运行数, 时间点数)，例如 'cum_infections'；较短的运行（例如提前终止
+      的运行，或 n_days 不同）在末尾用 NaN 补齐到块内最长的长度，读取时各块也按最长的块补齐
+    - '__run_id__'：每次运行的唯一编号
+    - '__params__'：每次运行参数的 JSON 字符串
+    - 'param:<名称>'：数值/字符串类型的标量参数单独成列，便于不解析 JSON 就能筛选；
+      部分运行没有该参数时，这些行为 NaN（数值）或 ''（字符串），并用 'missing:<名称>' 列标记
+
+每个写入者只写自己的块文件（文件名包含进程号和随机串），写入时先写临时文件再原子重命名，
+因此进程池中的多个进程可以同时向同一目录写入而无需加锁；读取时只加载需要的列（.npz 的成员
+按需解压），不需要把所有运行一次性读入内存。
+'''
+import glob
+import json
+import os
+import uuid
+import numpy as np
+
+CHUNK_PATTERN = 'chunk-*.npz'
+
+class ResultStore:
+    '''
+    结果存储：追加写入 + 按列惰性读取
+
+    用法：
+        store = ResultStore('results/sweep1')
+        store.append_sim(sim, params={'beta': 0.03, 'seed': 1})
+        store.flush()
+        store.load('cum_infections', where={'beta': 0.03})
+
+    Args:
+        path: 存储目录，不存在时自动创建
+        chunk_size: 缓冲多少次运行后写出一个块
+        compress: 是否压缩块文件
+    '''
+
+    def __init__(self, path, chunk_size=64, compress=True):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self._buffer = []
+        self._n_written = 0
+        os.makedirs(path, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    #%% 写入
+
+    def append(self, results, params=None):
+        '''
+        追加一次运行的结果
+
+        Args:
+            results: {结果键: 一维时间序列数组}
+            params: 本次运行的参数字典（只保存可序列化为 JSON 的内容，其余转为字符串）
+        '''
+        results = {key: np.asarray(values) for key, values in results.items()}
+        bad = [key for key, values in results.items() if values.ndim != 1]
+        if bad:
+            raise ValueError(f"结果必须是一维时间序列，以下键不是: {bad}")
+        # 在加入缓冲区之前检查，避免一次不一致的运行导致整个块写不出去
+        if self._buffer and set(results) != set(self._buffer[0][0]):
+            expected = sorted(self._buffer[0][0])
+            raise ValueError(f"同一块内所有运行必须包含相同的结果键，应为 {expected}，当前为 {sorted(results)}")
+        self._buffer.append((results, dict(params or {})))
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def append_sim(self, sim, params=None, result_keys=None):
+        '''
+        追加一个已运行完成的 cv.Sim 的结果
+
+        Args:
+            sim: 已完成的模拟
+            params: 本次运行的参数字典
+            result_keys: 需要保存的结果键，None 表示保存所有主结果
+        '''
+        if result_keys is None:
+            result_keys = sim.result_keys('main')
+        self.append({key: sim.results[key].values for key in result_keys}, params)
+
+    def flush(self):
+        '''将缓冲区写成一个块文件（先写临时文件，再原子重命名）'''
+        if not self._buffer:
+            return None
+
+        columns = {}
+        for key in sorted(self._buffer[0][0]):
+            columns[key] = _pad_rows([results[key] for results, _ in self._buffer])
+
+        params = [p for _, p in self._buffer]
+        prefix = f'{os.getpid()}-{self._n_written:06d}-{uuid.uuid4().hex[:8]}'
+        columns['__run_id__'] = np.array([f'{prefix}-{i}' for i in range(len(params))])
+        columns['__params__'] = np.array([json.dumps(p, default=str, sort_keys=True) for p in params])
+        for name in sorted(set().union(*params)):
+            missing = np.array([name not in p for p in params])
+            values = [p[name] for p in params if name in p]
+            if all(isinstance(v, (bool, int, float, np.number)) for v in values):
+                columns[f'param:{name}'] = np.array([p.get(name, np.nan) for p in params], dtype=float)
+            elif all(isinstance(v, str) for v in values):
+                columns[f'param:{name}'] = np.array([p.get(name, '') for p in params])
+            else:
+                continue  # 非标量或类型混杂的参数只保存在 '__params__' 中，不能用于筛选
+            if missing.any():
+                columns[f'missing:{name}'] = missing
+
+        filename = os.path.join(self.path, f'chunk-{prefix}.npz')
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            (np.savez_compressed if self.compress else np.savez)(f, **columns)
+        os.replace(tmp_filename, filename)
+
+        self._n_written += 1
+        self._buffer = []
+        return filename
+
+    #%% 读取
+
+    def chunks(self):
+        '''返回所有已写入的块文件（按文件名排序）'''
+        return sorted(glob.glob(os.path.join(self.path, CHUNK_PATTERN)))
+
+    def columns(self):
+        '''返回存储中出现过的所有列名'''
+        names = set()
+        for filename in self.chunks():
+            with np.load(filename) as chunk:
+                names.update(chunk.files)
+        return sorted(names)
+
+    def param_names(self):
+        '''返回可以用于 where 筛选的参数名（数值或字符串标量参数）'''
+        return sorted(name[len('param:'):] for name in self.columns() if name.startswith('param:'))
+
+    def _check_where(self, where):
+        '''where 中的参数名必须在存储中出现过，否则拼写错误会静默地得到空结果'''
+        if not where:
+            return
+        known = self.param_names()
+        unknown = [name for name in where if name not in known]
+        if unknown:
+            raise ValueError(f"存储中没有可用于筛选的参数: {unknown}（只有数值或字符串标量参数可以筛选），可选: {known}")
+
+    def _match(self, chunk, where):
+        '''根据 where 条件（{参数名: 值}）计算块内的行掩码；没有该参数的运行（块内没有该列或标记为缺失）不匹配'''
+        n = len(chunk['__run_id__'])
+        mask = np.ones(n, dtype=bool)
+        for name, value in (where or {}).items():
+            column = f'param:{name}'
+            if column not in chunk.files:
+                return np.zeros(n, dtype=bool)
+            mask &= chunk[column] == value
+            if f'missing:{name}' in chunk.files:
+                mask &= ~chunk[f'missing:{name}']
+        return mask
+
+    def iter_column(self, key, where=None):
+        '''
+        逐块读取一列（只解压这一列），返回生成器
+
+        Args:
+            key: 列名，例如 'cum_infections' 或 '__params__'
+            where: 可选的参数筛选条件 {参数名: 值}
+
+        Yields:
+            np.ndarray: 每个块中满足条件的行
+
+        Raises:
+            ValueError: 如果 where 中有存储中从未出现过的参数名
+        '''
+        self._check_where(where)
+        for filename in self.chunks():
+            with np.load(filename) as chunk:
+                if key not in chunk.files:
+                    continue
+                mask = self._match(chunk, where)
+                if mask.any():
+                    yield chunk[key][mask]
+
+    def load(self, key, where=None):
+        '''读取一整列（所有满足条件的运行），返回二维数组；各块长度不同时用 NaN 补齐'''
+        parts = list(self.iter_column(key, where))
+        if not parts:
+            return np.empty((0,))
+        if parts[0].ndim == 2 and len({part.shape[1] for part in parts}) > 1:
+            return _pad_rows([row for part in parts for row in part])
+        return np.concatenate(parts)
+
+    def params(self, where=None):
+        '''读取满足条件的各次运行的参数字典列表'''
+        return [json.loads(s) for s in self.load('__params__', where)]
+
+    def count(self, where=None):
+        '''满足条件的运行次数'''
+        return sum(len(part) for part in self.iter_column('__run_id__', where))
+
+    def mean(self, key, where=None):
+        '''
+        流式计算一列在所有运行上的均值（每次只在内存中保留一个块）
+
+        较短的运行补齐的 NaN 不计入：每个时间点的均值只包含运行到该时间点的运行
+        '''
+        total, n = np.zeros(0), np.zeros(0)
+        for part in self.iter_column(key, where):
+            width = max(len(total), part.shape[1])
+            total, n = np.pad(total, (0, width - len(total))), np.pad(n, (0, width - len(n)))
+            valid = ~np.isnan(part)
+            total[:part.shape[1]] += np.where(valid, part, 0).sum(axis=0)
+            n[:part.shape[1]] += valid.sum(axis=0)
+        if not n.any():
+            raise ValueError(f"没有满足条件的运行: key={key}, where={where}")
+        with np.errstate(invalid='ignore'):
+            return total / n
+
+    def quantiles(self, key, quantiles=(0.05, 0.5, 0.95), where=None):
+        '''计算一列的分位数区间（只加载这一列）'''
+        values = self.load(key, where)
+        if len(values) == 0:
+            raise ValueError(f"没有满足条件的运行: key={key}, where={where}")
+        return dict(zip(quantiles, np.nanquantile(values, quantiles, axis=0)))
+
+def _pad_rows(rows):
+    '''把长度可能不同的一维数组堆叠成二维数组，较短的行在末尾用 NaN 补齐'''
+    width = max(len(row) for row in rows)
+    if all(len(row) == width for row in rows):
+        return np.stack(rows)
+    padded = np.full((len(rows), width), np.nan)
+    for i, row in enumerate(rows):
+        padded[i, :len(row)] = row
+    return padded
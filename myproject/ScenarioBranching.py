@@ -0,0 +1,155 @@
+'''
+从共享的模拟前缀创建检查点，并从检查点分叉出多个情景分支
+
+比较多个干预方案时（例如 custom_transmission_params.py 方法2 中在第30天、第60天修改参数），
+所有方案在干预开始前的模拟过程完全相同。这里先把模拟运行到分叉日并保存检查点（人员状态、
+接触层、自定义属性、已有干预措施以及随机数状态），之后每个分支只需从检查点恢复并运行剩余天数。
+
+随机数说明：Numpy 的随机数状态会被完整保存和恢复；Covasim 中 Numba 编译函数使用的随机数
+状态无法读取，因此恢复时用检查点中记录的 resume_seed 重新设置 Numba 的种子。这样同一个
+检查点的所有分支使用相同的随机数流（公共随机数），分支之间的差异只来自干预措施本身。
+'''
+import multiprocessing as mp
+import os
+import pickle
+import numpy as np
+import covasim as cv
+
+# 默认返回的结果键
+DEFAULT_RESULT_KEYS = ('cum_infections', 'cum_deaths', 'cum_severe', 'cum_critical', 'new_infections', 'n_infectious')
+
+# 工作进程共享的检查点：fork 时由父进程直接继承，spawn 时由 _init_worker 填充
+_shared = {}
+
+def make_checkpoint(sim, day, resume_seed=None):
+    '''
+    将模拟运行到指定日期并创建检查点
+
+    Args:
+        sim: 已初始化（sim.initialize()）且尚未运行完成的模拟，可以使用自定义 popdict
+            和挂载在 sim.people 上的自定义属性
+        day: 分叉日（天数或日期字符串），检查点保存的是该天开始之前的状态
+        resume_seed: 分支恢复时用于重新设置 Numba 随机数的种子，None 表示由 rand_seed 和分叉日推导
+
+    Returns:
+        dict: 检查点 {'day': 分叉日, 'sim': 序列化后的模拟, 'np_state': Numpy 随机数状态,
+            'resume_seed': 恢复种子}
+    '''
+    if not sim.initialized:
+        raise ValueError("创建检查点前需要先调用 sim.initialize()")
+    day = sim.day(day)
+    if sim.t is None or sim.t < day:
+        sim.run(until=day)  # run() 会在开始时按 rand_seed 重置随机数，保证前缀可复现
+    elif sim.t > day:
+        raise ValueError(f"模拟已经运行到第 {sim.t} 天，无法在第 {day} 天创建检查点")
+
+    if resume_seed is None:
+        resume_seed = (int(sim['rand_seed']) * 1_000_003 + day) % (2**31 - 1)
+
+    return {
+        'day': day,
+        'sim': pickle.dumps(sim, protocol=pickle.HIGHEST_PROTOCOL),
+        'np_state': np.random.get_state(),
+        'resume_seed': int(resume_seed),
+    }
+
+def save_checkpoint(checkpoint, filename):
+    '''将检查点保存到磁盘'''
+    with open(filename, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return filename
+
+def load_checkpoint(filename):
+    '''从磁盘读取检查点'''
+    with open(filename, 'rb') as f:
+        return pickle.load(f)
+
+def restore(checkpoint):
+    '''
+    从检查点恢复出一个独立的模拟副本（包括随机数状态）
+
+    Returns:
+        cv.Sim: 停在分叉日、可以继续运行的模拟
+    '''
+    sim = pickle.loads(checkpoint['sim'])
+    cv.set_seed(checkpoint['resume_seed'])  # 设置 Numba 的随机数流
+    np.random.set_state(checkpoint['np_state'])  # 再精确恢复 Numpy 的随机数状态
+    return sim
+
+def run_branch(checkpoint, interventions=None, pars=None, label=None):
+    '''
+    从检查点恢复并运行一个分支
+
+    Args:
+        checkpoint: make_checkpoint 返回的检查点
+        interventions: 分支新增的干预措施（cv.Intervention 对象或函数），也可以是单个对象
+        pars: 分支修改的参数字典，例如 {'beta': 0.02}
+        label: 分支名称
+
+    Returns:
+        cv.Sim: 运行完成的模拟
+    '''
+    sim = restore(checkpoint)
+    if label is not None:
+        sim.label = label
+    for key, value in (pars or {}).items():
+        sim[key] = value
+
+    if interventions is not None and not isinstance(interventions, (list, tuple)):
+        interventions = [interventions]
+    for intervention in interventions or []:
+        if isinstance(intervention, cv.Intervention):
+            intervention.initialize(sim)
+        sim['interventions'].append(intervention)
+
+    sim.run(reset_seed=False)  # 不重置随机数，沿用检查点恢复的随机数状态
+    return sim
+
+def _init_worker(shared):
+    '''spawn 模式下的工作进程初始化：接收检查点（每个工作进程只接收一次）'''
+    _shared.update(shared)
+
+def _run_branch_task(task):
+    '''在工作进程中运行一个分支，只返回结果数组'''
+    name, branch = task
+    sim = run_branch(_shared['checkpoint'], label=name, **branch)
+    return name, {key: np.array(sim.results[key].values) for key in _shared['result_keys']}
+
+def run_branches(checkpoint, branches, n_cpus=None, result_keys=DEFAULT_RESULT_KEYS):
+    '''
+    从同一个检查点并行运行多个分支
+
+    Args:
+        checkpoint: make_checkpoint 返回的检查点
+        branches: {分支名: {'interventions': [...], 'pars': {...}}}
+        n_cpus: 工作进程数，None 表示使用全部 CPU；1 表示在当前进程中串行运行
+        result_keys: 每个分支需要返回的 sim.results 键
+
+    Returns:
+        dict: {分支名: {result_key: 结果数组}}
+    '''
+    for name, branch in branches.items():
+        unknown = set(branch) - {'interventions', 'pars'}
+        if unknown:
+            raise ValueError(f"分支 '{name}' 包含不支持的键: {sorted(unknown)}，只支持 'interventions' 和 'pars'")
+
+    shared = {'checkpoint': checkpoint, 'result_keys': tuple(result_keys)}
+    tasks = list(branches.items())
+    n_cpus = min(n_cpus or os.cpu_count() or 1, max(len(tasks), 1))
+
+    _shared.clear()
+    _shared.update(shared)
+    try:
+        if n_cpus == 1:
+            outputs = [_run_branch_task(task) for task in tasks]
+        else:
+            if 'fork' in mp.get_all_start_methods():
+                pool = mp.get_context('fork').Pool(n_cpus)  # 工作进程继承 _shared 中的检查点
+            else:
+                pool = mp.get_context('spawn').Pool(n_cpus, initializer=_init_worker, initargs=(shared,))
+            with pool:
+                outputs = pool.map(_run_branch_task, tasks)
+    finally:
+        _shared.clear()
+
+    return dict(outputs)
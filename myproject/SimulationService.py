@@ -0,0 +1,593 @@
+'''
+本地模拟服务：常驻的工作进程保留最近使用的人口，通过 HTTP 接收场景任务并流式返回结果
+
+以前每次交互式的 what-if 运行都是单独执行一个脚本，要重新导入 Covasim、用 create_custom_population
+构建人口并初始化。这里的服务只依赖标准库（asyncio、multiprocessing、json）：
+- 启动时创建 n_workers 个常驻工作进程（支持 fork 时直接继承已导入的模块），每个进程按
+  (pop_size, layer_config, countries_config, pop_seed, build) 缓存最近使用的人口（LRU，与
+  Calibration 的人口缓存相同）；
+- 任务先进入队列，按提交顺序分派给空闲的工作进程，优先分派给已缓存该人口的进程；
+- 工作进程每运行 stream_every 天发回一次新增的结果，HTTP 客户端可以按行（NDJSON）流式读取；
+- 同一个人口的后续任务只需要初始化和运行，不再导入和构建；
+- 事件循环监视每个工作进程的 sentinel，进程意外退出时正在运行的任务以 error 事件结束，
+  并重新启动该进程（缓存的人口随之丢失），服务继续分派其他任务。
+
+任务（JSON）：
+    {
+        'pop_size': 20000,
+        'layer_config': {...},             # 见 ContactNetwork.create_custom_population
+        'countries_config': {...},
+        'pop_seed': 1,                     # 构建人口的随机种子（相同配置和种子得到相同人口）
+        'build': {'engine': 'fast'},       # 可选，传给 create_custom_population 的其他参数
+        'pars': {'n_days': 90, 'pop_infected': 20, 'beta': 0.016, 'rand_seed': 1},
+        'transmission': {'rel_sus:country=A': 1.5},   # 可选，分组传播因子，命名与 Calibration 相同
+        'interventions': [{'type': 'change_beta', 'days': [30], 'changes': [0.5]}],  # 类型见 INTERVENTIONS
+        'stratify': ['country'],           # 可选，用 Stratification.StratifiedResults 分组统计
+        'result_keys': ['cum_infections', 'new_infections'],
+        'stream_every': 10,
+    }
+
+HTTP 接口：
+    POST /jobs                 提交任务，返回 {'job_id', 'status'}
+    GET  /jobs/<id>            任务状态；完成后包含全部结果
+    GET  /jobs/<id>/stream     NDJSON 流：每行一个事件（queued/started/progress/done/error/cancelled）
+    DELETE /jobs/<id>          取消尚未开始的任务
+    GET  /status               工作进程、队列和各进程缓存的人口
+
+用法：
+    python SimulationService.py --port 8765 --workers 4
+    client = SimulationService.ServiceClient('127.0.0.1', 8765)
+    for event in client.stream(client.submit(job)):
+        print(event['event'], event.get('day'))
+'''
+import argparse
+import asyncio
+import collections
+import http.client
+import itertools
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+import traceback
+import numpy as np
+import covasim as cv
+import Calibration
+import ContactNetwork
+import Mobility
+import Stratification
+
+# 任务中 'interventions' 可用的类型：{类型名: 构造函数}，参数直接作为关键字参数传入
+INTERVENTIONS = {
+    'change_beta': cv.change_beta,
+    'clip_edges': cv.clip_edges,
+    'test_prob': cv.test_prob,
+    'test_num': cv.test_num,
+    'contact_tracing': cv.contact_tracing,
+    'country_mobility': Mobility.CountryMobility,
+}
+
+DEFAULT_RESULT_KEYS = ('cum_infections', 'new_infections', 'n_infectious', 'cum_deaths')
+
+# 任务中允许的键
+JOB_KEYS = ('pop_size', 'layer_config', 'countries_config', 'pop_seed', 'build', 'pars', 'transmission',
+            'interventions', 'stratify', 'result_keys', 'stream_every')
+
+def population_key(job):
+    '''任务对应的人口缓存键：影响人口结构的部分'''
+    return json.dumps([job['pop_size'], job['layer_config'], job['countries_config'], job.get('pop_seed', 1),
+                       job.get('build', {})], sort_keys=True, default=str)
+
+def validate_job(job):
+    '''
+    校验任务，返回补全默认值后的副本（在提交时调用，错误直接返回给客户端）
+
+    Raises:
+        ValueError: 任务格式不合法
+    '''
+    if not isinstance(job, dict):
+        raise ValueError(f"任务必须是 JSON 对象，当前类型: {type(job).__name__}")
+    unknown = [key for key in job if key not in JOB_KEYS]
+    if unknown:
+        raise ValueError(f"任务中有未知的键: {unknown}，可选: {list(JOB_KEYS)}")
+    missing = [key for key in ('pop_size', 'layer_config', 'countries_config') if key not in job]
+    if missing:
+        raise ValueError(f"任务缺少必需的键: {missing}")
+    if not isinstance(job['pop_size'], int) or job['pop_size'] <= 0:
+        raise ValueError(f"pop_size 必须是正整数: {job['pop_size']!r}")
+    ContactNetwork.validate_layer_config(job['layer_config'])
+    ContactNetwork.validate_countries_config(job['countries_config'])
+    job = dict(job)
+    job.setdefault('pop_seed', 1)
+    job.setdefault('build', {})
+    job.setdefault('pars', {})
+    job.setdefault('transmission', {})
+    job.setdefault('interventions', [])
+    job.setdefault('stratify', [])
+    job.setdefault('result_keys', list(DEFAULT_RESULT_KEYS))
+    job.setdefault('stream_every', 10)
+    if 'pop_size' in job['pars'] and job['pars']['pop_size'] != job['pop_size']:
+        raise ValueError(f"pars['pop_size'] ({job['pars']['pop_size']}) 与 pop_size ({job['pop_size']}) 不一致")
+    for spec in job['interventions']:
+        if not isinstance(spec, dict) or spec.get('type') not in INTERVENTIONS:
+            raise ValueError(f"干预必须是带 'type' 的对象，type 可选: {list(INTERVENTIONS)}，当前: {spec!r}")
+    for name in job['transmission']:
+        target, _, condition = name.partition(':')
+        if target not in ('rel_sus', 'rel_trans') or '=' not in condition:
+            raise ValueError(f"分组传播因子的名称应为 'rel_sus:<属性>=<取值>' 或 'rel_trans:<属性>=<取值>': {name}")
+    if not isinstance(job['stream_every'], int) or job['stream_every'] < 1:
+        raise ValueError(f"stream_every 必须是正整数: {job['stream_every']!r}")
+    return job
+
+def _get_population(job, cache, cache_size):
+    '''从进程内的 LRU 缓存获取人口，返回 (popdict, 是否命中, 构建耗时)'''
+    key = population_key(job)
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key], True, 0.0
+    T = time.perf_counter()
+    cv.set_seed(job['pop_seed'])  # 同时设置 Numpy 和 Numba 的随机数，保证同一配置构建出同一人口
+    popdict, _ = ContactNetwork.create_custom_population(job['pop_size'], job['layer_config'], job['countries_config'],
+                                                         **job['build'])
+    cache[key] = popdict
+    while len(cache) > cache_size:
+        cache.popitem(last=False)
+    return popdict, False, time.perf_counter() - T
+
+def run_job(job, cache=None, cache_size=4, emit=None):
+    '''
+    运行一个（已校验的）任务
+
+    Args:
+        job: validate_job 返回的任务
+        cache: 人口缓存（collections.OrderedDict），None 表示不缓存
+        cache_size: 缓存的最大人口数
+        emit: 可选函数 emit(event)，接收 'started' 和 'progress' 事件
+
+    Returns:
+        dict: 'done' 事件：{'event': 'done', 'results': {结果键: 列表}, 'stratified': {...}, 'timing': {...}, 'warm': 是否命中缓存}
+    '''
+    emit = emit or (lambda event: None)
+    cache = collections.OrderedDict() if cache is None else cache
+    popdict, warm, build_time = _get_population(job, cache, cache_size)
+    emit({'event': 'started', 'warm': warm, 'build_time': build_time})
+
+    T = time.perf_counter()
+    interventions = [INTERVENTIONS[spec['type']](**{k: v for k, v in spec.items() if k != 'type'}) for spec in job['interventions']]
+    analyzers = [Stratification.StratifiedResults(by=job['stratify'])] if job['stratify'] else []
+    sim = cv.Sim(pars=dict(job['pars'], pop_size=job['pop_size'], verbose=0), interventions=interventions, analyzers=analyzers)
+    sim.popdict = popdict  # make_people 会复制数组，缓存中的 popdict 不会被修改
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    for name, factor in job['transmission'].items():
+        target, condition = name.split(':', 1)
+        attr, attr_value = condition.split('=', 1)
+        ContactNetwork.scale_agent_values(sim.people, target, factor,
+                                          ContactNetwork.attribute_mask(sim.people, attr, attr_value))
+    missing = [key for key in job['result_keys'] if key not in sim.results]
+    if missing:
+        raise ValueError(f"sim.results 中没有以下结果: {missing}")
+    init_time = time.perf_counter() - T
+
+    T = time.perf_counter()
+    sent = 0
+    for until in range(job['stream_every'], sim.npts, job['stream_every']):
+        # 运行到第 until 天之前；未结束时由 partial_result 读取（cum_* 由 new_* 累加）。只在第一段重置随机数种子，
+        # 否则每段都从 rand_seed 重新开始，结果会依赖 stream_every
+        sim.run(until=until, reset_seed=(sent == 0))
+        emit({'event': 'progress', 'day': sim.t - 1,
+              'results': {key: Calibration.partial_result(sim, key)[sent:sim.t].tolist() for key in job['result_keys']}})
+        sent = sim.t
+    sim.run(reset_seed=(sent == 0))
+    emit({'event': 'progress', 'day': sim.npts - 1,
+          'results': {key: sim.results[key].values[sent:].tolist() for key in job['result_keys']}})
+    run_time = time.perf_counter() - T
+
+    stratified = {}
+    if job['stratify']:
+        strat = sim.get_analyzer(Stratification.StratifiedResults)
+        for by in strat.by:
+            stratified[str(by)] = {key: {str(label): values.tolist() for label, values in strat.by_group(by, key).items()}
+                                   for key in job['result_keys'] if key in strat.results[by]}
+    return {
+        'event': 'done',
+        'warm': warm,
+        'results': {key: sim.results[key].values.tolist() for key in job['result_keys']},
+        'stratified': stratified,
+        'timing': {'build': build_time, 'initialize': init_time, 'run': run_time},
+    }
+
+def _worker_main(worker_id, tasks, messages, cache_size):
+    '''工作进程：依次运行分派来的任务，事件发到 messages（收到 None 时退出）'''
+    cache = collections.OrderedDict()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, job = task
+        emit = lambda event: messages.put((worker_id, job_id, event))
+        try:
+            emit(run_job(job, cache, cache_size, emit))
+        except Exception as e:
+            emit({'event': 'error', 'error': f'{type(e).__name__}: {e}', 'traceback': traceback.format_exc()})
+    return
+
+class SimulationService:
+    '''
+    模拟服务
+
+    Args:
+        n_workers: 工作进程数，None 表示使用全部 CPU
+        cache_size: 每个工作进程缓存的最大人口数
+        host, port: 监听地址；port=0 表示由系统分配（启动后见 self.port）
+        max_finished: 最多保留的已结束任务数（更早的任务被删除）
+    '''
+
+    def __init__(self, n_workers=None, cache_size=4, host='127.0.0.1', port=8765, max_finished=1000):
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.host = host
+        self.port = port
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._queue = collections.deque()
+        self._finished = collections.deque()
+        self._workers = []
+
+    #%% 工作进程和分派
+
+    def _start_workers(self):
+        method = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+        self._ctx = mp.get_context(method)  # fork 时工作进程直接继承已导入的 Covasim
+        self._messages = self._ctx.Queue()
+        self._workers = [self._spawn_worker(worker_id) for worker_id in range(self.n_workers)]
+        self._reader = threading.Thread(target=self._read_messages, daemon=True)
+        self._reader.start()
+
+    def _spawn_worker(self, worker_id, restarts=0):
+        '''启动一个工作进程，并在事件循环中监视它的 sentinel（进程退出时可读）'''
+        tasks = self._ctx.Queue()
+        process = self._ctx.Process(target=_worker_main, args=(worker_id, tasks, self._messages, self.cache_size), daemon=True)
+        process.start()
+        try:
+            self._loop.add_reader(process.sentinel, self._on_worker_exit, worker_id)
+        except NotImplementedError:  # 不支持 add_reader 的事件循环（Windows 的 Proactor）：定期检查 exitcode
+            self._loop.create_task(self._poll_worker(worker_id, process))
+        # 与工作进程内的 LRU 缓存同步记录的人口键，用于按缓存分派
+        return {'process': process, 'tasks': tasks, 'job': None, 'cache': collections.OrderedDict(), 'restarts': restarts}
+
+    async def _poll_worker(self, worker_id, process):
+        while process.exitcode is None:
+            await asyncio.sleep(1.0)
+        self._on_worker_exit(worker_id)
+
+    def _on_worker_exit(self, worker_id):
+        '''工作进程意外退出（被杀死、内存不足等）：正在运行的任务以 error 事件结束，并重新启动该进程'''
+        worker = self._workers[worker_id] if worker_id < len(self._workers) else None
+        if worker is None or worker['process'].exitcode is None:
+            return
+        try:
+            self._loop.remove_reader(worker['process'].sentinel)
+        except NotImplementedError:
+            pass
+        if self._stopping.is_set():
+            return
+        exitcode = worker['process'].exitcode
+        job_id = worker['job']
+        self._workers[worker_id] = self._spawn_worker(worker_id, restarts=worker['restarts'] + 1)
+        record = self.jobs.get(job_id)
+        if record is not None and record['status'] == 'running':
+            record['status'] = 'error'
+            record['finished'] = time.time()
+            record['error'] = f'工作进程 {worker_id} 意外退出（exitcode {exitcode}），已重新启动'
+            self._finish(job_id)
+            self._publish(record, {'event': 'error', 'error': record['error']})
+        self._dispatch()
+
+    def _read_messages(self):
+        '''后台线程：把工作进程的事件转交给事件循环'''
+        while True:
+            message = self._messages.get()
+            if message is None:
+                break
+            self._loop.call_soon_threadsafe(self._on_message, *message)
+
+    def _dispatch(self):
+        '''把队首的任务分派给空闲的工作进程，优先选择已缓存该人口的进程'''
+        while self._queue:
+            idle = [i for i, worker in enumerate(self._workers) if worker['job'] is None]
+            if not idle:
+                return
+            job_id = self._queue.popleft()
+            record = self.jobs[job_id]
+            key = population_key(record['job'])
+            worker_id = next((i for i in idle if key in self._workers[i]['cache']), idle[0])
+            worker = self._workers[worker_id]
+            worker['job'] = job_id
+            record['status'] = 'running'
+            record['worker'] = worker_id
+            record['dispatched'] = time.time()
+            worker['tasks'].put((job_id, record['job']))
+
+    def _on_message(self, worker_id, job_id, event):
+        record = self.jobs.get(job_id)
+        if record is None or record['status'] != 'running':  # 例如工作进程退出后才到达的事件
+            return
+        if event['event'] == 'started':
+            # 人口已构建（或命中缓存）并进入工作进程的缓存：这时才记录，构建失败的人口不会被当作已缓存
+            cache = self._workers[worker_id]['cache']
+            key = population_key(record['job'])
+            cache[key] = True
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        if event['event'] in ('done', 'error'):
+            self._workers[worker_id]['job'] = None
+            record['status'] = event['event']
+            record['finished'] = time.time()
+            if event['event'] == 'done':
+                event = dict(event, timing=dict(event['timing'], queue_wait=record['dispatched'] - record['submitted']))
+                record['result'] = event
+            else:
+                record['error'] = event['error']
+            self._finish(job_id)
+            self._dispatch()
+        self._publish(record, event)
+
+    def _publish(self, record, event):
+        record['events'].append(dict(event, job_id=record['id']))
+        record['changed'].set()
+        record['changed'] = asyncio.Event()
+
+    def _finish(self, job_id):
+        self._finished.append(job_id)
+        while len(self._finished) > self.max_finished:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    #%% 任务管理
+
+    def submit(self, job):
+        '''校验并提交任务，返回任务编号'''
+        job = validate_job(job)
+        job_id = str(next(self._ids))
+        record = {'id': job_id, 'job': job, 'status': 'queued', 'submitted': time.time(), 'events': [],
+                  'changed': asyncio.Event(), 'worker': None}
+        self.jobs[job_id] = record
+        self._queue.append(job_id)
+        self._publish(record, {'event': 'queued', 'position': len(self._queue)})
+        self._dispatch()
+        return job_id
+
+    def cancel(self, job_id):
+        '''取消尚未开始的任务，返回是否取消成功'''
+        record = self.jobs[job_id]
+        if record['status'] != 'queued':
+            return False
+        self._queue.remove(job_id)
+        record['status'] = 'cancelled'
+        self._finish(job_id)
+        self._publish(record, {'event': 'cancelled'})
+        return True
+
+    def job_status(self, job_id):
+        record = self.jobs[job_id]
+        output = {'job_id': job_id, 'status': record['status'], 'worker': record['worker']}
+        if record['status'] == 'done':
+            output.update({key: record['result'][key] for key in ('results', 'stratified', 'timing', 'warm')})
+        elif record['status'] == 'error':
+            output['error'] = record['error']
+        return output
+
+    def status(self):
+        return {
+            'workers': [{'id': i, 'job': worker['job'], 'alive': worker['process'].is_alive(),
+                         'populations': len(worker['cache']), 'restarts': worker['restarts']}
+                        for i, worker in enumerate(self._workers)],
+            'queued': list(self._queue),
+            'jobs': {status: sum(1 for r in self.jobs.values() if r['status'] == status)
+                     for status in ('queued', 'running', 'done', 'error', 'cancelled')},
+        }
+
+    async def events(self, job_id):
+        '''按顺序产生任务的事件（先回放已有事件），任务结束后停止'''
+        record = self.jobs[job_id]
+        position = 0
+        while True:
+            changed = record['changed']
+            while position < len(record['events']):
+                event = record['events'][position]
+                position += 1
+                yield event
+                if event['event'] in ('done', 'error', 'cancelled'):
+                    return
+            await changed.wait()
+
+    #%% HTTP
+
+    async def _respond(self, writer, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        reason = http.client.responses.get(status, '')
+        writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n'
+                     f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode() + data)
+        await writer.drain()
+
+    async def _stream(self, writer, job_id):
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson; charset=utf-8\r\n'
+                     b'Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n')
+        async for event in self.events(job_id):
+            line = json.dumps(event, ensure_ascii=False).encode() + b'\n'
+            writer.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1')
+                if line in ('\r\n', '\n', ''):
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return await self._respond(writer, 400, {'error': '请求行不合法'})
+            method, path = request_line[0], request_line[1].split('?')[0].rstrip('/')
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            parts = path.strip('/').split('/')
+
+            if method == 'GET' and parts == ['status']:
+                return await self._respond(writer, 200, self.status())
+            if method == 'POST' and parts == ['jobs']:
+                try:
+                    job_id = self.submit(json.loads(body or b'null'))
+                except (ValueError, TypeError) as e:
+                    return await self._respond(writer, 400, {'error': str(e)})
+                return await self._respond(writer, 202, {'job_id': job_id, 'status': self.jobs[job_id]['status']})
+            if len(parts) in (2, 3) and parts[0] == 'jobs':
+                job_id = parts[1]
+                if job_id not in self.jobs:
+                    return await self._respond(writer, 404, {'error': f'没有任务 {job_id}'})
+                if method == 'GET' and len(parts) == 2:
+                    return await self._respond(writer, 200, self.job_status(job_id))
+                if method == 'GET' and parts[2:] == ['stream']:
+                    return await self._stream(writer, job_id)
+                if method == 'DELETE' and len(parts) == 2:
+                    cancelled = self.cancel(job_id)
+                    return await self._respond(writer, 200 if cancelled else 409,
+                                               {'job_id': job_id, 'cancelled': cancelled, 'status': self.jobs[job_id]['status']})
+            return await self._respond(writer, 404, {'error': f'未知的接口: {method} {path}'})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, ready=None):
+        '''
+        启动工作进程并监听 HTTP 请求，直到调用 stop() 或被取消
+
+        Args:
+            ready: 可选的 threading.Event，开始监听后设置（用于在其他线程中启动服务）
+        '''
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._start_workers()
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            if ready is not None:
+                ready.set()
+            async with server:
+                await self._stopping.wait()
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        '''停止服务（可以在其他线程中调用）'''
+        self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def shutdown(self):
+        '''停止工作进程'''
+        self._stopping.set()  # 之后的进程退出不再重新启动
+        for worker in self._workers:
+            try:
+                self._loop.remove_reader(worker['process'].sentinel)
+            except NotImplementedError:
+                pass
+            worker['tasks'].put(None)
+        for worker in self._workers:
+            worker['process'].join(timeout=5)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+        if self._workers:
+            self._messages.put(None)
+        self._workers = []
+
+class ServiceClient:
+    '''
+    服务的客户端（只用 http.client）
+
+    Args:
+        host, port: 服务地址
+        timeout: 单次请求的超时（秒）；流式读取时为两个事件之间的最长等待
+    '''
+
+    def __init__(self, host='127.0.0.1', port=8765, timeout=600):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            data = None if body is None else json.dumps(body, default=_to_json).encode()
+            connection.request(method, path, body=data, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            payload = json.loads(response.read() or b'null')
+        finally:
+            connection.close()
+        if response.status >= 400 and response.status != 409:
+            raise RuntimeError(f"{method} {path} 失败 ({response.status}): {payload.get('error')}")
+        return payload
+
+    def submit(self, job):
+        '''提交任务，返回任务编号'''
+        return self._request('POST', '/jobs', job)['job_id']
+
+    def get(self, job_id):
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id):
+        return self._request('DELETE', f'/jobs/{job_id}')['cancelled']
+
+    def status(self):
+        return self._request('GET', '/status')
+
+    def stream(self, job_id):
+        '''逐个产生任务的事件，直到 done/error/cancelled'''
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request('GET', f'/jobs/{job_id}/stream')
+            response = connection.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"读取任务 {job_id} 的事件失败 ({response.status}): {response.read().decode()}")
+            for line in response:
+                yield json.loads(line)
+        finally:
+            connection.close()
+
+    def run(self, job):
+        '''提交任务并等待结束，返回最后一个事件（done 事件包含全部结果）'''
+        event = None
+        for event in self.stream(self.submit(job)):
+            pass
+        return event
+
+def _to_json(value):
+    '''任务中的 Numpy 数值和数组转换为 JSON 类型'''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"无法转换为 JSON: {type(value).__name__}")
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认使用全部 CPU')
+    parser.add_argument('--cache-size', type=int, default=4, help='每个工作进程缓存的最大人口数')
+    args = parser.parse_args()
+    service = SimulationService(n_workers=args.workers, cache_size=args.cache_size, host=args.host, port=args.port)
+    print(f"模拟服务: http://{args.host}:{args.port}（{service.n_workers} 个工作进程）")
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+'''
+按国家、健康状况等分类属性分组统计的结果（在模拟循环中累计）
+
+Covasim 的 sim.results 只有全体人口的结果；按国家或 health_status 分组的曲线以前需要在运行后
+处理人员数组，或者用每天对全体人口做掩码的分析器（O(N × 组数)）。这里的 StratifiedResults
+每步只读取 infection_log 中新增的感染记录：
+- 新增感染按组 bincount 计入当天；
+- 感染发生时 Covasim 已经确定了此人之后的病程日期（date_infectious、date_symptomatic、
+  date_severe、date_critical、date_recovered、date_dead），把这些未来事件一次性用单个
+  np.add.at 计入 (事件, 日期, 组) 表，到那一天不需要再扫描人员数组；
+- 存量（处于感染、有症状等状态的人数）由进入和离开状态的流量累加得到。
+因此每步的计算量只与新增感染数有关，与人口规模和结果表大小（流量 × 天数 × 组数）都无关。诊断由检测干预在运行中
+产生，无法在感染时预先确定，由 ContactNetwork.DiagnosisWatch 记下检测阳性的人，每步只在其中查找当天的诊断。
+
+用法：
+    analyzer = Stratification.StratifiedResults(by=['country', 'health_status', ('country', 'sex')])
+    sim = cv.Sim(..., analyzers=analyzer)
+    ...
+    strat = sim.get_analyzer(Stratification.StratifiedResults)
+    strat.results['country']['cum_infections']   # (npts, 国家数)
+    strat.by_group('country', 'cum_infections')  # {国家名: 数组}
+'''
+import itertools
+import numpy as np
+import covasim as cv
+import ContactNetwork
+
+# 感染时即可确定日期的流量：结果名 -> 日期属性
+SCHEDULED_FLOWS = {
+    'infectious': 'date_infectious',
+    'symptomatic': 'date_symptomatic',
+    'severe': 'date_severe',
+    'critical': 'date_critical',
+    'recoveries': 'date_recovered',
+    'deaths': 'date_dead',
+}
+
+# 由流量累加得到的存量：结果名 -> 进入该状态的流量（离开都是康复或死亡）
+STRATIFIED_STOCKS = {
+    'exposed': 'infections',
+    'infectious': 'infectious',
+    'symptomatic': 'symptomatic',
+    'severe': 'severe',
+    'critical': 'critical',
+}
+
+FLOWS = ['infections', 'diagnoses'] + list(SCHEDULED_FLOWS)
+
+class StratifiedResults(cv.Analyzer):
+    '''
+    分组统计结果的分析器
+
+    Args:
+        by: 分组方式列表，每项是 sim.people 上的属性名（例如 'country'、'health_status'、'sex'），
+            或属性名的元组（按多个属性的组合分组）
+        age_bins: 按 'age' 分组时的年龄分界点，例如 [18, 65] 分为 0-18、18-65、65+
+        kwargs: 传给 cv.Analyzer 的参数（例如 label）
+
+    运行结束后：
+        self.results[分组][结果键]: (npts, 组数) 的数组，结果键为 new_*/cum_*（infections、infectious、
+            symptomatic、severe、critical、recoveries、deaths、diagnoses）和 n_*（exposed、
+            infectious、symptomatic、severe、critical），已按 rescale_vec 缩放
+        self.labels[分组]: 各组的名称
+    '''
+
+    def __init__(self, by=('country',), age_bins=None, **kwargs):
+        super().__init__(**kwargs)
+        if isinstance(by, (str, tuple)):
+            by = [by]
+        self.by = [b if isinstance(b, str) else tuple(b) for b in by]
+        self.age_bins = age_bins
+        self.results = {}
+        self.labels = {}
+        return
+
+    def initialize(self, sim):
+        super().initialize(sim)
+        if sim['rescale'] and sim['pop_scale'] > 1:
+            raise ValueError("StratifiedResults 不支持动态缩放（rescale=True 且 pop_scale > 1）：缩放时 make_naive 会改变"
+                             "已感染者的病程日期。请设置 rescale=False")
+        for analyzer in sim['analyzers']:
+            if getattr(analyzer, 'dynamic', False) and type(analyzer).__name__ == 'CountryRescale':
+                raise ValueError("StratifiedResults 不支持动态的 CountryRescale：缩放时 make_naive 会改变已感染者的病程日期")
+        self.npts = sim.npts
+        self.codes = None
+        self._log_pos = 0
+        ContactNetwork.DiagnosisWatch.attach(sim.people)
+        return
+
+    def _attribute_codes(self, people, attr):
+        '''单个属性的组编号和组名'''
+        if attr == 'age' and self.age_bins is not None:
+            edges = [0] + list(self.age_bins)
+            labels = [f'{lo}-{hi}' for lo, hi in zip(edges[:-1], edges[1:])] + [f'{edges[-1]}+']
+            return np.digitize(people.age, self.age_bins), labels
+        if attr == 'country':
+            return ContactNetwork.country_codes(people)  # compact 策略的人口只有 country_code
+        if not hasattr(people, attr):
+            raise AttributeError(f"sim.people 上没有属性 '{attr}'，自定义属性需要先调用 ContactNetwork.attach_custom_attributes")
+        labels, codes = np.unique(np.asarray(getattr(people, attr)), return_inverse=True)
+        return codes, list(labels)
+
+    def _setup_groups(self, people):
+        '''第一次调用时（people 上已挂载自定义属性）建立各分组方式的组编号'''
+        self.codes = {}
+        for key in self.by:
+            attrs = (key,) if isinstance(key, str) else key
+            parts = [self._attribute_codes(people, attr) for attr in attrs]
+            shape = tuple(len(labels) for _, labels in parts)
+            self.codes[key] = np.ravel_multi_index([codes for codes, _ in parts], shape) if len(parts) > 1 else parts[0][0]
+            self.labels[key] = parts[0][1] if len(parts) == 1 else list(itertools.product(*[labels for _, labels in parts]))
+
+        # 每个分组方式一张表：(流量, 日期, 组)，另有离开各存量状态的事件表和初始感染数
+        n_flows = len(FLOWS) + len(STRATIFIED_STOCKS)
+        self._counts = {key: np.zeros((n_flows, self.npts, len(self.labels[key]))) for key in self.by}
+        self._seeds = {key: np.zeros(len(self.labels[key])) for key in self.by}
+        return
+
+    def _new_infections(self, people):
+        '''读取 infection_log 中自上一步以来新增的记录，返回 (感染者, 是否为初始感染)'''
+        log = people.infection_log
+        new_entries = log[self._log_pos:]
+        self._log_pos = len(log)
+        targets = np.fromiter((e['target'] for e in new_entries), dtype=np.int64, count=len(new_entries))
+        is_seed = np.fromiter((e['layer'] == 'seed_infection' for e in new_entries), dtype=bool, count=len(new_entries))
+        return targets, is_seed
+
+    def _event_index(self, people, targets, is_seed, t):
+        '''
+        计算新增感染及其全部未来事件在 (流量, 日期) 上的扁平编号
+
+        Returns:
+            tuple: (扁平编号, 对应的感染者序号)
+        '''
+        npts = self.npts
+        index, owner = [], []
+        new = np.flatnonzero(~is_seed)
+        index.append(np.full(len(new), FLOWS.index('infections') * npts + t))
+        owner.append(new)
+
+        date_end = np.where(np.isnan(people.date_recovered[targets]), people.date_dead[targets], people.date_recovered[targets])
+        for flow, date_key in SCHEDULED_FLOWS.items():
+            dates = people[date_key][targets]
+            ok = ~np.isnan(dates) & (dates < npts)
+            index.append(FLOWS.index(flow) * npts + dates[ok].astype(np.int64))
+            owner.append(np.flatnonzero(ok))
+
+        # 离开存量状态的事件：进入过该状态的人在康复或死亡时离开
+        for i, (stock, flow) in enumerate(STRATIFIED_STOCKS.items()):
+            entered = np.ones(len(targets), dtype=bool) if flow == 'infections' else ~np.isnan(people[SCHEDULED_FLOWS[flow]][targets])
+            ok = entered & ~np.isnan(date_end) & (date_end < npts)
+            index.append((len(FLOWS) + i) * npts + date_end[ok].astype(np.int64))
+            owner.append(np.flatnonzero(ok))
+        return np.concatenate(index), np.concatenate(owner)
+
+    def apply(self, sim):
+        people = sim.people
+        t = sim.t
+        if self.codes is None:
+            self._setup_groups(people)
+
+        targets, is_seed = self._new_infections(people)
+        if len(targets):
+            index, owner = self._event_index(people, targets, is_seed, t)
+            for key in self.by:
+                codes = self.codes[key][targets]
+                n_groups = len(self.labels[key])
+                counts = self._counts[key]
+                # 只累加涉及的格子：np.add.at 的开销与事件数成正比，不随结果表的大小（流量 × 天数 × 组数）增长
+                np.add.at(counts.reshape(-1), index * n_groups + codes[owner], 1)
+                if is_seed.any():
+                    self._seeds[key] += np.bincount(codes[is_seed], minlength=n_groups)
+
+        # 诊断由检测干预产生，只在检测阳性、等待诊断的人中查找
+        diagnosed = ContactNetwork.DiagnosisWatch.attach(people).diagnosed_on(t)
+        if len(diagnosed):
+            for key in self.by:
+                self._counts[key][FLOWS.index('diagnoses'), t] += np.bincount(self.codes[key][diagnosed], minlength=len(self.labels[key]))
+        return
+
+    def finalize(self, sim):
+        super().finalize(sim)
+        if self.codes is None:
+            return
+        scale = sim.rescale_vec[:, None]
+        for key in self.by:
+            counts = self._counts[key]
+            results = {}
+            for i, flow in enumerate(FLOWS):
+                results[f'new_{flow}'] = counts[i] * scale
+                results[f'cum_{flow}'] = np.cumsum(results[f'new_{flow}'], axis=0)
+            results['cum_infections'] += self._seeds[key] * sim.rescale_vec[0]
+
+            for i, (stock, flow) in enumerate(STRATIFIED_STOCKS.items()):
+                entered = np.cumsum(counts[FLOWS.index(flow)], axis=0)
+                if flow == 'infections':
+                    entered += self._seeds[key]
+                left = np.cumsum(counts[len(FLOWS) + i], axis=0)
+                results[f'n_{stock}'] = (entered - left) * scale
+            self.results[key] = results
+        del self._counts
+        return
+
+    def by_group(self, key, result_key):
+        '''
+        按组名返回某个分组方式下的一项结果
+
+        Returns:
+            dict: {组名: 一维时间序列}
+        '''
+        return {label: self.results[key][result_key][:, i] for i, label in enumerate(self.labels[key])}
@@ -93,9 +93,9 @@ if 'country' in custom_popdict:
 # 方法1.3：随机设置（例如：模拟基因差异）
 np.random.seed(42)
 # 易感性：0.5-1.5之间随机
-sim.people.rel_sus = np.random.uniform(0.5, 1.5, pop_size)
+ContactNetwork.set_agent_values(sim.people, 'rel_sus', np.random.uniform(0.5, 1.5, pop_size))  # 原地写入，保持 Covasim 的 float32 数组
 # 传播性：0.8-1.2之间随机
-sim.people.rel_trans = np.random.uniform(0.8, 1.2, pop_size)
+ContactNetwork.set_agent_values(sim.people, 'rel_trans', np.random.uniform(0.8, 1.2, pop_size))
 
 print(f"\n随机设置后的统计:")
 print(f"易感性 - 均值: {sim.people.rel_sus.mean():.2f}, 范围: [{sim.people.rel_sus.min():.2f}, {sim.people.rel_sus.max():.2f}]")
@@ -138,8 +138,8 @@ sim2.reset_layer_pars()
 sim2.initialize()
 
 # 初始设置
-sim2.people.rel_sus = np.random.uniform(0.8, 1.2, pop_size)
-sim2.people.rel_trans = np.random.uniform(0.9, 1.1, pop_size)
+ContactNetwork.set_agent_values(sim2.people, 'rel_sus', np.random.uniform(0.8, 1.2, pop_size))
+ContactNetwork.set_agent_values(sim2.people, 'rel_trans', np.random.uniform(0.9, 1.1, pop_size))
 
 print(f"初始易感性均值: {sim2.people.rel_sus.mean():.2f}")
 print(f"初始传播性均值: {sim2.people.rel_trans.mean():.2f}")
@@ -95,9 +95,9 @@ print("="*60)
 
 np.random.seed(42)
 # 易感性：0.5-1.5之间随机
-sim.people.rel_sus = np.random.uniform(0.5, 1.5, pop_size)
+ContactNetwork.set_agent_values(sim.people, 'rel_sus', np.random.uniform(0.5, 1.5, pop_size))  # 原地写入，保持 Covasim 的 float32 数组
 # 传播性：0.8-1.2之间随机
-sim.people.rel_trans = np.random.uniform(0.8, 1.2, pop_size)
+ContactNetwork.set_agent_values(sim.people, 'rel_trans', np.random.uniform(0.8, 1.2, pop_size))
 
 print(f"易感性 - 均值: {sim.people.rel_sus.mean():.2f}, 范围: [{sim.people.rel_sus.min():.2f}, {sim.people.rel_sus.max():.2f}]")
 print(f"传播性 - 均值: {sim.people.rel_trans.mean():.2f}, 范围: [{sim.people.rel_trans.min():.2f}, {sim.people.rel_trans.max():.2f}]")
@@ -0,0 +1,65 @@
+'''
+测试按国家、年龄排序的人员索引（AgeIndex）
+验证 age_range 筛选结果与掩码筛选完全相同（包括边界上的年龄），构建的层不包含年龄范围之外的人，
+以及筛选耗时与人口规模无关
+'''
+import time
+import numpy as np
+import Enums
+import ContactNetwork
+import NetworkEquivalence
+
+print("="*60)
+print("测试1: 与掩码筛选结果相同")
+print("="*60)
+n = 50000
+codes = np.random.randint(0, 3, n)
+for label, ages in [('连续年龄', np.random.uniform(0, 100, n)), ('整数年龄', np.random.randint(0, 100, n).astype(float)),
+                    ('float32 年龄', np.random.uniform(0, 100, n).astype(np.float32))]:
+    index = ContactNetwork.AgeIndex(codes, ages, 3)
+    ok = True
+    for min_age, max_age in [(0, 100), (18, 65), (18, 18), (65, 18), (5.5, 6.25), (99, 200), (-5, 0)]:
+        for code in [None, 0, 1, 2]:
+            mask = (ages >= min_age) & (ages < max_age)
+            if code is not None:
+                mask &= codes == code
+            ok &= np.array_equal(index.select(code, (min_age, max_age)), np.flatnonzero(mask))
+    ok &= all(np.array_equal(index.select(code), np.flatnonzero(codes == code)) for code in range(3))
+    print(f"{'✓' if ok else '✗'} {label}: 所有年龄范围和国家的筛选结果相同，且按 uid 升序")
+
+print("\n" + "="*60)
+print("测试2: 多个按年龄筛选的层")
+print("="*60)
+layer_config = {
+    'school': {'network_type': Enums.NetWorkType.school.name, 'age_range': [5, 18], 'beta': 0.3},
+    'work': {'network_type': Enums.NetWorkType.workplace.name, 'age_range': [18, 65], 'beta': 0.3},
+    'elderly_care': {'network_type': Enums.NetWorkType.microstructured.name, 'cluster_size': 6, 'age_range': [75, 100], 'beta': 0.3},
+    'community': {'network_type': Enums.NetWorkType.random.name, 'n_contacts': 6, 'age_range': [18, 100], 'beta': 0.3},
+}
+countries_config = {
+    'B': {'proportion': 0.4, 'age_pyramid': {'bins': [0, 18, 65, 100], 'weights': [0.25, 0.55, 0.2]}},
+    'A': {'proportion': 0.6, 'age_pyramid': {'bins': [0, 18, 65, 100], 'weights': [0.2, 0.6, 0.2]}},
+}
+popdict, keys = ContactNetwork.create_custom_population(20000, layer_config, countries_config)
+for name in keys:
+    result = NetworkEquivalence.network_statistics(popdict, name, layer_config[name])
+    ok = result['outside_age_range'] == 0 and result['cross_country'] == 0 and result['n_edges'] > 0
+    print(f"{'✓' if ok else '✗'} 层 {name}: {result['n_edges']} 条边，年龄范围之外 {result['outside_age_range']}，跨国家 {result['cross_country']}")
+
+print("\n" + "="*60)
+print("测试3: 筛选耗时")
+print("="*60)
+for size in [200000, 2000000]:
+    codes = np.random.randint(0, 3, size)
+    ages = np.random.uniform(0, 100, size)
+    index = ContactNetwork.AgeIndex(codes, ages, 3)
+    T = time.perf_counter()
+    for code in range(3):
+        np.flatnonzero((codes == code) & (ages >= 95) & (ages < 98))
+    mask_time = time.perf_counter() - T
+    T = time.perf_counter()
+    for code in range(3):
+        index.select(code, (95, 98))
+    index_time = time.perf_counter() - T
+    print(f"  人口 {size:,}: 掩码 {mask_time * 1e3:.2f}ms，索引 {index_time * 1e3:.2f}ms")
+print(f"{'✓' if index_time < mask_time else '✗'} 索引筛选更快（耗时只与选中的人数有关）")
@@ -0,0 +1,110 @@
+'''
+测试并行校准
+用已知参数生成"观测数据"，验证校准能找回接近的参数、剪枝生效、检查点可以恢复
+'''
+import os
+import tempfile
+import numpy as np
+import covasim as cv
+import Enums
+import Calibration
+import ContactNetwork
+
+layer_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 8,
+        'beta': 0.3,
+        'age_range': None,
+    }
+}
+countries_config = {'A': 0.6, 'B': 0.4}
+sim_pars = {'pop_infected': 20, 'n_days': 40}
+pop_size = 2000
+
+print("="*60)
+print("测试1: 用真实参数生成观测数据")
+print("="*60)
+true_params = {'beta': 0.02, 'layer:random_layer:n_contacts': 8}
+truth = Calibration.Calibration(pop_size, layer_config, countries_config, sim_pars,
+                                data={'cum_infections': np.zeros(41)},
+                                parameter_space={'beta': (0.005, 0.05), 'layer:random_layer:n_contacts': (2, 16, 'int')})
+layer, countries, pars, _ = truth.apply_params(true_params)
+popdict = truth.get_population(layer, countries)
+sim = cv.Sim(pars=dict(pars, pop_size=pop_size, rand_seed=100, verbose=0))
+sim.popdict = popdict
+sim.reset_layer_pars()
+sim.run()
+data = {'cum_infections': sim.results['cum_infections'].values}
+print(f"  观测数据最终感染数: {data['cum_infections'][-1]:.0f}")
+
+print("\n" + "="*60)
+print("测试2: 参数映射（层参数、国家比例、分组因子）")
+print("="*60)
+space = {
+    'beta': (0.005, 0.05),
+    'layer:random_layer:n_contacts': (2, 16, 'int'),
+    'country:A': (0.3, 0.9),
+    'rel_sus:country=B': (0.5, 2.0),
+}
+cal = Calibration.Calibration(pop_size, layer_config, countries_config, sim_pars, data, space)
+layer, countries, pars, factors = cal.apply_params({'beta': 0.03, 'layer:random_layer:n_contacts': 5,
+                                                    'country:A': 0.7, 'rel_sus:country=B': 1.5})
+print(f"{'✓' if layer['random_layer']['n_contacts'] == 5 and layer_config['random_layer']['n_contacts'] == 8 else '✗'} 层参数被修改且基础配置不变")
+print(f"{'✓' if np.isclose(countries['A'], 0.7) and np.isclose(countries['B'], 0.3) else '✗'} 国家比例: {countries}")
+print(f"{'✓' if pars['beta'] == 0.03 and factors == [('rel_sus', 'country', 'B', 1.5)] else '✗'} sim 参数和分组因子")
+z = cal.encode({'beta': 0.03, 'layer:random_layer:n_contacts': 5, 'country:A': 0.7, 'rel_sus:country=B': 1.5})
+print(f"{'✓' if cal.decode(z)['layer:random_layer:n_contacts'] == 5 else '✗'} 编码/解码往返一致，整数参数保持整数")
+ContactNetwork.attach_custom_attributes(sim.people, popdict)
+mask = ContactNetwork.attribute_mask(sim.people, 'sex', '1')  # sex 是浮点数组，'1' 按数值匹配
+print(f"{'✓' if np.array_equal(mask, sim.people.sex == 1) and mask.any() else '✗'} 数值属性按该属性的类型比较: sex=1 共 {mask.sum()} 人")
+for label, (attr, value) in [('没有人匹配', ('country', 'C')), ('类型不符', ('age', 'old'))]:
+    try:
+        ContactNetwork.attribute_mask(sim.people, attr, value)
+        print(f"✗ {label}: 没有报错")
+    except ValueError as e:
+        print(f"✓ {label}: {e}")
+
+print("\n" + "="*60)
+print("测试3: 并行校准 beta 和 n_contacts，带剪枝与检查点")
+print("="*60)
+checkpoint_file = os.path.join(tempfile.mkdtemp(), 'calibration.pkl')
+cal = Calibration.Calibration(pop_size, layer_config, countries_config, sim_pars, data,
+                              parameter_space={'beta': (0.005, 0.05), 'layer:random_layer:n_contacts': (2, 16, 'int')},
+                              prune_day=15, prune_factor=3.0)
+output = cal.run(n_generations=3, popsize=8, n_cpus=4, checkpoint_file=checkpoint_file)
+best = output['best_params']
+print(f"  最优参数: {best}，误差 {output['best_loss']:.4f}")
+effective = best['beta'] * best['layer:random_layer:n_contacts']
+true_effective = true_params['beta'] * true_params['layer:random_layer:n_contacts']
+print(f"{'✓' if abs(effective - true_effective) / true_effective < 0.5 else '✗'} beta × n_contacts 接近真实值 ({effective:.3f} vs {true_effective:.3f})")
+n_pruned = sum(h['pruned'] for h in output['history'])
+print(f"  剪枝候选数: {n_pruned}/{len(output['history'])}")
+print(f"{'✓' if len(output['history']) == 24 else '✗'} 记录了全部 24 次评估")
+with_check = cal.evaluate(true_params, seed=5, prune_threshold=np.inf)
+cal.prune_day = None
+without_check = cal.evaluate(true_params, seed=5)
+cal.prune_day = 15
+ok = not with_check['pruned'] and with_check['partial_loss'] is not None and with_check['loss'] == without_check['loss']
+print(f"{'✓' if ok else '✗'} 通过剪枝检查的候选与不剪枝时误差相同: {with_check['loss']:.4f} / {without_check['loss']:.4f}")
+
+print("\n" + "="*60)
+print("测试4: 从检查点恢复并继续运行")
+print("="*60)
+resumed = Calibration.Calibration(pop_size, layer_config, countries_config, sim_pars, data,
+                                  parameter_space={'beta': (0.005, 0.05), 'layer:random_layer:n_contacts': (2, 16, 'int')},
+                                  prune_day=15, prune_factor=3.0)
+output2 = resumed.run(n_generations=4, popsize=8, n_cpus=4, checkpoint_file=checkpoint_file)
+print(f"{'✓' if len(output2['history']) == 32 else '✗'} 恢复后只运行了剩余 1 代（共 {len(output2['history'])} 次评估）")
+print(f"{'✓' if output2['best_loss'] <= output['best_loss'] else '✗'} 最优误差没有变差")
+
+print("\n" + "="*60)
+print("测试5: 运行中的结果只缩放 Covasim 会缩放的键")
+print("="*60)
+sim = cv.Sim(pop_size=pop_size, pop_infected=20, n_days=40, pop_scale=10, rescale=False, rand_seed=1, verbose=0)
+sim.run(until=30)
+partial = {key: Calibration.partial_result(sim, key) for key in ['n_infectious', 'new_infections', 'cum_infections', 'pop_nabs']}
+sim.run()
+for key, values in partial.items():
+    final = sim.results[key].values[:len(values)]
+    print(f"{'✓' if np.allclose(values, final) else '✗'} {key}（scale={sim.results[key].scale}）与 finalize 后的结果一致")
@@ -0,0 +1,91 @@
+'''
+测试家庭/学校/工作场所聚类层的批量生成
+验证国家隔离、簇内全连接、按年龄段分簇以及簇大小分布
+'''
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+
+# 创建自定义人口配置
+custom_config = {
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'cluster_size': 3.0,
+        'beta': 0.3,
+        'age_range': None,
+    },
+    'school': {
+        'network_type': Enums.NetWorkType.school.name,
+        'cluster_size': 20,
+        'beta': 0.3,
+        'age_range': (6, 18),
+    },
+    'work': {
+        'network_type': Enums.NetWorkType.workplace.name,
+        'size_distribution': {5: 0.5, 10: 0.3, 20: 0.2},
+        'beta': 0.3,
+        'age_range': (18, 65),
+    },
+}
+
+# 定义国家配置（A 使用含儿童的年龄金字塔）
+countries_config = {
+    'A': {'proportion': 0.6, 'age_pyramid': {'bins': [0, 6, 18, 65, 90], 'weights': [0.08, 0.17, 0.6, 0.15]}},
+    'B': {'proportion': 0.4, 'age_pyramid': {'bins': [0, 6, 18, 65, 90], 'weights': [0.1, 0.2, 0.55, 0.15]}},
+}
+
+pop_size = 5000
+custom_popdict, custom_keys = ContactNetwork.create_custom_population(pop_size, custom_config, countries_config)
+countries = custom_popdict['country']
+ages = custom_popdict['age']
+
+for layer_name in custom_keys:
+    print("="*60)
+    print(f"测试层: {layer_name}")
+    print("="*60)
+    layer = custom_popdict['contacts'][layer_name]
+    cluster_ids = custom_popdict['clusters'][layer_name]
+    p1, p2 = layer['p1'], layer['p2']
+    
+    # 1. 不存在跨国家连接和自环
+    n_cross = np.sum(countries[p1] != countries[p2])
+    n_self = np.sum(p1 == p2)
+    print(f"{'✓' if n_cross == 0 and n_self == 0 else '✗'} 总边数: {len(p1)}, 跨 Country 连接: {n_cross}, 自环: {n_self}")
+    
+    # 2. 每条边的两端都在同一个簇内，且每个簇都是完全图（边数 = k(k-1)/2）
+    same_cluster = np.all(cluster_ids[p1] == cluster_ids[p2])
+    sizes = np.bincount(cluster_ids[cluster_ids >= 0])
+    expected_edges = int(np.sum(sizes * (sizes - 1) // 2))
+    ok = same_cluster and expected_edges == len(p1)
+    print(f"{'✓' if ok else '✗'} 簇内全连接: 期望边数 {expected_edges}, 实际边数 {len(p1)}")
+    
+    # 3. 年龄范围过滤
+    config = custom_config[layer_name]
+    members = np.flatnonzero(cluster_ids >= 0)
+    if config['age_range'] is not None:
+        min_age, max_age = config['age_range']
+        in_range = np.all((ages[members] >= min_age) & (ages[members] < max_age))
+        print(f"{'✓' if in_range else '✗'} 所有成员年龄都在 [{min_age}, {max_age}) 内, 成员数: {len(members)}")
+    print(f"  簇数量: {len(sizes)}, 平均簇大小: {sizes.mean():.2f}")
+
+print("\n" + "="*60)
+print("测试学校按年级（1岁一档）分班:")
+print("="*60)
+school = custom_popdict['contacts']['school']
+same_year = np.all(np.floor(ages[school['p1']]) == np.floor(ages[school['p2']]))
+print(f"{'✓' if same_year else '✗'} 同班同学属于同一年龄段")
+
+print("\n" + "="*60)
+print("测试在 Covasim 中运行:")
+print("="*60)
+sim = cv.Sim(pop_size=pop_size, n_days=20, verbose=0)
+sim.popdict = custom_popdict
+sim.reset_layer_pars()
+sim.initialize()
+sim.run()
+print(f"✓ 模拟完成, 层键: {sim.layer_keys()}, 最终感染数: {sim.results['cum_infections'][-1]}")
+
+print("\n" + "="*60)
+print("所有测试完成！")
+print("="*60)
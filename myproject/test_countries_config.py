@@ -126,6 +126,42 @@ try:
 except Exception as e:
     print(f"✗ 失败: {e}")
 
+print("\n" + "="*60)
+print("测试9: 按国家设置年龄金字塔和性别比例")
+print("="*60)
+try:
+    countries_config = {
+        'A': {
+            'proportion': 0.5,
+            'age_pyramid': {'bins': [0, 15, 65, 100], 'weights': [0.3, 0.6, 0.1]},
+            'sex_ratio': 0.6,
+        },
+        'B': 0.5,  # 旧格式：默认 18-65 岁均匀分布
+    }
+    popdict, keys = ContactNetwork.create_custom_population(20000, layer_config, countries_config)
+    ages, sexes, countries = popdict['age'], popdict['sex'], popdict['country']
+    ages_A, ages_B = ages[countries == 'A'], ages[countries == 'B']
+    child_frac = np.mean(ages_A < 15)
+    male_frac = np.mean(sexes[countries == 'A'])
+    ok = (abs(child_frac - 0.3) < 0.02 and abs(male_frac - 0.6) < 0.02
+          and ages_B.min() >= 18 and ages_B.max() < 65 and ages_A.max() < 100)
+    print(f"{'✓' if ok else '✗'} A: <15岁占比 {child_frac:.3f} (期望 0.3), 男性占比 {male_frac:.3f} (期望 0.6)")
+    print(f"  B: 年龄范围 [{ages_B.min():.1f}, {ages_B.max():.1f}] (期望 [18, 65))")
+except Exception as e:
+    print(f"✗ 失败: {e}")
+
+print("\n" + "="*60)
+print("测试10: 错误情况 - 年龄金字塔 bins 与 weights 长度不匹配")
+print("="*60)
+try:
+    countries_config = {'A': {'proportion': 1.0, 'age_pyramid': {'bins': [0, 50, 100], 'weights': [1.0]}}}
+    popdict, keys = ContactNetwork.create_custom_population(100, layer_config, countries_config)
+    print(f"✗ 应该报错但没有报错")
+except ValueError as e:
+    print(f"✓ 正确捕获错误: {e}")
+except Exception as e:
+    print(f"✗ 捕获了错误但类型不对: {type(e).__name__}: {e}")
+
 print("\n" + "="*60)
 print("所有测试完成！")
 print("="*60)
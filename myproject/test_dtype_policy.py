@@ -0,0 +1,129 @@
+'''
+测试 popdict 的类型策略和按人参数的原地修改
+验证 compact 策略下数组类型和每人内存、与默认策略的模拟结果相同，以及 rel_sus/rel_trans 原地修改时保持类型
+'''
+import tracemalloc
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import EventLog
+import PopulationPlanner
+import Stratification
+
+layer_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 8,
+        'beta': 0.3,
+        'age_range': None,
+    },
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'beta': 0.5,
+    },
+}
+countries_config = {'Germany': 0.5, 'France': 0.3, 'Poland': 0.2}
+pop_size = 20000
+
+def build(policy):
+    cv.set_seed(1)
+    return ContactNetwork.create_custom_population(pop_size, layer_config, countries_config, dtype_policy=policy)[0]
+
+def agent_bytes(popdict):
+    arrays = [popdict[key] for key in ['uid', 'age', 'sex', 'country', 'country_code'] if key in popdict]
+    arrays += list(popdict['clusters'].values())
+    return sum(arr.nbytes for arr in arrays) / pop_size
+
+print("="*60)
+print("测试1: 数组类型和每人内存")
+print("="*60)
+default = build('default')
+compact = build('compact')
+print(f"  default: " + ", ".join(f"{key}={default[key].dtype}" for key in ['uid', 'age', 'sex']))
+print(f"  compact: " + ", ".join(f"{key}={compact[key].dtype}" for key in ['uid', 'age', 'sex', 'country_code']))
+ok = (compact['age'].dtype == np.float32 and compact['sex'].dtype == np.int8 and compact['uid'].dtype == np.int32
+      and compact['country_code'].dtype == np.int8 and compact['clusters']['home'].dtype == np.int32
+      and all(compact['contacts'][key]['p1'].dtype == np.int32 for key in layer_config))
+print(f"{'✓' if ok else '✗'} compact 策略的类型正确")
+print(f"{'✓' if agent_bytes(compact) < agent_bytes(default) else '✗'} 每人内存: default {agent_bytes(default):.0f}B，compact {agent_bytes(compact):.0f}B")
+same = (np.array_equal(compact['age'], default['age'].astype(np.float32)) and np.array_equal(compact['sex'], default['sex'])
+        and np.array_equal(np.array(compact['country_names'])[compact['country_code']], default['country']))
+print(f"{'✓' if same else '✗'} 相同种子下属性值一致，country_code 与 default 的 country 对应")
+print(f"{'✓' if 'country' not in compact and 'country_code' not in default else '✗'} compact 不保存国家名字符串数组")
+# compact 策略不生成按人的国家名数组：构建峰值与国家名的长度无关
+peaks = {}
+for length in [1, 10]:
+    long_names = {name * length: share for name, share in countries_config.items()}
+    cv.set_seed(1)
+    tracemalloc.start()
+    ContactNetwork.create_custom_population(50000, layer_config, long_names, dtype_policy='compact')
+    peaks[length] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+name_bytes = 50000 * np.dtype(f"U{10 * max(len(c) for c in countries_config)}").itemsize
+print(f"{'✓' if abs(peaks[10] - peaks[1]) < 0.1 * name_bytes else '✗'} compact 的构建峰值与国家名长度无关: "
+      f"{peaks[1] / 2**20:.1f}MB / {peaks[10] / 2**20:.1f}MB（国家名数组会占 {name_bytes / 2**20:.1f}MB）")
+both = build({'country_code': np.int8})
+print(f"{'✓' if 'country' in both and 'country_code' in both else '✗'} 字典策略可以同时保存两者")
+
+print("\n" + "="*60)
+print("测试2: 两种策略的模拟结果相同")
+print("="*60)
+def run(popdict):
+    sim = cv.Sim(pop_size=pop_size, pop_infected=20, n_days=60, rand_seed=1, verbose=0)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    sim.run()
+    return sim
+sim_default, sim_compact = run(default), run(compact)
+same = np.array_equal(sim_default.results['cum_infections'].values, sim_compact.results['cum_infections'].values)
+print(f"{'✓' if same else '✗'} 累计感染相同: {sim_compact.results['cum_infections'][-1]:.0f}")
+print(f"{'✓' if hasattr(sim_compact.people, 'country_code') and sim_compact.people.country_names == list(countries_config) else '✗'} "
+      f"country_code 和 country_names 挂载到 sim.people")
+mask_ok = all(np.array_equal(ContactNetwork.attribute_mask(sim_compact.people, 'country', c), default['country'] == c)
+              for c in countries_config)
+print(f"{'✓' if mask_ok else '✗'} 按国家筛选（attribute_mask）在两种策略下相同")
+
+def run_with_analyzers(popdict):
+    sim = cv.Sim(pop_size=pop_size, pop_infected=20, n_days=60, rand_seed=1, verbose=0,
+                 analyzers=[Stratification.StratifiedResults(by=['country']), EventLog.EventLog()])
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    sim.run()
+    strat = sim.get_analyzer(Stratification.StratifiedResults).by_group('country', 'cum_infections')
+    events = sim.get_analyzer(EventLog.EventLog).events
+    return {c: v[-1] for c, v in strat.items()}, np.array(events['countries'])[events['country']]
+(strat_default, events_default), (strat_compact, events_compact) = run_with_analyzers(default), run_with_analyzers(compact)
+print(f"{'✓' if strat_default == strat_compact else '✗'} 分国家统计相同: {strat_compact}")
+print(f"{'✓' if np.array_equal(events_default, events_compact) else '✗'} 事件日志中的国家相同（{len(events_compact)} 条事件）")
+
+print("\n" + "="*60)
+print("测试3: 原地修改按人参数")
+print("="*60)
+sim = cv.Sim(pop_size=pop_size, verbose=0)
+sim.popdict = compact
+sim.reset_layer_pars()
+sim.initialize()
+rel_sus = sim.people.rel_sus
+ContactNetwork.set_agent_values(sim.people, 'rel_sus', np.random.uniform(0.5, 1.5, pop_size))
+ContactNetwork.scale_agent_values(sim.people, 'rel_sus', 2.0, sim.people.age >= 50)
+ContactNetwork.scale_agent_values(sim.people, 'rel_trans', 0.5)
+ok = sim.people.rel_sus is rel_sus and rel_sus.dtype == np.float32 and sim.people.rel_trans.dtype == np.float32
+print(f"{'✓' if ok else '✗'} 修改后仍是原来的 float32 数组，50 岁以上易感性均值 {rel_sus[sim.people.age >= 50].mean():.2f}")
+
+print("\n" + "="*60)
+print("测试4: 预估与错误处理")
+print("="*60)
+plan = PopulationPlanner.plan_population(pop_size, layer_config, countries_config, dtype_policy='compact')
+print(f"{'✓' if abs(plan['memory']['popdict'] / pop_size - agent_bytes(compact)) < 0.5 else '✗'} "
+      f"预估每人 {plan['memory']['popdict'] / pop_size:.0f}B，实际 {agent_bytes(compact):.0f}B")
+for policy in ['tiny', {'weight': np.float16}, {'country': None}]:
+    try:
+        ContactNetwork.resolve_dtype_policy(policy)
+        print(f"✗ {policy}: 没有报错")
+    except ValueError as e:
+        print(f"✓ {e}")
@@ -0,0 +1,100 @@
+'''
+测试提前结束与剩余结果推算
+验证灭绝时提前结束的结果与完整运行完全相同、饱和时的推算与"停止传播"的完整运行一致
+'''
+import time
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import EarlyTermination
+import ReplicateRunner
+
+countries_config = {'A': 0.5, 'B': 0.5}
+pop_size = 5000
+
+def make_sim(popdict, seed, **kwargs):
+    sim = cv.Sim(pop_size=pop_size, rand_seed=seed, verbose=0, **kwargs)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    return sim
+
+# 抗体水平在停止后保持不变，不参与比较；n_susceptible 等由 finalize 重新计算
+skip_keys = {'pop_nabs', 'pop_protection', 'pop_symp_protection'}
+
+def differences(sim1, sim2):
+    diffs = [key for key in sim1.result_keys() if key not in skip_keys
+             and not np.allclose(sim1.results[key].values, sim2.results[key].values, equal_nan=True)]
+    diffs += [key for key in sim1.result_keys('variant')
+              if not np.allclose(sim1.results['variant'][key].values, sim2.results['variant'][key].values, equal_nan=True)]
+    return diffs
+
+print("="*60)
+print("测试1: 小规模初始感染，灭绝后提前结束")
+print("="*60)
+sparse_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 3,
+        'beta': 0.3,
+        'age_range': None,
+    }
+}
+sparse_popdict, _ = ContactNetwork.create_custom_population(pop_size, sparse_config, countries_config)
+all_equal = True
+time_full, time_early = 0, 0
+for seed in range(1, 6):
+    full = make_sim(sparse_popdict, seed, pop_infected=5, n_days=200)
+    T = time.time()
+    full.run()
+    time_full += time.time() - T
+
+    early = make_sim(sparse_popdict, seed, pop_infected=5, n_days=200)
+    T = time.time()
+    EarlyTermination.run_with_early_stop(early)
+    time_early += time.time() - T
+    diffs = differences(full, early)
+    all_equal &= not diffs
+    print(f"  种子 {seed}: 第 {early.early_stop['day']} 天停止（{early.early_stop['reason']}），不一致的结果: {diffs}")
+print(f"{'✓' if all_equal else '✗'} 提前结束的结果与完整运行完全相同")
+print(f"  完整运行 {time_full:.2f}s，提前结束 {time_early:.2f}s")
+
+print("\n" + "="*60)
+print("测试2: 按国家饱和停止，推算与停止传播后的完整运行一致")
+print("="*60)
+dense_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 10,
+        'beta': 0.3,
+        'age_range': None,
+    }
+}
+dense_popdict, _ = ContactNetwork.create_custom_population(pop_size, dense_config, countries_config)
+# 参照：第30天起 beta 变为 0，之后只有已感染者完成病程
+reference = make_sim(dense_popdict, 1, pop_infected=50, n_days=120, interventions=cv.change_beta(days=30, changes=0.0))
+reference.run()
+rule = EarlyTermination.EarlyStop(min_day=30, saturation=0.0, by_country=True)
+projected = EarlyTermination.run_with_early_stop(make_sim(dense_popdict, 1, pop_infected=50, n_days=120), rule)
+print(f"  第 {rule.day} 天停止（{rule.reason}），停止时仍有 {projected.results['n_exposed'][30]:.0f} 人处于感染状态")
+diffs = differences(reference, projected)
+print(f"{'✓' if not diffs else '✗'} 推算的流量和存量与完整运行一致，不一致的结果: {diffs}")
+
+print("\n" + "="*60)
+print("测试3: 有输入病例时不停止")
+print("="*60)
+imported = make_sim(sparse_popdict, 1, pop_infected=5, n_days=60, n_imports=1)
+EarlyTermination.run_with_early_stop(imported)
+print(f"{'✓' if imported.early_stop['day'] is None and imported.complete else '✗'} 运行到最后一天")
+
+print("\n" + "="*60)
+print("测试4: 批量重复运行中使用提前结束")
+print("="*60)
+pars = {'pop_size': pop_size, 'pop_infected': 5, 'n_days': 200}
+plain = ReplicateRunner.run_replicates(pars, sparse_popdict, n_runs=6, n_cpus=2)
+stopped = ReplicateRunner.run_replicates(pars, sparse_popdict, n_runs=6, n_cpus=2,
+                                         early_stop=EarlyTermination.EarlyStop(check_every=5))
+same = all(np.array_equal(plain['raw'][key], stopped['raw'][key]) for key in ReplicateRunner.DEFAULT_RESULT_KEYS)
+print(f"{'✓' if same else '✗'} 提前结束不改变批量运行的结果")
@@ -0,0 +1,52 @@
+'''
+测试层边的去重压缩（compact_edges）
+验证重复边/双向边/自环被合并，beta 按重复次数累加，且压缩不引入跨 country 连接
+'''
+import numpy as np
+import Enums
+import ContactNetwork
+
+print("="*60)
+print("测试1: 手工构造的边列表")
+print("="*60)
+p1 = np.array([0, 1, 2, 2, 3, 5])
+p2 = np.array([1, 0, 3, 3, 3, 4])
+contacts, stats = ContactNetwork.compact_layer_edges(p1, p2)
+pairs = list(zip(contacts['p1'].tolist(), contacts['p2'].tolist()))
+ok = pairs == [(0, 1), (2, 3), (4, 5)] and contacts['beta'].tolist() == [2.0, 2.0, 1.0]
+print(f"{'✓' if ok else '✗'} 压缩后的边: {pairs}, beta: {contacts['beta'].tolist()}")
+print(f"  统计: {stats}")
+
+print("\n" + "="*60)
+print("测试2: 随机网络开启 compact_edges")
+print("="*60)
+layer_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 20,
+        'beta': 0.3,
+        'age_range': None,
+    },
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'cluster_size': 4.0,
+        'beta': 0.3,
+        'compact': False,  # 聚类层本身没有重复边，可以单独关闭
+    },
+}
+countries_config = {'A': 0.6, 'B': 0.4}
+popdict, keys = ContactNetwork.create_custom_population(300, layer_config, countries_config, compact_edges=True)
+layer = popdict['contacts']['random_layer']
+stats = popdict['edge_stats']['random_layer']
+countries = popdict['country']
+keys_packed = layer['p1'].astype(np.int64) * 300 + layer['p2']
+ok = (np.all(layer['p1'] < layer['p2']) and len(np.unique(keys_packed)) == len(layer)
+      and np.isclose(layer['beta'].sum(), stats['n_before'] - stats['n_self_loops'])
+      and np.all(countries[layer['p1']] == countries[layer['p2']]))
+print(f"{'✓' if ok else '✗'} 压缩前 {stats['n_before']} 条边, 压缩后 {stats['n_after']} 条边 (减少 {stats['reduction']:.1%})")
+print(f"  自环: {stats['n_self_loops']}, 重复边: {stats['n_duplicates']}")
+print(f"{'✓' if 'home' not in popdict['edge_stats'] else '✗'} 单层 'compact': False 覆盖了函数参数")
+
+print("\n" + "="*60)
+print("所有测试完成！")
+print("="*60)
@@ -0,0 +1,157 @@
+'''
+测试事件日志
+验证各类事件数与 sim.results 一致、感染记录与 infection_log 一致、保存后读回不变且比每天快照小得多、
+离线重建的传播树，以及每步的开销只与新增事件数有关
+'''
+import os
+import tempfile
+import time
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import EventLog
+import PopulationGrowth
+
+layer_config = {
+    'community': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 8,
+        'beta': 0.3,
+        'age_range': None,
+    },
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'beta': 0.5,
+    },
+}
+countries_config = {'A': 0.6, 'B': 0.4}
+pop_size = 20000
+popdict, _ = ContactNetwork.create_custom_population(pop_size, layer_config, countries_config)
+
+def make_sim(analyzers, interventions=None, **kwargs):
+    pars = dict(pop_size=pop_size, pop_infected=20, n_days=90, rand_seed=1, verbose=0)
+    pars.update(kwargs)
+    sim = cv.Sim(pars, analyzers=analyzers, interventions=interventions)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    return sim
+
+print("="*60)
+print("测试1: 事件数与 sim.results 一致")
+print("="*60)
+sim = make_sim(EventLog.EventLog(capacity=100), cv.test_prob(symp_prob=0.2, asymp_prob=0.01))
+sim.run()
+log = sim.get_analyzer(EventLog.EventLog)
+events = log.events
+for event, result_key in [('infection', 'cum_infections'), ('symptomatic', 'cum_symptomatic'),
+                          ('diagnosis', 'cum_diagnoses'), ('death', 'cum_deaths')]:
+    n = len(EventLog.select(events, event))
+    expected = sim.results[result_key][-1]
+    print(f"{'✓' if n == expected else '✗'} {event}: {n} 条事件，{result_key} = {expected:.0f}")
+print(f"  缓冲区扩展 {log.columns['event'].n_reallocations} 次，容量 {log.columns['event'].capacity:,}")
+
+rows = EventLog.select(events, 'infection')
+entries = sim.people.infection_log
+same = (np.array_equal(events['person'][rows], [e['target'] for e in entries])
+        and np.array_equal(events['source'][rows], [-1 if e['source'] is None else e['source'] for e in entries])
+        and [events['layers'][c] for c in events['layer'][rows]] == [e['layer'] for e in entries]
+        and np.array_equal(events['day'][rows], [e['date'] for e in entries]))
+print(f"{'✓' if same else '✗'} 感染事件的感染者、传染源、层和日期与 infection_log 一致（{len(entries)} 条）")
+country = np.array(events['countries'])[events['country']]
+print(f"{'✓' if np.array_equal(country, sim.people.country[events['person']]) else '✗'} 事件的国家与 people.country 一致")
+ok = np.all(np.diff(events['day']) >= 0) and events['day'].max() < sim.npts
+print(f"{'✓' if ok else '✗'} 事件按日期排序，没有超出模拟期的预定事件")
+
+symptomatic = EventLog.select(events, 'symptomatic')
+onset = dict(zip(events['person'][symptomatic], events['day'][symptomatic]))
+infected = dict(zip(events['person'][rows][::-1], events['day'][rows][::-1]))  # 再次感染的人取第一次感染
+print(f"{'✓' if all(onset[p] >= infected[p] for p in onset) else '✗'} 症状出现都不早于感染")
+
+print("\n" + "="*60)
+print("测试2: 保存和读回")
+print("="*60)
+with tempfile.TemporaryDirectory() as tmpdir:
+    path = log.save(os.path.join(tmpdir, 'events.npz'))
+    loaded = EventLog.load_events(path)
+    size = os.path.getsize(path)
+    snapshot_path = os.path.join(tmpdir, 'snapshots.npz')
+    # 对照：每天保存一次状态数组（只保存 4 个布尔数组和 1 个日期数组）的最小快照
+    np.savez_compressed(snapshot_path, **{f'{key}_{t}': sim.people[key] for t in range(sim.npts)
+                                          for key in ['exposed', 'symptomatic', 'diagnosed', 'dead', 'date_exposed']})
+    snapshot_size = os.path.getsize(snapshot_path)
+same = all(np.array_equal(loaded[key], events[key]) and loaded[key].dtype == events[key].dtype
+           for key in ['event', 'day', 'person', 'source', 'layer', 'country', 'variant'])
+same &= all(loaded[key] == events[key] for key in EventLog.NAME_LISTS + ['n_days', 'pop_size'])
+print(f"{'✓' if same else '✗'} 读回的列和类型与内存中相同（{log.n_events} 条事件）")
+print(f"{'✓' if size * 20 < snapshot_size else '✗'} 文件大小 {size / 1e3:.1f}kB，每天快照 {snapshot_size / 1e3:.1f}kB")
+df = EventLog.to_dataframe(loaded)
+print(f"{'✓' if len(df) == log.n_events and set(df['country'].dropna()) == {'A', 'B'} else '✗'} DataFrame: "
+      f"{dict(df['event'].value_counts())}")
+
+print("\n" + "="*60)
+print("测试3: 重建传播树")
+print("="*60)
+tree = EventLog.infection_tree(loaded)
+parent = tree['parent']
+roots = parent < 0
+n_seeds = sum(1 for e in entries if e['source'] is None)
+print(f"{'✓' if roots.sum() == n_seeds == 20 else '✗'} 根节点 {roots.sum()} 个（初始感染 {n_seeds}）")
+day = loaded['day'][tree['rows']]
+person = loaded['person'][tree['rows']]
+ok = np.all(day[~roots] > day[parent[~roots]]) and np.array_equal(person[parent[~roots]], loaded['source'][tree['rows']][~roots])
+print(f"{'✓' if ok else '✗'} 每个父节点是传染源更早的感染")
+print(f"{'✓' if tree['offspring'].sum() == (~roots).sum() else '✗'} 次级病例数之和等于有传染源的感染数 {(~roots).sum()}")
+ok = np.all(tree['generation'][~roots] == tree['generation'][parent[~roots]] + 1)
+print(f"{'✓' if ok else '✗'} 最大代数 {tree['generation'].max()}，平均次级病例数 {tree['offspring'].mean():.2f}，"
+      f"最多 {tree['offspring'].max()}")
+
+print("\n" + "="*60)
+print("测试4: 人口增长和不支持的配置")
+print("="*60)
+arrivals = PopulationGrowth.Arrivals(layer_config, countries_config, rates={'B': 10}, infected={'B': 0.5})
+sim = make_sim(EventLog.EventLog(), arrivals, pop_infected=0, n_days=30)
+sim.run()
+events = sim.get_analyzer(EventLog.EventLog).events
+infections = EventLog.select(events, 'infection')
+imported = infections[events['layer'][infections] == events['layers'].index(PopulationGrowth.ARRIVAL_LAYER)]
+ok = (events['pop_size'] == len(sim.people) > pop_size and len(imported) > 0 and np.all(events['person'][imported] >= pop_size)
+      and np.all(np.array(events['countries'])[events['country'][imported]] == 'B'))
+print(f"{'✓' if ok else '✗'} 新代理的输入感染 {len(imported)} 条，国家都是 B，人口 {events['pop_size']:,}")
+try:
+    make_sim(EventLog.EventLog(), pop_scale=10, rescale=True)
+    print("✗ 动态缩放: 没有报错")
+except ValueError as e:
+    print(f"✓ {e}")
+
+print("\n" + "="*60)
+print("测试5: 开启检测时每步开销与人口规模无关")
+print("="*60)
+scanned = []
+def scan_diagnoses(sim):
+    '''对照：每天扫描整个人口的 date_diagnosed'''
+    scanned.extend((p, sim.t) for p in np.flatnonzero(sim.people.date_diagnosed == sim.t))
+timings = {}
+for n in [20000, 200000]:
+    scanned.clear()
+    testing = cv.test_prob(symp_prob=0.2, asymp_prob=0.01, test_delay=2)
+    sim = cv.Sim(pop_size=n, pop_infected=10, n_days=30, rand_seed=1, verbose=0, interventions=testing,
+                 analyzers=[EventLog.EventLog(), scan_diagnoses])
+    sim.initialize()
+    log = sim.get_analyzer(EventLog.EventLog)
+    apply = log.apply
+    elapsed = []
+    def timed(sim):
+        T = time.perf_counter()
+        apply(sim)
+        elapsed.append(time.perf_counter() - T)
+    log.apply = timed
+    sim.run()
+    timings[n] = np.median(elapsed[1:])
+    rows = EventLog.select(log.events, 'diagnosis')
+    same = sorted(zip(log.events['person'][rows].tolist(), log.events['day'][rows].tolist())) == sorted(scanned)
+    print(f"{'✓' if same and len(rows) > 0 else '✗'} 人口 {n:,}: 共 {log.n_events} 条事件（诊断 {len(rows)} 条，与扫描整个人口相同），"
+          f"每步 {timings[n] * 1e6:.0f}µs")
+print(f"{'✓' if timings[200000] < 3 * timings[20000] else '✗'} 人口增加 10 倍，每步耗时增加 {timings[200000] / timings[20000]:.1f} 倍")
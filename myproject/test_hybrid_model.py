@@ -0,0 +1,137 @@
+'''
+测试混合模式（仓室国家 + 代理国家）
+验证仓室模型的最终规模符合 SEIR 的最终规模方程、两个方向的耦合都能传播、没有耦合时互不影响，
+以及与全部使用代理相比的耗时
+'''
+import time
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import HybridModel
+
+layer_config = {
+    'community': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 8,
+        'beta': 0.3,
+        'age_range': None,
+    },
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'beta': 0.5,
+    },
+}
+countries_config = {
+    'China': 0.95,
+    'Myanmar': {'proportion': 0.05, 'age_pyramid': {'bins': [0, 18, 65, 100], 'weights': [0.3, 0.6, 0.1]}},
+}
+total_population = 2e6
+
+print("="*60)
+print("测试1: 仓室模型")
+print("="*60)
+beta, infectious_days = 0.3, 8.0
+model = HybridModel.SEIRCompartments({'X': 1e6}, beta, infectious_days=infectious_days, stochastic=False)
+model.seed({'X': 10})
+for _ in range(600):
+    model.step()
+r0 = beta / model.gamma  # 离散时间下每个传染者平均传染 beta × (1 / 每天恢复的概率) 人
+z = 0.5
+for _ in range(200):
+    z = 1 - np.exp(-r0 * z)
+attack = (model.R[0] + model.D[0]) / model.N[0]
+print(f"{'✓' if abs(attack - z) < 0.005 else '✗'} 确定性模型最终规模 {attack:.4f}，最终规模方程 {z:.4f}（R0={r0:.2f}）")
+
+populations = {f'C{i}': 1e7 for i in range(20)}
+model = HybridModel.SEIRCompartments(populations, beta, infectious_days=infectious_days)
+model.seed({c: 100 for c in populations})
+T = time.perf_counter()
+for _ in range(365):
+    model.step()
+elapsed = time.perf_counter() - T
+attacks = (model.R + model.D) / model.N
+print(f"{'✓' if np.all(np.abs(attacks - z) < 0.01) else '✗'} 随机模型 20 国最终规模 {attacks.min():.4f}–{attacks.max():.4f}")
+print(f"{'✓' if elapsed < 1 else '✗'} 20 国 × 365 天耗时 {elapsed * 1e3:.1f}ms")
+
+print("\n" + "="*60)
+print("测试2: 拆分方案")
+print("="*60)
+plan = HybridModel.plan_hybrid(countries_config, total_population, ['China'], pop_size=10000)
+ok = (plan['countries_config']['Myanmar']['proportion'] == 1.0 and plan['compartments'] == {'China': 0.95 * total_population}
+      and abs(plan['pop_scale'] - 0.05 * total_population / 10000) < 1e-9)
+print(f"{'✓' if ok else '✗'} 代理国家 {list(plan['countries_config'])}，仓室国家 {plan['compartments']}，pop_scale {plan['pop_scale']:.1f}")
+for args in [(['Thailand'], 10000), (['China', 'Myanmar'], 10000), (['China'], 1000000)]:
+    try:
+        HybridModel.plan_hybrid(countries_config, total_population, *args)
+        print(f"✗ {args}: 没有报错")
+    except ValueError as e:
+        print(f"✓ {e}")
+
+popdict, _ = ContactNetwork.create_custom_population(plan['pop_size'], layer_config, plan['countries_config'])
+
+def run_hybrid(coupling, pop_infected=0, n_days=120, **kwargs):
+    pars = HybridModel.make_hybrid_pars(dict(pop_infected=pop_infected, n_days=n_days, rand_seed=1, verbose=0, **kwargs), plan)
+    sim = cv.Sim(pars, interventions=coupling)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    sim.run()
+    return sim, sim.get_intervention(HybridModel.HybridCoupling)
+
+print("\n" + "="*60)
+print("测试3: 仓室国家 → 代理国家")
+print("="*60)
+sim, coupling = run_hybrid(HybridModel.HybridCoupling(plan['compartments'], {'China': {'Myanmar': 0.0}}, initial_infected={'China': 1000}))
+ok = sim.results['cum_infections'][-1] == 0 and coupling.results['new_infections'].sum() > 0
+print(f"{'✓' if ok else '✗'} 没有跨境接触时缅甸感染 {sim.results['cum_infections'][-1]:.0f}，中国感染 {coupling.results['new_infections'].sum():.0f}")
+sim, coupling = run_hybrid(HybridModel.HybridCoupling(plan['compartments'], {'China': {'Myanmar': 0.5}}, initial_infected={'China': 1000}))
+imports = coupling.results['agent_imports'].sum()
+from_log = sum(1 for entry in sim.people.infection_log if entry['layer'] == HybridModel.IMPORT_LAYER)
+print(f"{'✓' if imports > 0 and imports == from_log else '✗'} 跨境接触 0.5 时缅甸输入感染 {imports:.0f} 个代理，"
+      f"infection_log 中 {from_log} 条，累计感染 {sim.results['cum_infections'][-1]:.0f}（真实人数）")
+peak_china = coupling.results['I'][:, 0].argmax()
+peak_imports = np.convolve(coupling.results['agent_imports'][:, 0], np.ones(7) / 7, mode='same').argmax()
+print(f"{'✓' if abs(peak_imports - peak_china) <= 15 else '✗'} 输入感染高峰（第 {peak_imports} 天）与中国传染者高峰（第 {peak_china} 天）接近")
+sim, coupling = run_hybrid(HybridModel.HybridCoupling(plan['compartments'], {'China': {'Myanmar': 0.5}}, initial_infected={'China': 1000},
+                                                      variant='delta'), variants=cv.variant('delta', days=0, n_imports=0))
+by_variant = sim.results['variant']['cum_infections_by_variant'].values[:, -1]
+from_log = sum(1 for entry in sim.people.infection_log if entry['layer'] == HybridModel.IMPORT_LAYER)
+ok = by_variant[0] == 0 and by_variant[1] > 0 and coupling.results['agent_imports'].sum() == from_log
+print(f"{'✓' if ok else '✗'} 输入 delta 时缅甸按变异株的累计感染: {by_variant.round().tolist()}，输入感染 {from_log} 个代理")
+try:
+    run_hybrid(HybridModel.HybridCoupling(plan['compartments'], {'China': {'Myanmar': 0.5}}, variant='omicron'))
+    print("✗ 没有报错")
+except ValueError as e:
+    print(f"✓ {e}")
+
+print("\n" + "="*60)
+print("测试4: 代理国家 → 仓室国家")
+print("="*60)
+sim, coupling = run_hybrid(HybridModel.HybridCoupling(plan['compartments'], {'China': {'Myanmar': 0.5}}), pop_infected=20)
+china = coupling.country_results()['China']
+from_agents = coupling.results['imports_from_agents'].sum()
+print(f"{'✓' if china.sum() > 0 and from_agents > 0 else '✗'} 只在缅甸播种，中国感染 {china.sum():.0f}，其中直接来自缅甸 {from_agents:.0f}")
+print(f"{'✓' if coupling.results['agent_imports'].sum() > 0 else '✗'} 中国的疫情再输入缅甸 {coupling.results['agent_imports'].sum():.0f} 个代理")
+sim, coupling = run_hybrid(HybridModel.HybridCoupling(plan['compartments'], {}), pop_infected=20)
+print(f"{'✓' if coupling.results['new_infections'].sum() == 0 else '✗'} 没有跨境接触时中国感染 {coupling.results['new_infections'].sum():.0f}")
+
+print("\n" + "="*60)
+print("测试5: 与全部使用代理的耗时比较（缅甸的代理数相同）")
+print("="*60)
+T = time.perf_counter()
+run_hybrid(HybridModel.HybridCoupling(plan['compartments'], {'China': {'Myanmar': 0.5}}, initial_infected={'China': 1000}))
+hybrid_time = time.perf_counter() - T
+full_size = int(plan['pop_size'] / 0.05)
+T = time.perf_counter()
+full_popdict, _ = ContactNetwork.create_custom_population(full_size, layer_config, countries_config)
+sim = cv.Sim(pop_size=full_size, pop_scale=total_population / full_size, rescale=False, pop_infected=20, n_days=120,
+             rand_seed=1, verbose=0)
+sim.popdict = full_popdict
+sim.reset_layer_pars()
+sim.initialize()
+sim.run()
+full_time = time.perf_counter() - T
+print(f"  混合模式 {plan['pop_size']:,} 个代理: {hybrid_time:.1f}s，全部代理 {full_size:,} 个: {full_time:.1f}s")
+print(f"{'✓' if full_time > 5 * hybrid_time else '✗'} 加速 {full_time / hybrid_time:.1f} 倍")
@@ -0,0 +1,129 @@
+'''
+测试跨国出行
+验证没有出行时结果不变、出行人数符合出行矩阵、接触层在出行期间被正确修改和恢复、
+疫情可以通过出行者传播到其他国家，以及每天的耗时与人口规模无关
+'''
+import time
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import Mobility
+
+layer_config = {
+    'community': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 8,
+        'beta': 0.3,
+        'age_range': None,
+    },
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'beta': 0.5,
+    },
+}
+countries_config = {'A': 0.6, 'B': 0.4}
+pop_size = 20000
+popdict, _ = ContactNetwork.create_custom_population(pop_size, layer_config, countries_config)
+
+def make_sim(popdict, pop_size, mobility=None, **kwargs):
+    sim = cv.Sim(pop_size=pop_size, rand_seed=1, verbose=0, interventions=mobility, **kwargs)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    return sim
+
+print("="*60)
+print("测试1: 出行概率为 0 时结果与不出行相同")
+print("="*60)
+plain = make_sim(popdict, pop_size, pop_infected=20, n_days=60)
+plain.run()
+idle = make_sim(popdict, pop_size, Mobility.CountryMobility({'A': {'B': 0.0}}, layers=['community']), pop_infected=20, n_days=60)
+idle.run()
+same = np.array_equal(plain.results['cum_infections'].values, idle.results['cum_infections'].values)
+print(f"{'✓' if same else '✗'} 累计感染完全相同: {plain.results['cum_infections'][-1]:.0f}")
+
+print("\n" + "="*60)
+print("测试2: 出行人数和接触层修改")
+print("="*60)
+rate, trip_days = 0.002, 5
+mobility = Mobility.CountryMobility({'A': {'B': rate}, 'B': {'A': rate}}, layers=['community', 'home'],
+                                    n_contacts={'community': 8, 'home': 0}, trip_days=trip_days)
+sim = make_sim(popdict, pop_size, mobility, pop_infected=20, n_days=60)
+mobility = sim.get_intervention(Mobility.CountryMobility)
+sim.run(until=40)
+n_a = np.sum(popdict['country'] == 'A')
+expected = rate * n_a * trip_days
+away_ab = mobility.results['travellers'][20:40, 0, 1].mean()
+print(f"{'✓' if abs(away_ab - expected) / expected < 0.15 else '✗'} A 在 B 的平均人数 {away_ab:.1f}，预期约 {expected:.1f}")
+
+away = mobility.away
+ok = True
+for lkey in ['community', 'home']:
+    layer = sim.people.contacts[lkey]
+    n_home = mobility._layers[lkey]['n_edges']
+    p1, p2, beta = layer['p1'][:n_home], layer['p2'][:n_home], layer['beta'][:n_home]
+    suspended = away[p1] | away[p2]
+    ok &= bool(np.all(beta[suspended] == 0) and np.all(beta[~suspended] == 1))
+    used = mobility._layers[lkey]['n_used']
+    v1, v2 = layer['p1'][n_home:n_home + used], layer['p2'][n_home:n_home + used]
+    ok &= bool(np.all(away[v1]) and np.all(~away[v2]) and np.all(mobility.location[v1] == mobility.codes[v2]))
+    print(f"  层 {lkey}: {suspended.sum()} 条本国边暂停，{used} 条目的国接触")
+print(f"{'✓' if ok else '✗'} 在外的人的本国边全部暂停，其余边不变；目的国接触都连向该国在本国的常住人口")
+lengths_ok = all(len(sim.people.contacts[lkey]) == mobility._layers[lkey]['n_edges'] + mobility._layers[lkey]['n_used']
+                 for lkey in ['community', 'home'])
+print(f"{'✓' if lengths_ok else '✗'} 层中只有本国边和今天的目的国接触，没有留下 beta=0 的旧接触")
+
+sim.run()
+mobility._return(sim, sim.npts)  # 让仍在外的人回国
+for day in list(mobility._returns):
+    mobility._return(sim, day)
+restored = all(np.array_equal(sim.people.contacts[lkey]['beta'][:mobility._layers[lkey]['n_edges']],
+                              mobility._layers[lkey]['beta0']) for lkey in ['community', 'home'])
+print(f"{'✓' if restored else '✗'} 所有人回国后本国边全部恢复")
+
+dynamic = cv.Sim(pop_size=pop_size, verbose=0, interventions=Mobility.CountryMobility({'A': {'B': 0.01}}, layers=['community']))
+dynamic.popdict = popdict
+dynamic.reset_layer_pars()
+dynamic['dynam_layer']['community'] = True
+try:
+    dynamic.initialize()
+    print("✗ 动态层: 没有报错")
+except ValueError as e:
+    print(f"✓ {e}")
+
+print("\n" + "="*60)
+print("测试3: 疫情通过出行者传播到其他国家")
+print("="*60)
+def infected_in_b(mobility):
+    sim = make_sim(popdict, pop_size, mobility, pop_infected=0, n_days=80)
+    seeds = np.flatnonzero(sim.people.country == 'A')[:30]
+    sim.people.infect(inds=seeds, layer='seed_infection')
+    sim.run()
+    return np.sum(~sim.people.naive[sim.people.country == 'B'])
+closed = infected_in_b(None)
+opened = infected_in_b(Mobility.CountryMobility({'A': {'B': 0.005}, 'B': {'A': 0.005}}, layers=['community']))
+print(f"{'✓' if closed == 0 and opened > 0 else '✗'} B 国感染人数：不出行 {closed}，出行 {opened}")
+
+print("\n" + "="*60)
+print("测试4: 每天的耗时与人口规模无关（出行人数相同）")
+print("="*60)
+timings = {}
+for size in [20000, 200000]:
+    big_popdict, _ = ContactNetwork.create_custom_population(size, {'community': layer_config['community']}, countries_config)
+    mobility = Mobility.CountryMobility({'A': {'B': 40 / size}, 'B': {'A': 40 / size}}, layers=['community'], trip_days=5)
+    sim = make_sim(big_popdict, size, mobility, pop_infected=10, n_days=30)
+    mobility = sim.get_intervention(Mobility.CountryMobility)
+    sim.run(until=1)  # 第一次调用时建立索引，不计入
+    apply = mobility.apply
+    elapsed = []
+    def timed(sim):
+        T = time.perf_counter()
+        apply(sim)
+        elapsed.append(time.perf_counter() - T)
+    mobility.apply = timed
+    sim.run()
+    timings[size] = np.mean(elapsed)
+    print(f"  人口 {size:,}: 每天 {timings[size] * 1e3:.2f}ms，最后一天在外 {mobility.away.sum()} 人")
+print(f"{'✓' if timings[200000] < 3 * timings[20000] else '✗'} 人口增加 10 倍，每天耗时增加 {timings[200000] / timings[20000]:.1f} 倍")
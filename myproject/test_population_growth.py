@@ -0,0 +1,200 @@
+'''
+测试人口增长和输入
+验证可增长数组的均摊扩展、新代理的属性和接触边符合逐国规则（国家隔离、年龄范围、度数）、
+加入已有家庭、到达时已感染的输入病例，以及没有到达时结果不变
+'''
+import time
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import NetworkEquivalence
+import PopulationGrowth
+
+layer_config = {
+    'community': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 8,
+        'beta': 0.3,
+        'age_range': None,
+    },
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'beta': 0.5,
+    },
+    'work': {
+        'network_type': Enums.NetWorkType.workplace.name,
+        'age_range': [18, 65],
+        'beta': 0.3,
+    },
+    'clubs': {
+        'network_type': Enums.NetWorkType.microstructured.name,
+        'cluster_size': 5,
+        'age_range': [18, 100],
+        'beta': 0.3,
+    },
+}
+countries_config = {
+    'A': {'proportion': 0.6, 'age_pyramid': {'bins': [0, 18, 65, 100], 'weights': [0.2, 0.6, 0.2]}},
+    'B': {'proportion': 0.4, 'age_pyramid': {'bins': [0, 18, 65, 100], 'weights': [0.35, 0.55, 0.1]}},
+}
+pop_size = 20000
+popdict, _ = ContactNetwork.create_custom_population(pop_size, layer_config, countries_config)
+
+def make_sim(arrivals=None, **kwargs):
+    sim = cv.Sim(pop_size=pop_size, rand_seed=1, verbose=0, interventions=arrivals, **kwargs)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    return sim
+
+print("="*60)
+print("测试1: 可增长数组")
+print("="*60)
+arr = PopulationGrowth.GrowableArray(np.arange(10), capacity=10)
+T = time.perf_counter()
+for i in range(100000):
+    arr.extend([i])
+elapsed = time.perf_counter() - T
+ok = np.array_equal(arr.view, np.concatenate([np.arange(10), np.arange(100000)])) and arr.n_reallocations <= 15
+print(f"{'✓' if ok else '✗'} 逐个追加 10 万次，扩展 {arr.n_reallocations} 次，容量 {arr.capacity:,}，耗时 {elapsed:.2f}s")
+arr2d = PopulationGrowth.GrowableArray(np.zeros((2, 5)))
+arr2d.extend(np.ones((2, 3)))
+print(f"{'✓' if arr2d.view.shape == (2, 8) and arr2d.view[:, 5:].all() else '✗'} 二维数组沿最后一个轴追加: {arr2d.view.shape}")
+
+print("\n" + "="*60)
+print("测试2: 新代理的属性和接触边")
+print("="*60)
+sim = make_sim(pop_infected=0, n_days=10)
+population = PopulationGrowth.GrowablePeople(sim.people, layer_config, countries_config, clusters=popdict['clusters'],
+                                             join_clusters=['home'])
+tracked = np.flatnonzero(sim.people.age > 80)  # 追加之前保存的下标
+tracked_ages = sim.people.age[tracked].copy()
+new_inds = population.add_agents({'A': 3000, 'B': 2000})
+people = sim.people
+ok = (len(people) == pop_size + 5000 and sim['pop_size'] == len(people) and np.array_equal(people.uid, np.arange(len(people)))
+      and people.sus_imm.shape == (1, len(people)) and np.array_equal(people.age[tracked], tracked_ages))
+print(f"{'✓' if ok else '✗'} 人口 {pop_size:,} → {len(people):,}，uid 连续，已有代理的下标和属性不变")
+print(f"{'✓' if np.all(people.susceptible[new_inds]) and not np.isnan(people.rel_trans[new_inds]).any() else '✗'} "
+      f"新代理都是易感者，预后参数已按年龄设置")
+fraction_child = [np.mean(people.age[new_inds][people.country[new_inds] == c] < 18) for c in ['A', 'B']]
+print(f"{'✓' if abs(fraction_child[0] - 0.2) < 0.03 and abs(fraction_child[1] - 0.35) < 0.03 else '✗'} "
+      f"未成年比例按各国年龄金字塔: A {fraction_child[0]:.2f}，B {fraction_child[1]:.2f}")
+
+grown = {'country': people.country, 'age': people.age, 'contacts': people.contacts}
+for lkey, config in layer_config.items():
+    stats = NetworkEquivalence.network_statistics(grown, lkey, config)
+    ok = stats['cross_country'] == 0 and stats['outside_age_range'] == 0
+    print(f"{'✓' if ok else '✗'} 层 {lkey}: {stats['n_edges']} 条边，跨国家 {stats['cross_country']}，年龄范围之外 {stats['outside_age_range']}")
+
+degree = np.bincount(np.concatenate([people.contacts['community']['p1'], people.contacts['community']['p2']]), minlength=len(people))
+old_mean, new_mean = degree[:pop_size].mean(), degree[new_inds].mean()
+print(f"{'✓' if abs(new_mean - old_mean) / old_mean < 0.1 else '✗'} random 层平均度数：原有 {old_mean:.2f}，新代理 {new_mean:.2f}")
+
+home = population.clusters['home'].view
+p1, p2 = people.contacts['home']['p1'], people.contacts['home']['p2']
+ok = np.all(home[new_inds] >= 0) and np.all(home[p1] == home[p2])
+sizes = np.bincount(home[home >= 0])
+members = np.bincount(home[p1], minlength=len(sizes)) * 2  # 团内边数 × 2 = size × (size - 1)
+print(f"{'✓' if ok and np.array_equal(members, sizes * (sizes - 1)) else '✗'} 新代理加入已有家庭，每个家庭仍是完全图"
+      f"（平均家庭规模 {np.mean(sizes[sizes > 0]):.2f}）")
+
+print("\n" + "="*60)
+print("测试3: 没有到达时结果不变")
+print("="*60)
+plain = make_sim(pop_infected=20, n_days=60)
+plain.run()
+idle = make_sim(PopulationGrowth.Arrivals(layer_config, countries_config, rates={'A': 0}), pop_infected=20, n_days=60)
+idle.run()
+same = np.array_equal(plain.results['cum_infections'].values, idle.results['cum_infections'].values)
+print(f"{'✓' if same else '✗'} 累计感染完全相同: {plain.results['cum_infections'][-1]:.0f}")
+
+print("\n" + "="*60)
+print("测试4: 出生和输入病例")
+print("="*60)
+births = PopulationGrowth.Arrivals(layer_config, countries_config, rates={'A': 30, 'B': 20}, ages=0,
+                                   clusters=popdict['clusters'], join_clusters=['home'], label='births')
+imports = PopulationGrowth.Arrivals(layer_config, countries_config, rates={'B': 10}, infected={'B': 0.5}, label='imports')
+sim = make_sim([births, imports], pop_infected=0, n_days=60)
+sim.run()
+births, imports = sim.get_intervention('births'), sim.get_intervention('imports')
+n_born = births.results['arrivals'].sum()
+n_imported = imports.results['arrivals'].sum()
+ok = len(sim.people) == pop_size + n_born + n_imported == imports.results['n_agents'][-1]
+print(f"{'✓' if ok else '✗'} 出生 {n_born:.0f}，输入 {n_imported:.0f}，最终人口 {len(sim.people):,}")
+n_age_zero = np.sum(sim.people.age[pop_size:] == 0)
+print(f"{'✓' if n_age_zero == n_born else '✗'} 出生的代理年龄为 0: {n_age_zero}")
+infected_arrivals = imports.results['infected_arrivals'].sum()
+from_log = sum(1 for entry in sim.people.infection_log if entry['layer'] == PopulationGrowth.ARRIVAL_LAYER)
+local = sim.results['cum_infections'][-1] - infected_arrivals
+print(f"{'✓' if infected_arrivals == from_log > 0 and local > 0 else '✗'} 输入病例 {infected_arrivals:.0f}（infection_log {from_log} 条），"
+      f"本地传播 {local:.0f}")
+print(f"  数组容量 {births.population.codes.capacity:,}，扩展 {births.population.codes.n_reallocations} 次")
+
+print("\n" + "="*60)
+print("测试5: 每天追加的耗时")
+print("="*60)
+timings = {}
+for rate in [20, 200]:
+    arrivals = PopulationGrowth.Arrivals(layer_config, countries_config, rates={'A': rate, 'B': rate})
+    sim = make_sim(arrivals, pop_infected=10, n_days=30)
+    arrivals = sim.get_intervention(PopulationGrowth.Arrivals)
+    apply = arrivals.apply
+    elapsed = []
+    def timed(sim):
+        T = time.perf_counter()
+        apply(sim)
+        elapsed.append(time.perf_counter() - T)
+    arrivals.apply = timed
+    sim.run()
+    timings[rate] = np.median(elapsed[1:])
+    print(f"  每天到达 {2 * rate}: 每天 {timings[rate] * 1e3:.2f}ms")
+print(f"{'✓' if timings[200] < 5 * timings[20] else '✗'} 到达人数增加 10 倍，每天耗时增加 {timings[200] / timings[20]:.1f} 倍")
+
+print("\n" + "="*60)
+print("测试6: 按年龄段分班的聚类层与构建时的分组键一致")
+print("="*60)
+school_config = dict(layer_config, school={'network_type': Enums.NetWorkType.school.name, 'age_range': [6, 18], 'beta': 0.6})
+school_popdict, _ = ContactNetwork.create_custom_population(pop_size, school_config, countries_config)
+sim = cv.Sim(pop_size=pop_size, pop_infected=0, n_days=10, rand_seed=1, verbose=0)
+sim.popdict = school_popdict
+sim.reset_layer_pars()
+sim.initialize()
+ContactNetwork.attach_custom_attributes(sim.people, school_popdict)
+population = PopulationGrowth.GrowablePeople(sim.people, school_config, countries_config, clusters=school_popdict['clusters'],
+                                             join_clusters=['school'])
+new_inds = population.add_agents({'A': 500, 'B': 500})
+school = population.clusters['school'].view
+joined = new_inds[school[new_inds] >= 0]
+members = np.flatnonzero(school >= 0)
+keys = population._group_keys(school_config['school'], members)
+n_keys = np.array([len(np.unique(keys[school[members] == c])) for c in np.unique(school[joined])])
+print(f"{'✓' if len(joined) > 0 and np.all(n_keys == 1) else '✗'} {len(joined)} 个新学生加入的班级中，"
+      f"所有人的国家和年级相同")
+
+print("\n" + "="*60)
+print("测试7: 每天追加的耗时与人口规模无关")
+print("="*60)
+timings = {}
+for n in [20000, 200000]:
+    big_popdict, _ = ContactNetwork.create_custom_population(n, layer_config, countries_config)
+    arrivals = PopulationGrowth.Arrivals(layer_config, countries_config, rates={'A': 20, 'B': 20},
+                                         clusters=big_popdict['clusters'], join_clusters=['home'])
+    sim = cv.Sim(pop_size=n, pop_infected=10, n_days=30, rand_seed=1, verbose=0, interventions=arrivals)
+    sim.popdict = big_popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, big_popdict)
+    arrivals = sim.get_intervention(PopulationGrowth.Arrivals)
+    apply = arrivals.apply
+    elapsed = []
+    def timed(sim):
+        T = time.perf_counter()
+        apply(sim)
+        elapsed.append(time.perf_counter() - T)
+    arrivals.apply = timed
+    sim.run()
+    timings[n] = np.median(elapsed[1:])  # 第一天建立索引
+    print(f"  人口 {n:,}: 第一天 {elapsed[0] * 1e3:.1f}ms，之后每天 {timings[n] * 1e3:.2f}ms")
+print(f"{'✓' if timings[200000] < 3 * timings[20000] else '✗'} 人口增加 10 倍，每天耗时增加 {timings[200000] / timings[20000]:.1f} 倍")
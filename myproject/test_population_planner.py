@@ -0,0 +1,95 @@
+'''
+测试构建人口前的预估
+验证配置校验、预测边数与实际构建一致，以及超出内存预算时拒绝构建或分批构建聚类层
+'''
+import numpy as np
+import Enums
+import ContactNetwork
+import PopulationPlanner
+
+np.random.seed(1)  # 构建结果（边数）确定，预测误差的检查可以重复
+
+countries_config = {
+    'A': {'proportion': 0.6},
+    'B': {'proportion': 0.4, 'age_pyramid': {'bins': [0, 20, 60, 100], 'weights': [0.3, 0.5, 0.2]}},
+}
+layer_config = {
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'beta': 0.5,
+    },
+    'school': {
+        'network_type': Enums.NetWorkType.school.name,
+        'cluster_size': 30,
+        'beta': 0.3,
+        'age_range': [5, 18],
+    },
+    'community': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 6,
+        'beta': 0.1,
+        'age_range': [18, 100],
+    },
+}
+
+print("="*60)
+print("测试1: 配置校验")
+print("="*60)
+bad_configs = {
+    '未知网络类型': {'x': {'network_type': 'small_world'}},
+    'beta 为负': {'x': {'network_type': 'random', 'beta': -1}},
+    'age_range 颠倒': {'x': {'network_type': 'random', 'age_range': [60, 18]}},
+    'n_contacts 不合法': {'x': {'network_type': 'random', 'n_contacts': -3}},
+    'compact 不是布尔值': {'x': {'network_type': 'random', 'compact': 'yes'}},
+    '层配置不是字典': {'x': 'random'},
+}
+for name, config in bad_configs.items():
+    try:
+        PopulationPlanner.plan_population(1000, config, countries_config)
+        print(f"✗ {name}: 没有报错")
+    except (TypeError, ValueError) as e:
+        print(f"✓ {name}: {e}")
+names = ContactNetwork.validate_layer_config(layer_config)
+print(f"{'✓' if names == list(layer_config) else '✗'} 合法配置返回层名: {names}")
+
+print("\n" + "="*60)
+print("测试2: 预测边数与实际构建一致")
+print("="*60)
+pop_size = 100000
+plan = PopulationPlanner.plan_population(pop_size, layer_config, countries_config, n_days=60)
+PopulationPlanner.print_plan(plan)
+popdict, _ = PopulationPlanner.build_population(plan)
+for name, layer in plan['layers'].items():
+    actual = len(popdict['contacts'][name]['p1'])
+    error = abs(actual - layer['edges']) / actual
+    print(f"{'✓' if error < 0.03 else '✗'} 层 {name}: 预测 {layer['edges']:,} 条边，实际 {actual:,}（误差 {error:.1%}）")
+actual_bytes = sum(sum(arr.nbytes for arr in layer.values()) for layer in popdict['contacts'].values())
+error = abs(actual_bytes - plan['memory']['layers']) / actual_bytes
+print(f"{'✓' if error < 0.03 else '✗'} 接触层内存: 预测 {PopulationPlanner.format_bytes(plan['memory']['layers'])}，"
+      f"实际 {PopulationPlanner.format_bytes(actual_bytes)}")
+
+print("\n" + "="*60)
+print("测试3: 内存预算")
+print("="*60)
+try:
+    PopulationPlanner.plan_population(pop_size, layer_config, countries_config, n_days=60, memory_budget='1MB')
+    print("✗ 没有拒绝")
+except MemoryError as e:
+    print(f"✓ 预算过小时拒绝: {e}")
+
+# 只有聚类层很大时，构建峰值可以通过分批降低到预算以内
+school_only = {'school': dict(layer_config['school'], age_range=None)}
+full = PopulationPlanner.plan_population(pop_size, school_only, countries_config)
+budget = 0.8 * full['memory']['build_peak']
+chunked = PopulationPlanner.plan_population(pop_size, school_only, countries_config, memory_budget=budget)
+print(f"{'✓' if chunked['chunk_members'] and chunked['memory']['build_peak'] <= budget else '✗'} "
+      f"预算 {PopulationPlanner.format_bytes(budget)} 时分批构建，每批 {chunked['chunk_members']:,} 人，"
+      f"预计峰值 {PopulationPlanner.format_bytes(chunked['memory']['build_peak'])}")
+popdict_full, _ = PopulationPlanner.build_population(full)
+popdict_chunked, _ = PopulationPlanner.build_population(chunked)
+n_full = len(popdict_full['contacts']['school']['p1'])
+n_chunked = len(popdict_chunked['contacts']['school']['p1'])
+countries = popdict_chunked['country']
+p1, p2 = popdict_chunked['contacts']['school']['p1'], popdict_chunked['contacts']['school']['p2']
+print(f"{'✓' if abs(n_full - n_chunked) / n_full < 0.03 else '✗'} 分批构建的边数 {n_chunked:,}，不分批 {n_full:,}")
+print(f"{'✓' if np.all(countries[p1] == countries[p2]) else '✗'} 分批构建没有跨国家的连接")
@@ -0,0 +1,67 @@
+'''
+测试按国家的人口缩放（PopulationScaling）
+验证静态缩放与 Covasim 自带的静态 pop_scale 结果一致，以及动态缩放按国家分别进行且保留自定义属性
+'''
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import PopulationScaling
+
+layer_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 10,
+        'beta': 0.3,
+        'age_range': None,
+    }
+}
+countries_config = {'A': 0.6, 'B': 0.4}
+base_pars = {'pop_infected': 20, 'n_days': 60, 'verbose': 0}
+
+def make_sim(popdict, pars, analyzers=None):
+    sim = cv.Sim(pars=pars, analyzers=analyzers)
+    sim.popdict = popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, popdict)
+    return sim
+
+print("="*60)
+print("测试1: 静态缩放（各国缩放因子相同）与 Covasim 的 pop_scale 一致")
+print("="*60)
+plan = PopulationScaling.plan_scaled_population(countries_config, {'A': 60000, 'B': 40000}, pop_size=10000)
+print(f"  缩放方案: {plan['country_scales']}, 代理数: {plan['pop_size']}")
+popdict, keys = ContactNetwork.create_custom_population(plan['pop_size'], layer_config, plan['countries_config'])
+pars = PopulationScaling.make_scaled_pars(base_pars, plan)
+sim1 = make_sim(popdict, pars, PopulationScaling.CountryRescale(plan['country_scales'], dynamic=False))
+sim2 = make_sim(popdict, pars)
+sim1.run()
+sim2.run()
+for key in ['cum_infections', 'cum_recoveries', 'cum_symptomatic', 'n_infectious', 'n_susceptible']:
+    same = np.allclose(sim1.results[key].values, sim2.results[key].values)
+    print(f"{'✓' if same else '✗'} {key}: {sim1.results[key][-1]:.0f} vs {sim2.results[key][-1]:.0f}")
+
+print("\n" + "="*60)
+print("测试2: 动态缩放，A 国 60 万人、B 国 4 万人（B 国缩放因子固定为 4）")
+print("="*60)
+plan = PopulationScaling.plan_scaled_population(countries_config, {'A': 600000, 'B': 40000}, pop_size=20000, pop_scales={'B': 4})
+print(f"  缩放方案: {plan['country_scales']}, 代理比例: {plan['countries_config']}")
+popdict, keys = ContactNetwork.create_custom_population(plan['pop_size'], layer_config, plan['countries_config'])
+rescaler = PopulationScaling.CountryRescale(plan['country_scales'])
+sim = make_sim(popdict, PopulationScaling.make_scaled_pars(dict(base_pars, n_days=120), plan), rescaler)
+sim.run()
+rescaler = sim.get_analyzer()
+final_scales = rescaler.scales[-1]
+ok = np.all(final_scales <= rescaler.max_scale) and np.all(np.diff(rescaler.scales, axis=0) >= 0)
+print(f"{'✓' if ok else '✗'} 各国缩放因子单调不减且不超过上限: {dict(zip(rescaler.country_names, final_scales))}")
+by_country = rescaler.results['cum_infections'][-1]
+print(f"{'✓' if np.isclose(by_country.sum(), sim.results['cum_infections'][-1]) else '✗'} 各国累计感染之和等于总结果: {by_country} -> {sim.results['cum_infections'][-1]:.0f}")
+weights_ok = all(np.all(sim.people.weight[sim.people.country == c] == s) for c, s in zip(rescaler.country_names, rescaler.scale))
+print(f"{'✓' if weights_ok else '✗'} sim.people.weight 与各国当前缩放因子一致")
+print(f"{'✓' if np.array_equal(sim.people.country, popdict['country']) else '✗'} 缩放后 country 属性保持不变")
+print(f"{'✓' if np.isclose(sim.results['n_alive'][0], 640000) else '✗'} 总人口: {sim.results['n_alive'][0]:.0f}")
+
+print("\n" + "="*60)
+print("所有测试完成！")
+print("="*60)
@@ -0,0 +1,55 @@
+'''
+测试共享同一人口的多次重复运行
+验证并行与串行结果一致、不同种子结果不同、分位数区间有序
+'''
+import numpy as np
+import Enums
+import ContactNetwork
+import ReplicateRunner
+
+layer_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 8,
+        'beta': 0.3,
+        'age_range': None,
+    }
+}
+countries_config = {'A': 0.6, 'B': 0.4}
+pop_size = 2000
+custom_popdict, custom_keys = ContactNetwork.create_custom_population(pop_size, layer_config, countries_config)
+
+pars = {
+    'pop_size': pop_size,
+    'pop_infected': 10,
+    'n_days': 40,
+    'rescale': False,
+}
+
+def setup(sim):
+    ''' 运行前按国家设置易感性（验证自定义属性已挂载到 people 上） '''
+    sim.people.rel_sus[sim.people.country == 'B'] = 0.7
+
+print("="*60)
+print("测试1: 并行运行 6 个种子")
+print("="*60)
+output = ReplicateRunner.run_replicates(pars, custom_popdict, n_runs=6, n_cpus=3, setup=setup)
+raw = output['raw']['cum_infections']
+bands = output['quantiles']['cum_infections']
+final = raw[:, -1]
+print(f"✓ 完成 {raw.shape[0]} 次运行, 每次 {raw.shape[1]} 个时间点")
+print(f"  最终感染数: {final.tolist()}")
+print(f"{'✓' if len(np.unique(final)) > 1 else '✗'} 不同种子的结果不同")
+ordered = np.all(bands[0.05] <= bands[0.5]) and np.all(bands[0.5] <= bands[0.95])
+print(f"{'✓' if ordered else '✗'} 分位数区间有序: 5%={bands[0.05][-1]:.0f}, 50%={bands[0.5][-1]:.0f}, 95%={bands[0.95][-1]:.0f}")
+
+print("\n" + "="*60)
+print("测试2: 串行运行结果与并行一致")
+print("="*60)
+serial = ReplicateRunner.run_replicates(pars, custom_popdict, seeds=output['seeds'], n_cpus=1, setup=setup)
+same = np.array_equal(serial['raw']['cum_infections'], raw)
+print(f"{'✓' if same else '✗'} 相同种子下串行与并行结果一致")
+
+print("\n" + "="*60)
+print("所有测试完成！")
+print("="*60)
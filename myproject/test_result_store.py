@@ -0,0 +1,89 @@
+'''
+测试结果存储（ResultStore）
+验证多进程并发写入、按参数筛选、流式均值与一次性读取结果一致
+'''
+import multiprocessing as mp
+import shutil
+import tempfile
+import numpy as np
+import ResultStore
+
+def write_runs(args):
+    ''' 在工作进程中写入若干次模拟结果 '''
+    path, worker, n_runs = args
+    with ResultStore.ResultStore(path, chunk_size=4) as store:
+        for i in range(n_runs):
+            series = np.cumsum(np.full(31, worker + 1.0))
+            store.append({'cum_infections': series, 'new_infections': np.diff(series, prepend=0)},
+                         params={'worker': worker, 'run': i, 'label': f'w{worker}'})
+    return worker
+
+if __name__ == '__main__':
+    path = tempfile.mkdtemp()
+    try:
+        print("="*60)
+        print("测试1: 4 个进程并发写入同一目录")
+        print("="*60)
+        with mp.Pool(4) as pool:
+            pool.map(write_runs, [(path, w, 10) for w in range(4)])
+        store = ResultStore.ResultStore(path)
+        print(f"{'✓' if store.count() == 40 else '✗'} 共 {store.count()} 次运行, {len(store.chunks())} 个块文件")
+        print(f"  列: {store.columns()}")
+
+        print("\n" + "="*60)
+        print("测试2: 按参数筛选")
+        print("="*60)
+        subset = store.load('cum_infections', where={'worker': 2})
+        ok = subset.shape == (10, 31) and np.all(subset[:, -1] == 93)
+        print(f"{'✓' if ok else '✗'} worker=2 的运行: {subset.shape}, 最终值 {subset[0, -1]}")
+        labels = {p['label'] for p in store.params(where={'label': 'w3'})}
+        print(f"{'✓' if labels == {'w3'} else '✗'} 字符串参数筛选: {labels}")
+
+        print("\n" + "="*60)
+        print("测试3: 流式均值与分位数")
+        print("="*60)
+        streamed = store.mean('cum_infections')
+        loaded = store.load('cum_infections').mean(axis=0)
+        print(f"{'✓' if np.allclose(streamed, loaded) else '✗'} 流式均值与整列读取一致: 最终值 {streamed[-1]:.1f}")
+        bands = store.quantiles('cum_infections', quantiles=(0.0, 1.0))
+        print(f"{'✓' if bands[0.0][-1] == 31 and bands[1.0][-1] == 124 else '✗'} 最小/最大: {bands[0.0][-1]}, {bands[1.0][-1]}")
+    finally:
+        shutil.rmtree(path)
+
+    print("\n" + "="*60)
+    print("测试4: 长度不同的运行和缺失的参数")
+    print("="*60)
+    path = tempfile.mkdtemp()
+    try:
+        store = ResultStore.ResultStore(path, chunk_size=3)
+        store.append({'cum_infections': np.arange(31.0)}, params={'beta': 0.01, 'label': 'a'})
+        store.append({'cum_infections': np.arange(11.0)}, params={'beta': 0.02})  # 提前终止、没有 label
+        try:
+            store.append({'new_infections': np.ones(31)}, params={'beta': 0.03})
+            print("✗ 结果键不同的运行: 没有报错")
+        except ValueError as e:
+            print(f"✓ 结果键不同的运行在追加时报错: {e}")
+        store.append({'cum_infections': np.arange(41.0)}, params={'beta': 0.03, 'label': 'b'})  # 缓冲区已满，写出
+        store.append({'cum_infections': np.arange(21.0)}, params={'label': 'c'})
+        store.flush()
+        values = store.load('cum_infections')
+        ok = (len(store.chunks()) == 2 and values.shape == (4, 41) and np.isnan(values[1, 11:]).all()
+              and np.array_equal(values[1, :11], np.arange(11.0)) and np.isnan(values[3, 21:]).all())
+        print(f"{'✓' if ok else '✗'} 较短的运行用 NaN 补齐: {values.shape}，每次运行的长度 {(~np.isnan(values)).sum(axis=1).tolist()}")
+        mean = store.mean('cum_infections')
+        print(f"{'✓' if mean[0] == 0 and mean[20] == 20 and mean[40] == 40 and len(mean) == 41 else '✗'} 均值只包含运行到该时间点的运行")
+        print(f"{'✓' if store.count(where={'label': 'a'}) == 1 and store.count(where={'label': 'c'}) == 1 else '✗'} "
+              f"部分运行缺少的字符串参数仍可筛选")
+        print(f"{'✓' if store.count(where={'beta': 0.02}) == 1 and store.count(where={'beta': 0.03}) == 1 else '✗'} "
+              f"部分运行缺少的数值参数仍可筛选，参数: {store.param_names()}")
+        try:
+            store.count(where={'bta': 0.02})
+            print("✗ 未知的筛选参数: 没有报错")
+        except ValueError as e:
+            print(f"✓ 未知的筛选参数报错: {e}")
+    finally:
+        shutil.rmtree(path)
+
+    print("\n" + "="*60)
+    print("所有测试完成！")
+    print("="*60)
@@ -0,0 +1,71 @@
+'''
+测试检查点与情景分支
+验证分支共享检查点之前的结果、相同分支可复现、干预措施只影响分叉日之后
+'''
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import ScenarioBranching
+
+layer_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 10,
+        'beta': 0.3,
+        'age_range': None,
+    }
+}
+countries_config = {'A': 0.6, 'B': 0.4}
+pop_size = 2000
+custom_popdict, custom_keys = ContactNetwork.create_custom_population(pop_size, layer_config, countries_config)
+
+def reduce_young_susceptibility(sim):
+    ''' 在分叉日降低年轻人的易感性（例如：开始接种疫苗） '''
+    if sim.t == 30:
+        young = sim.people.age < 30
+        sim.people.rel_sus[young] *= 0.3
+
+sim = cv.Sim(pop_size=pop_size, pop_infected=20, n_days=60, verbose=0)
+sim.popdict = custom_popdict
+sim.reset_layer_pars()
+sim.initialize()
+ContactNetwork.attach_custom_attributes(sim.people, custom_popdict)
+
+print("="*60)
+print("测试1: 在第30天创建检查点并运行分支")
+print("="*60)
+checkpoint = ScenarioBranching.make_checkpoint(sim, day=30)
+branches = {
+    'baseline': {},
+    'baseline_again': {},
+    'vaccinate_young': {'interventions': reduce_young_susceptibility},
+    'lockdown': {'interventions': cv.change_beta(days=30, changes=0.2)},
+}
+results = ScenarioBranching.run_branches(checkpoint, branches, n_cpus=2)
+for name, res in results.items():
+    print(f"  {name}: 最终感染数 {res['cum_infections'][-1]:.0f}")
+
+base = results['baseline']['new_infections']
+same_prefix = all(np.array_equal(res['new_infections'][:30], base[:30]) for res in results.values())
+print(f"{'✓' if same_prefix else '✗'} 所有分支在分叉日之前的结果相同")
+repeat = np.array_equal(results['baseline_again']['cum_infections'], results['baseline']['cum_infections'])
+print(f"{'✓' if repeat else '✗'} 相同分支结果可复现")
+lower = results['lockdown']['cum_infections'][-1] < results['baseline']['cum_infections'][-1]
+print(f"{'✓' if lower else '✗'} 降低 beta 的分支最终感染数更低")
+
+print("\n" + "="*60)
+print("测试2: 检查点保存到磁盘后恢复，自定义属性仍然存在")
+print("="*60)
+import os, tempfile
+filename = os.path.join(tempfile.mkdtemp(), 'day30.ckpt')
+ScenarioBranching.save_checkpoint(checkpoint, filename)
+restored = ScenarioBranching.load_checkpoint(filename)
+branch_sim = ScenarioBranching.run_branch(restored)
+ok = np.array_equal(branch_sim.results['cum_infections'].values, results['baseline']['cum_infections'])
+print(f"{'✓' if ok else '✗'} 从磁盘恢复的分支与内存中的分支结果一致")
+print(f"{'✓' if hasattr(branch_sim.people, 'country') else '✗'} sim.people.country 在检查点中保留")
+
+print("\n" + "="*60)
+print("所有测试完成！")
+print("="*60)
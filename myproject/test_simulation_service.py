@@ -0,0 +1,161 @@
+'''
+测试本地模拟服务
+验证结果与在当前进程中直接运行相同、同一人口的后续任务命中缓存（不再构建）、流式事件可以拼出
+完整结果、并发任务和取消、错误任务不影响服务，传播因子、干预和分组统计的任务参数，以及工作进程
+意外退出后任务报错、进程被重新启动
+'''
+import asyncio
+import os
+import signal
+import threading
+import time
+import numpy as np
+import Enums
+import SimulationService
+
+layer_config = {
+    'community': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 8,
+        'beta': 0.3,
+        'age_range': None,
+    },
+    'home': {
+        'network_type': Enums.NetWorkType.household.name,
+        'beta': 0.5,
+    },
+}
+job = {
+    'pop_size': 30000,
+    'layer_config': layer_config,
+    'countries_config': {'A': 0.6, 'B': 0.4},
+    'pars': {'n_days': 60, 'pop_infected': 20, 'rand_seed': 1},
+    'result_keys': ['cum_infections', 'new_infections', 'n_infectious'],
+    'stream_every': 10,
+}
+
+service = SimulationService.SimulationService(n_workers=2, cache_size=2, port=0)
+ready = threading.Event()
+thread = threading.Thread(target=lambda: asyncio.run(service.serve(ready)), daemon=True)
+thread.start()
+ready.wait(60)
+client = SimulationService.ServiceClient(port=service.port)
+
+print("="*60)
+print("测试1: 与直接运行的结果相同，后续任务命中人口缓存")
+print("="*60)
+T = time.perf_counter()
+cold = client.run(job)
+cold_time = time.perf_counter() - T
+direct = SimulationService.run_job(SimulationService.validate_job(job))
+same = all(cold['results'][key] == direct['results'][key] for key in job['result_keys'])
+print(f"{'✓' if cold['event'] == 'done' and same else '✗'} 服务结果与直接运行相同: 累计感染 {cold['results']['cum_infections'][-1]:.0f}")
+T = time.perf_counter()
+warm = client.run(dict(job, pars=dict(job['pars'], rand_seed=2)))
+warm_time = time.perf_counter() - T
+print(f"{'✓' if not cold['warm'] and warm['warm'] and warm['timing']['build'] == 0 else '✗'} "
+      f"第一次构建人口 {cold['timing']['build']:.2f}s，第二次命中缓存")
+print(f"{'✓' if warm_time < cold_time else '✗'} 往返耗时：构建 {cold_time:.2f}s，缓存 {warm_time:.2f}s")
+
+print("\n" + "="*60)
+print("测试2: 流式事件")
+print("="*60)
+events = list(client.stream(client.submit(job)))
+kinds = [event['event'] for event in events]
+progress = [event for event in events if event['event'] == 'progress']
+ok = kinds[0] == 'queued' and kinds[1] == 'started' and kinds[-1] == 'done' and len(progress) == 7
+print(f"{'✓' if ok else '✗'} 事件: {kinds[:3]} ... {kinds[-2:]}，{len(progress)} 次进度，天数 {[event['day'] for event in progress]}")
+for key in ['new_infections', 'n_infectious', 'cum_infections']:
+    streamed = np.concatenate([event['results'][key] for event in progress])
+    print(f"{'✓' if np.allclose(streamed, events[-1]['results'][key]) else '✗'} 流式的 {key} 拼接后与最终结果相同")
+single = SimulationService.run_job(SimulationService.validate_job(dict(job, stream_every=job['pars']['n_days'] + 1)))
+same = all(np.array_equal(events[-1]['results'][key], single['results'][key]) for key in job['result_keys'])
+print(f"{'✓' if same else '✗'} 分 {len(progress)} 段运行与一次 sim.run() 的结果相同: "
+      f"累计感染 {events[-1]['results']['cum_infections'][-1]:.0f} / {single['results']['cum_infections'][-1]:.0f}")
+
+print("\n" + "="*60)
+print("测试3: 并发任务和取消")
+print("="*60)
+other = dict(job, countries_config={'A': 0.5, 'B': 0.5})
+ids = [client.submit(dict(j, pars=dict(job['pars'], rand_seed=seed))) for seed, j in enumerate([job, other, job, other, job], 10)]
+cancelled = client.cancel(ids[-1])
+for job_id in ids[:-1]:
+    for _ in client.stream(job_id):
+        pass
+results = {job_id: client.get(job_id) for job_id in ids}
+ok = cancelled and results[ids[-1]]['status'] == 'cancelled' and all(results[i]['status'] == 'done' for i in ids[:-1])
+print(f"{'✓' if ok else '✗'} 4 个任务完成，排队中的任务已取消: {[results[i]['status'] for i in ids]}")
+workers = {results[i]['worker'] for i in ids[:-1]}
+# 每个工作进程上，同一人口只在第一次时构建（缓存容量为 2，不会被淘汰）
+earlier = [cold['job_id'], warm['job_id'], events[-1]['job_id']]
+seen = {(client.get(job_id)['worker'], SimulationService.population_key(job)) for job_id in earlier}
+builds_ok = True
+for job_id, j in zip(ids[:-1], [job, other, job, other]):
+    key = (results[job_id]['worker'], SimulationService.population_key(j))
+    builds_ok &= results[job_id]['warm'] == (key in seen)
+    seen.add(key)
+print(f"{'✓' if workers == {0, 1} and builds_ok else '✗'} 任务分派到工作进程 {sorted(workers)}，"
+      f"命中缓存: {[results[i]['warm'] for i in ids[:-1]]}（同一进程上同一人口只构建一次）")
+print(f"{'✓' if not client.cancel(ids[0]) else '✗'} 已完成的任务不能取消")
+
+print("\n" + "="*60)
+print("测试4: 错误处理")
+print("="*60)
+for label, bad in [('缺少 layer_config', {'pop_size': 100, 'countries_config': {'A': 1.0}}),
+                   ('未知干预', dict(job, interventions=[{'type': 'teleport'}])),
+                   ('未知的键', dict(job, population=1))]:
+    try:
+        client.submit(bad)
+        print(f"✗ {label}: 没有报错")
+    except RuntimeError as e:
+        print(f"✓ {label}: {e}")
+failed = client.run(dict(job, result_keys=['cum_teleports']))
+print(f"{'✓' if failed['event'] == 'error' else '✗'} 运行中出错的任务返回 error 事件: {failed.get('error')}")
+bad_build = dict(job, build={'engine': 'teleport'})
+failed = client.run(bad_build)
+key = SimulationService.population_key(SimulationService.validate_job(bad_build))
+cached = any(key in worker['cache'] for worker in service._workers)
+print(f"{'✓' if failed['event'] == 'error' and not cached else '✗'} 构建人口失败的任务返回 error 事件，"
+      f"该人口没有记为已缓存: {failed.get('error')}")
+print(f"{'✓' if client.run(job)['event'] == 'done' else '✗'} 出错后服务仍可运行任务")
+
+print("\n" + "="*60)
+print("测试5: 传播因子、干预和分组统计")
+print("="*60)
+base = client.run(dict(job, stratify=['country']))
+protected = client.run(dict(job, stratify=['country'], transmission={'rel_sus:country=B': 0.0}))
+b_base = base['stratified']['country']['cum_infections']['B'][-1]
+b_protected = protected['stratified']['country']['cum_infections']['B'][-1]
+print(f"{'✓' if b_protected < 0.1 * b_base else '✗'} B 国易感性为 0 时 B 国累计感染 {b_protected:.0f}（原来 {b_base:.0f}）")
+typo = client.run(dict(job, transmission={'rel_sus:country=C': 0.0}))
+print(f"{'✓' if typo['event'] == 'error' else '✗'} 没有人匹配的传播因子返回 error 事件: {typo.get('error')}")
+lockdown = client.run(dict(job, interventions=[{'type': 'change_beta', 'days': [10], 'changes': [0.2]}]))
+print(f"{'✓' if lockdown['results']['cum_infections'][-1] < base['results']['cum_infections'][-1] else '✗'} "
+      f"第 10 天降低传播后累计感染 {lockdown['results']['cum_infections'][-1]:.0f}（原来 {base['results']['cum_infections'][-1]:.0f}）")
+status = client.status()
+print(f"{'✓' if status['jobs']['done'] >= 10 and status['jobs']['error'] == 3 and all(w['alive'] for w in status['workers']) else '✗'} 服务状态: {status['jobs']}")
+
+print("\n" + "="*60)
+print("测试6: 工作进程意外退出")
+print("="*60)
+long_job = dict(job, pars=dict(job['pars'], n_days=400), stream_every=1)
+job_id = client.submit(long_job)
+events = client.stream(job_id)
+for event in events:
+    if event['event'] == 'progress':  # 已经开始运行
+        break
+record = client.get(job_id)
+old_pid = service._workers[record['worker']]['process'].pid
+os.kill(old_pid, signal.SIGKILL)
+last = [event for event in events][-1]
+print(f"{'✓' if last['event'] == 'error' and client.get(job_id)['status'] == 'error' else '✗'} 运行中的任务以 error 事件结束: {last.get('error')}")
+worker = client.status()['workers'][record['worker']]
+print(f"{'✓' if worker['alive'] and worker['restarts'] == 1 and service._workers[record['worker']]['process'].pid != old_pid else '✗'} "
+      f"工作进程 {record['worker']} 已重新启动（重启 {worker['restarts']} 次）")
+after = [client.submit(dict(job, pars=dict(job['pars'], rand_seed=seed))) for seed in (20, 21, 22)]
+finished = [[event for event in client.stream(i)][-1]['event'] for i in after]
+print(f"{'✓' if finished == ['done'] * 3 else '✗'} 之后的任务正常完成: {finished}")
+
+service.stop()
+thread.join(30)
+print(f"{'✓' if not thread.is_alive() else '✗'} 服务已停止")
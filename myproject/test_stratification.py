@@ -0,0 +1,131 @@
+'''
+测试分组统计结果
+验证各组结果之和等于 Covasim 的全体结果（流量、累计和存量），并支持属性组合和年龄分组
+'''
+import time
+import numpy as np
+import covasim as cv
+import Enums
+import ContactNetwork
+import Stratification
+
+layer_config = {
+    'random_layer': {
+        'network_type': Enums.NetWorkType.random.name,
+        'n_contacts': 10,
+        'beta': 0.3,
+        'age_range': None,
+    }
+}
+countries_config = {'A': 0.5, 'B': 0.3, 'C': 0.2}
+pop_size = 20000
+custom_popdict, custom_keys = ContactNetwork.create_custom_population(pop_size, layer_config, countries_config)
+custom_popdict['health_status'] = np.random.randint(0, 3, pop_size)
+
+def run(**kwargs):
+    analyzer = Stratification.StratifiedResults(by=['country', 'health_status', ('country', 'sex'), 'age'], age_bins=[18, 65])
+    sim = cv.Sim(pop_size=pop_size, pop_infected=30, n_days=120, verbose=0, analyzers=analyzer,
+                 interventions=cv.test_prob(symp_prob=0.2), **kwargs)
+    sim.popdict = custom_popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, custom_popdict)
+    sim.run()
+    return sim, sim.get_analyzer(Stratification.StratifiedResults)
+
+def check_totals(sim, strat):
+    ok = True
+    for key in strat.by:
+        bad = [k for k, v in strat.results[key].items() if not np.allclose(v.sum(axis=1), sim.results[k].values)]
+        print(f"  {key}: {len(strat.labels[key])} 组，与全体结果不一致的键: {bad}")
+        ok &= not bad
+    return ok
+
+print("="*60)
+print("测试1: 各组之和等于全体结果")
+print("="*60)
+sim, strat = run()
+print(f"{'✓' if check_totals(sim, strat) else '✗'} 所有分组方式的所有结果都一致")
+for country, values in strat.by_group('country', 'cum_infections').items():
+    print(f"  国家 {country}: 累计感染 {values[-1]:.0f}")
+
+print("\n" + "="*60)
+print("测试2: 组名")
+print("="*60)
+print(f"{'✓' if strat.labels['country'] == ['A', 'B', 'C'] else '✗'} 国家组名: {strat.labels['country']}")
+print(f"{'✓' if strat.labels['age'] == ['0-18', '18-65', '65+'] else '✗'} 年龄组名: {strat.labels['age']}")
+print(f"{'✓' if len(strat.labels[('country', 'sex')]) == 6 else '✗'} 国家×性别组合: {strat.labels[('country', 'sex')]}")
+
+print("\n" + "="*60)
+print("测试3: 固定缩放（pop_scale=10, rescale=False）和关闭 waning")
+print("="*60)
+sim, strat = run(pop_scale=10, rescale=False)
+print(f"{'✓' if check_totals(sim, strat) else '✗'} 缩放后的结果一致")
+sim, strat = run(use_waning=False)
+print(f"{'✓' if check_totals(sim, strat) else '✗'} 关闭 waning 后的结果一致")
+
+print("\n" + "="*60)
+print("测试4: 动态缩放时报错")
+print("="*60)
+try:
+    run(pop_scale=10, rescale=True)
+    print("✗ 没有报错")
+except ValueError as e:
+    print(f"✓ 报错: {e}")
+
+print("\n" + "="*60)
+print("测试5: 每步耗时与结果表大小无关")
+print("="*60)
+timings = {}
+for label, by, age_bins in [('国家', ['country'], None),
+                            ('国家×健康×性别×年龄', [('country', 'health_status', 'sex', 'age')], list(range(1, 100)))]:
+    analyzer = Stratification.StratifiedResults(by=by, age_bins=age_bins)
+    sim = cv.Sim(pop_size=pop_size, pop_infected=30, n_days=400, rand_seed=1, verbose=0, analyzers=analyzer)
+    sim.popdict = custom_popdict
+    sim.reset_layer_pars()
+    sim.initialize()
+    ContactNetwork.attach_custom_attributes(sim.people, custom_popdict)
+    analyzer = sim.get_analyzer(Stratification.StratifiedResults)
+    apply = analyzer.apply
+    elapsed = []
+    def timed(sim):
+        T = time.perf_counter()
+        apply(sim)
+        elapsed.append(time.perf_counter() - T)
+    analyzer.apply = timed
+    sim.run()
+    timings[label] = np.median(elapsed[1:])
+    n_groups = len(analyzer.labels[by[0]])
+    print(f"  {label}: {n_groups} 组，结果表 {n_groups * sim.npts * (len(Stratification.FLOWS) + len(Stratification.STRATIFIED_STOCKS)):,} 格，每步 {timings[label] * 1e6:.0f}µs")
+small, big = timings.values()
+print(f"{'✓' if big < 3 * small else '✗'} 结果表增大约 {len(analyzer.labels[by[0]]) // 3} 倍，每步耗时增加 {big / small:.1f} 倍")
+
+print("\n" + "="*60)
+print("测试6: 开启检测时每步耗时与人口规模无关")
+print("="*60)
+scanned = []
+def scan_diagnoses(sim):
+    '''对照：每天扫描整个人口的 date_diagnosed'''
+    scanned.append(np.count_nonzero(sim.people.date_diagnosed == sim.t))
+timings = {}
+for n in [20000, 200000]:
+    scanned.clear()
+    analyzer = Stratification.StratifiedResults(by=['sex'])
+    sim = cv.Sim(pop_size=n, pop_infected=10, n_days=30, rand_seed=1, verbose=0, analyzers=[analyzer, scan_diagnoses],
+                 interventions=cv.test_prob(symp_prob=0.2, asymp_prob=0.01, test_delay=2))
+    sim.initialize()
+    analyzer = sim.get_analyzer(Stratification.StratifiedResults)
+    apply = analyzer.apply
+    elapsed = []
+    def timed(sim):
+        T = time.perf_counter()
+        apply(sim)
+        elapsed.append(time.perf_counter() - T)
+    analyzer.apply = timed
+    sim.run()
+    timings[n] = np.median(elapsed[1:])
+    daily = analyzer.results['sex']['new_diagnoses'].sum(axis=1)
+    print(f"{'✓' if np.array_equal(daily, scanned) and daily.sum() > 0 else '✗'} 人口 {n:,}: 诊断 {daily.sum():.0f}，"
+          f"每天都与扫描整个人口相同，"
+          f"每步 {timings[n] * 1e6:.0f}µs")
+print(f"{'✓' if timings[200000] < 3 * timings[20000] else '✗'} 人口增加 10 倍，每步耗时增加 {timings[200000] / timings[20000]:.1f} 倍")